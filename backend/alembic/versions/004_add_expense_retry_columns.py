@@ -0,0 +1,28 @@
+"""Add retry tracking columns to expenses
+
+Revision ID: 004
+Revises: 003_add_tax_columns
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_expense_retry_columns'
+down_revision = '003_add_tax_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('expenses', sa.Column('retry_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('expenses', sa.Column('next_retry_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('idx_status_retry', 'expenses', ['status', 'next_retry_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_status_retry', table_name='expenses')
+    op.drop_column('expenses', 'next_retry_at')
+    op.drop_column('expenses', 'retry_count')
@@ -0,0 +1,50 @@
+"""Add daily_spend_rollup table
+
+Revision ID: 005
+Revises: 004_add_expense_retry_columns
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_daily_spend_rollup'
+down_revision = '004_add_expense_retry_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_spend_rollup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('spend_date', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('payment_method', sa.String(50), nullable=True),
+        sa.Column('total_amount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_daily_spend_rollup_id', 'daily_spend_rollup', ['id'])
+    op.create_index(
+        'idx_rollup_user_date', 'daily_spend_rollup',
+        ['user_id', 'spend_date', 'category_id', 'payment_method']
+    )
+
+    # 既存の明細から初期集計を作成
+    op.execute("""
+        INSERT INTO daily_spend_rollup (user_id, spend_date, category_id, payment_method, total_amount, item_count)
+        SELECT e.user_id, DATE(e.occurred_at), i.category_id, e.payment_method, SUM(i.line_total), COUNT(i.id)
+        FROM expenses e
+        JOIN expense_items i ON i.expense_id = e.id
+        GROUP BY e.user_id, DATE(e.occurred_at), i.category_id, e.payment_method
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_rollup_user_date', table_name='daily_spend_rollup')
+    op.drop_index('ix_daily_spend_rollup_id', table_name='daily_spend_rollup')
+    op.drop_table('daily_spend_rollup')
@@ -0,0 +1,102 @@
+"""Add merchant_key to expenses and monthly_merchant_rollup table
+
+Revision ID: 006
+Revises: 005_add_daily_spend_rollup
+Create Date: 2026-10-19
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_merchant_key'
+down_revision = '005_add_daily_spend_rollup'
+branch_labels = None
+depends_on = None
+
+
+# --- このリビジョン時点の正規化（app.utils.merchant.normalize_merchant_key の固定コピー） ---
+# アプリ側の変更で再実行時の結果が変わらないよう、マイグレーションからはアプリのコードを参照しない
+
+_CORPORATE_DESIGNATORS = ("株式会社", "有限会社", "合同会社", "(株)", "(有)", "(同)")
+_SEPARATORS = re.compile(r"[\s\-‐‑–—―・.,、。'\"`!?()\[\]「」『』/]+")
+_MERCHANT_KEY_MAX_LENGTH = 200
+
+
+def normalize_merchant_key(name):
+    if not name:
+        return None
+    normalized = unicodedata.normalize("NFKC", name).lower().strip()
+    for designator in _CORPORATE_DESIGNATORS:
+        normalized = normalized.replace(designator, "")
+    normalized = _SEPARATORS.sub("", normalized)
+    return normalized[:_MERCHANT_KEY_MAX_LENGTH] or None
+
+
+def upgrade() -> None:
+    op.add_column('expenses', sa.Column('merchant_key', sa.String(200), nullable=True))
+    op.create_index('idx_user_merchant_occurred', 'expenses', ['user_id', 'merchant_key', 'occurred_at'])
+
+    # 既存の店舗名から正規化キーを設定（正規化はアプリと同じ関数で行う）
+    bind = op.get_bind()
+    expenses = sa.table(
+        'expenses',
+        sa.column('id', sa.Integer),
+        sa.column('merchant_name', sa.String),
+        sa.column('merchant_key', sa.String),
+    )
+    rows = bind.execute(
+        sa.select(expenses.c.id, expenses.c.merchant_name).where(expenses.c.merchant_name.isnot(None))
+    ).fetchall()
+    updates = [
+        {"expense_id": row.id, "merchant_key": normalize_merchant_key(row.merchant_name)}
+        for row in rows
+    ]
+    if updates:
+        bind.execute(
+            expenses.update()
+            .where(expenses.c.id == sa.bindparam('expense_id'))
+            .values(merchant_key=sa.bindparam('merchant_key')),
+            updates
+        )
+
+    op.create_table(
+        'monthly_merchant_rollup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('merchant_key', sa.String(200), nullable=False),
+        sa.Column('merchant_name', sa.String(200), nullable=True),
+        sa.Column('visit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_visited_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_monthly_merchant_rollup_id', 'monthly_merchant_rollup', ['id'])
+    op.create_index(
+        'idx_merchant_rollup_user_month', 'monthly_merchant_rollup',
+        ['user_id', 'month', 'merchant_key']
+    )
+
+    # 既存の出費から初期集計を作成
+    op.execute("""
+        INSERT INTO monthly_merchant_rollup
+            (user_id, month, merchant_key, merchant_name, visit_count, total_amount, last_visited_at)
+        SELECT user_id, DATE_FORMAT(occurred_at, '%Y-%m-01'), merchant_key, MAX(merchant_name),
+               COUNT(id), SUM(total_amount), MAX(occurred_at)
+        FROM expenses
+        WHERE merchant_key IS NOT NULL
+        GROUP BY user_id, DATE_FORMAT(occurred_at, '%Y-%m-01'), merchant_key
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_merchant_rollup_user_month', table_name='monthly_merchant_rollup')
+    op.drop_index('ix_monthly_merchant_rollup_id', table_name='monthly_merchant_rollup')
+    op.drop_table('monthly_merchant_rollup')
+    op.drop_index('idx_user_merchant_occurred', table_name='expenses')
+    op.drop_column('expenses', 'merchant_key')
@@ -0,0 +1,39 @@
+"""Copy user_id / occurred_at onto expense_items for keyset paging
+
+Revision ID: 007
+Revises: 006_add_merchant_key
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_add_item_keyset_columns'
+down_revision = '006_add_merchant_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('expense_items', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.add_column('expense_items', sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=True))
+
+    # 既存の明細に親Expenseの値を複製
+    op.execute("""
+        UPDATE expense_items i
+        JOIN expenses e ON e.id = i.expense_id
+        SET i.user_id = e.user_id, i.occurred_at = e.occurred_at
+    """)
+
+    op.create_index(
+        'idx_item_user_category_occurred', 'expense_items',
+        ['user_id', 'category_id', 'occurred_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_item_user_category_occurred', table_name='expense_items')
+    op.drop_column('expense_items', 'occurred_at')
+    op.drop_column('expense_items', 'user_id')
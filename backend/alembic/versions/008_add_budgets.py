@@ -0,0 +1,64 @@
+"""Add budgets and monthly_category_rollup tables
+
+Revision ID: 008
+Revises: 007_add_item_keyset_columns
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_add_budgets'
+down_revision = '007_add_item_keyset_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'monthly_category_rollup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('total_amount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_monthly_category_rollup_id', 'monthly_category_rollup', ['id'])
+    op.create_index(
+        'idx_category_rollup_user_month', 'monthly_category_rollup',
+        ['user_id', 'month', 'category_id']
+    )
+
+    # 既存の日次集計から初期集計を作成
+    op.execute("""
+        INSERT INTO monthly_category_rollup (user_id, month, category_id, total_amount, item_count)
+        SELECT user_id, DATE_FORMAT(spend_date, '%Y-%m-01'), category_id, SUM(total_amount), SUM(item_count)
+        FROM daily_spend_rollup
+        GROUP BY user_id, DATE_FORMAT(spend_date, '%Y-%m-01'), category_id
+    """)
+
+    op.create_table(
+        'budgets',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('alert_thresholds', sa.String(50), nullable=False, server_default='80,100'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), onupdate=sa.func.now()),
+        sa.UniqueConstraint('user_id', 'category_id', name='uq_budget_user_category'),
+    )
+    op.create_index('ix_budgets_id', 'budgets', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_budgets_id', table_name='budgets')
+    op.drop_table('budgets')
+    op.drop_index('idx_category_rollup_user_month', table_name='monthly_category_rollup')
+    op.drop_index('ix_monthly_category_rollup_id', table_name='monthly_category_rollup')
+    op.drop_table('monthly_category_rollup')
@@ -0,0 +1,41 @@
+"""Add households table and users.household_id
+
+Revision ID: 009
+Revises: 008_add_budgets
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_households'
+down_revision = '008_add_budgets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'households',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), onupdate=sa.func.now()),
+    )
+    op.create_index('ix_households_id', 'households', ['id'])
+
+    op.add_column('users', sa.Column('household_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_users_household_id', 'users', 'households', ['household_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index('ix_users_household_id', 'users', ['household_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_household_id', table_name='users')
+    op.drop_constraint('fk_users_household_id', 'users', type_='foreignkey')
+    op.drop_column('users', 'household_id')
+    op.drop_index('ix_households_id', table_name='households')
+    op.drop_table('households')
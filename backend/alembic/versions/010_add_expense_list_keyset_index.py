@@ -0,0 +1,45 @@
+"""Replace idx_user_occurred with a keyset index matching the expense list order
+
+Revision ID: 010
+Revises: 009_add_households
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_expense_list_keyset_index'
+down_revision = '009_add_households'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # キーセットの比較でNULLを扱わずに済むよう、作成日時を必須にする
+    op.execute("UPDATE expenses SET created_at = occurred_at WHERE created_at IS NULL")
+    op.alter_column(
+        'expenses', 'created_at',
+        existing_type=sa.DateTime(timezone=True),
+        nullable=False,
+        existing_server_default=sa.func.now()
+    )
+
+    # 新しいインデックスを先に作成（user_idの外部キーが使うインデックスを切らさない）
+    op.create_index(
+        'idx_user_occurred_created', 'expenses',
+        ['user_id', 'occurred_at', 'created_at', 'id']
+    )
+    op.drop_index('idx_user_occurred', table_name='expenses')
+
+
+def downgrade() -> None:
+    op.create_index('idx_user_occurred', 'expenses', ['user_id', 'occurred_at'])
+    op.drop_index('idx_user_occurred_created', table_name='expenses')
+    op.alter_column(
+        'expenses', 'created_at',
+        existing_type=sa.DateTime(timezone=True),
+        nullable=True,
+        existing_server_default=sa.func.now()
+    )
@@ -0,0 +1,140 @@
+"""Add full-text search token columns to expenses, expense_items and receipts
+
+Revision ID: 011
+Revises: 010_add_expense_list_keyset_index
+Create Date: 2026-10-19
+
+"""
+import json
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_search_tokens'
+down_revision = '010_add_expense_list_keyset_index'
+branch_labels = None
+depends_on = None
+
+# 1回に読み書きする行数（OCR全文を含むため全件をメモリに載せない）
+BATCH_SIZE = 1000
+
+
+# --- このリビジョン時点のトークン化（app.utils.search_text の固定コピー） ---
+# アプリ側の変更で再実行時の結果が変わらないよう、マイグレーションからはアプリのコードを参照しない
+
+_SEPARATORS = re.compile(r"[\s\-‐‑–—―・.,、。'\"`!?()\[\]「」『』/:;*+~<>@#$%^&=|\\{}]+")
+_MAX_DOCUMENT_TOKENS = 4000
+
+
+def _normalize(text):
+    if not text:
+        return ""
+    normalized = unicodedata.normalize("NFKC", text).strip().lower()
+    return "".join(chr(ord(ch) - 0x60) if 0x30A1 <= ord(ch) <= 0x30F6 else ch for ch in normalized)
+
+
+def _build_search_tokens(*texts):
+    tokens = {}
+    for text in texts:
+        for segment in _SEPARATORS.split(_normalize(text)):
+            if not segment:
+                continue
+            grams = (
+                [f"x{segment}_"] if len(segment) == 1
+                else [f"x{segment[i:i + 2]}" for i in range(len(segment) - 1)]
+            )
+            for gram in grams:
+                tokens.setdefault(gram, None)
+                if len(tokens) >= _MAX_DOCUMENT_TOKENS:
+                    return " ".join(tokens)
+    return " ".join(tokens) or None
+
+
+def _ocr_text(raw_output):
+    if not raw_output:
+        return ""
+    try:
+        data = json.loads(raw_output)
+    except ValueError:
+        return raw_output
+
+    values = []
+
+    def collect(value):
+        if isinstance(value, str):
+            values.append(value)
+        elif isinstance(value, dict):
+            for child in value.values():
+                collect(child)
+        elif isinstance(value, list):
+            for child in value:
+                collect(child)
+
+    collect(data)
+    return " ".join(values)
+
+
+def _backfill(bind, table_name, source_columns, target_column, build) -> None:
+    """既存の行からトークン列を設定（IDの範囲ごとにBATCH_SIZE行ずつ）"""
+    table = sa.table(
+        table_name,
+        sa.column('id', sa.Integer),
+        sa.column(target_column, sa.Text),
+        *[sa.column(name, sa.Text) for name in source_columns],
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, *[table.c[name] for name in source_columns])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates = [
+            {"row_id": row.id, "tokens": build(*[getattr(row, name) for name in source_columns])}
+            for row in rows
+        ]
+        updates = [u for u in updates if u["tokens"]]
+        if updates:
+            bind.execute(
+                table.update()
+                .where(table.c.id == sa.bindparam('row_id'))
+                .values({target_column: sa.bindparam('tokens')}),
+                updates
+            )
+
+
+def upgrade() -> None:
+    op.add_column('expenses', sa.Column('search_tokens', sa.Text(), nullable=True))
+    op.add_column('expense_items', sa.Column('search_tokens', sa.Text(), nullable=True))
+    op.add_column('receipts', sa.Column('ocr_search_tokens', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    _backfill(bind, 'expenses', ['merchant_name', 'title'], 'search_tokens', _build_search_tokens)
+    _backfill(bind, 'expense_items', ['product_name'], 'search_tokens', _build_search_tokens)
+    _backfill(
+        bind, 'receipts', ['ocr_raw_output'], 'ocr_search_tokens',
+        lambda raw: _build_search_tokens(_ocr_text(raw))
+    )
+
+    # 索引はデータ投入後に作成（FULLTEXT索引の構築を1回で済ませる）
+    op.create_index('ft_expenses_search', 'expenses', ['search_tokens'], mysql_prefix='FULLTEXT')
+    op.create_index('ft_expense_items_search', 'expense_items', ['search_tokens'], mysql_prefix='FULLTEXT')
+    op.create_index('ft_receipts_ocr_search', 'receipts', ['ocr_search_tokens'], mysql_prefix='FULLTEXT')
+
+
+def downgrade() -> None:
+    op.drop_index('ft_receipts_ocr_search', table_name='receipts')
+    op.drop_index('ft_expense_items_search', table_name='expense_items')
+    op.drop_index('ft_expenses_search', table_name='expenses')
+    op.drop_column('receipts', 'ocr_search_tokens')
+    op.drop_column('expense_items', 'search_tokens')
+    op.drop_column('expenses', 'search_tokens')
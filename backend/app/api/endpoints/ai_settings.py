@@ -6,6 +6,7 @@ from app.database import get_db
 from app.models.user import User
 from app.models.ai_settings import AISettings
 from app.api.deps import get_current_user, require_admin
+from app.services.reference_cache import ReferenceDataCache
 
 router = APIRouter(prefix="/ai-settings", tags=["AI設定"])
 
@@ -60,6 +61,7 @@ def get_ai_settings(
         db.add(settings)
         db.commit()
         db.refresh(settings)
+        ReferenceDataCache.publish_invalidation("ai_settings")
 
     return settings
 
@@ -92,5 +94,6 @@ def update_ai_settings(
 
     db.commit()
     db.refresh(settings)
+    ReferenceDataCache.publish_invalidation("ai_settings")
 
     return settings
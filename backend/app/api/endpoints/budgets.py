@@ -0,0 +1,189 @@
+from datetime import date, datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_user
+from app.api.etag import build_etag, etag_matches, not_modified, set_cache_headers
+from app.database import get_db
+from app.models.budget import Budget
+from app.models.user import User
+from app.services.budget_service import BudgetService
+from app.services.data_version_service import DataVersionService
+from app.services.item_category_service import ItemCategoryService
+
+router = APIRouter(prefix="/budgets", tags=["予算"])
+
+
+def _validate_thresholds(value: Optional[List[int]]) -> Optional[List[int]]:
+    if value is None:
+        return value
+    if any(v < 1 or v > 1000 for v in value):
+        raise ValueError("通知の閾値は1〜1000(%)で指定してください")
+    return sorted(set(value))
+
+
+class BudgetCreate(BaseModel):
+    category_id: int
+    amount: int = Field(..., ge=1)
+    alert_thresholds: List[int] = Field(default_factory=lambda: [80, 100])
+    is_active: bool = True
+
+    _check_thresholds = field_validator("alert_thresholds")(_validate_thresholds)
+
+
+class BudgetUpdate(BaseModel):
+    amount: Optional[int] = Field(None, ge=1)
+    alert_thresholds: Optional[List[int]] = None
+    is_active: Optional[bool] = None
+
+    _check_thresholds = field_validator("alert_thresholds")(_validate_thresholds)
+
+
+class BudgetResponse(BaseModel):
+    id: int
+    category_id: int
+    amount: int
+    alert_thresholds: List[int]
+    is_active: bool
+
+
+def _to_response(budget: Budget) -> BudgetResponse:
+    return BudgetResponse(
+        id=budget.id,
+        category_id=budget.category_id,
+        amount=budget.amount,
+        alert_thresholds=budget.threshold_percents,
+        is_active=budget.is_active
+    )
+
+
+def _parse_month(month: Optional[str]) -> date:
+    if not month:
+        return datetime.now().date().replace(day=1)
+    try:
+        return datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="月は YYYY-MM 形式で指定してください")
+
+
+@router.get("/")
+def list_budget_statuses(
+    request: Request,
+    response: Response,
+    month: Optional[str] = Query(None, description="対象月（YYYY-MM、省略時は今月）"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """予算ごとの消化状況（残額・超過）を取得"""
+    month_start = _parse_month(month)
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"budgets:{current_user.id}", version, {"month": month_start})
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    statuses = BudgetService.statuses(db, current_user.id, month_start)
+    total_amount = sum(s["amount"] for s in statuses)
+    total_spent = sum(s["spent"] for s in statuses)
+    return {
+        "month": month_start.strftime("%Y-%m"),
+        "budgets": statuses,
+        "total": {
+            "amount": total_amount,
+            "spent": total_spent,
+            "remaining": total_amount - total_spent
+        }
+    }
+
+
+@router.get("/alerts")
+def list_budget_alerts(
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """予算の閾値通知を新しい順に取得"""
+    return BudgetService.recent_alerts(current_user.id, limit)
+
+
+@router.post("/", response_model=BudgetResponse)
+def create_budget(
+    budget_in: BudgetCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """カテゴリの月予算を作成"""
+    if not ItemCategoryService.active_category_ids(db, [budget_in.category_id]):
+        raise HTTPException(status_code=404, detail="カテゴリが見つかりません")
+
+    existing = db.query(Budget).filter(
+        Budget.user_id == current_user.id,
+        Budget.category_id == budget_in.category_id
+    ).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="このカテゴリの予算は既に登録されています")
+
+    budget = Budget(
+        user_id=current_user.id,
+        category_id=budget_in.category_id,
+        amount=budget_in.amount,
+        alert_thresholds=",".join(str(v) for v in budget_in.alert_thresholds),
+        is_active=budget_in.is_active
+    )
+    db.add(budget)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同時に作成されたリクエストと競合した（uq_budget_user_category）
+        db.rollback()
+        raise HTTPException(status_code=409, detail="このカテゴリの予算は既に登録されています")
+    db.refresh(budget)
+    return _to_response(budget)
+
+
+@router.put("/{budget_id}", response_model=BudgetResponse)
+@router.patch("/{budget_id}", response_model=BudgetResponse)
+def update_budget(
+    budget_id: int,
+    budget_in: BudgetUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """予算を更新"""
+    budget = db.query(Budget).filter(
+        Budget.id == budget_id,
+        Budget.user_id == current_user.id
+    ).first()
+    if not budget:
+        raise HTTPException(status_code=404, detail="予算が見つかりません")
+
+    update_data = budget_in.model_dump(exclude_unset=True)
+    if "alert_thresholds" in update_data:
+        thresholds = update_data.pop("alert_thresholds") or []
+        budget.alert_thresholds = ",".join(str(v) for v in thresholds)
+    for key, value in update_data.items():
+        setattr(budget, key, value)
+
+    db.commit()
+    db.refresh(budget)
+    return _to_response(budget)
+
+
+@router.delete("/{budget_id}")
+def delete_budget(
+    budget_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """予算を削除"""
+    budget = db.query(Budget).filter(
+        Budget.id == budget_id,
+        Budget.user_id == current_user.id
+    ).first()
+    if not budget:
+        raise HTTPException(status_code=404, detail="予算が見つかりません")
+
+    db.delete(budget)
+    db.commit()
+    return {"message": "予算を削除しました"}
@@ -1,17 +1,22 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 from app.models.category import Category
 from app.schemas.category import Category as CategorySchema, CategoryCreate, CategoryUpdate
 from app.api.deps import get_current_user, get_current_admin
+from app.api.etag import build_etag, etag_matches, not_modified, set_cache_headers
+from app.services.data_version_service import DataVersionService
+from app.services.reference_cache import ReferenceDataCache
 
 router = APIRouter(prefix="/categories", tags=["カテゴリ管理"])
 
 
 @router.get("/", response_model=List[CategorySchema])
 def list_categories(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
@@ -19,6 +24,16 @@ def list_categories(
     db: Session = Depends(get_db)
 ):
     """カテゴリ一覧を取得"""
+    version = DataVersionService.get_categories_version()
+    etag = build_etag(
+        "categories",
+        str(version) if version is not None else None,
+        {"skip": skip, "limit": limit, "active_only": active_only}
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
     query = db.query(Category)
     if active_only:
         query = query.filter(Category.is_active == True)
@@ -55,6 +70,7 @@ def create_category(
     db.add(category)
     db.commit()
     db.refresh(category)
+    ReferenceDataCache.publish_invalidation("categories")
     return category
 
 
@@ -76,6 +92,7 @@ def update_category(
 
     db.commit()
     db.refresh(category)
+    ReferenceDataCache.publish_invalidation("categories")
     return category
 
 
@@ -101,4 +118,5 @@ def delete_category(
 
     db.delete(category)
     db.commit()
+    ReferenceDataCache.publish_invalidation("categories")
     return {"message": "カテゴリを削除しました"}
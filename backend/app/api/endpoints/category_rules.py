@@ -7,6 +7,7 @@ from app.models.category_rule import CategoryRule, MatchType
 from app.models.category import Category
 from app.models.user import User
 from app.services.category_rule_service import CategoryRuleService
+from app.services.reference_cache import ReferenceDataCache
 
 router = APIRouter(prefix="/category-rules", tags=["分類ルール"])
 
@@ -79,6 +80,7 @@ def create_rule(
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    ReferenceDataCache.publish_invalidation("category_rules")
     return rule
 
 
@@ -109,6 +111,7 @@ def update_rule(
 
     db.commit()
     db.refresh(rule)
+    ReferenceDataCache.publish_invalidation("category_rules")
     return rule
 
 
@@ -125,6 +128,7 @@ def delete_rule(
 
     db.delete(rule)
     db.commit()
+    ReferenceDataCache.publish_invalidation("category_rules")
     return {"message": "ルールを削除しました"}
 
 
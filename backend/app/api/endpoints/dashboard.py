@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, or_
+from datetime import datetime
 from typing import Optional
 from decimal import Decimal
 from app.database import get_db
@@ -9,180 +9,336 @@ from app.models.user import User
 from app.models.expense import Expense
 from app.models.expense_item import ExpenseItem
 from app.models.category import Category
+from app.models.monthly_merchant_rollup import MonthlyMerchantRollup
 from app.api.deps import get_current_user
+from app.api.etag import build_etag, etag_matches, not_modified, set_cache_headers
+from app.api.responses import ORJSONResponse
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.services.dashboard_service import DashboardService
+from app.services.data_version_service import DataVersionService
+from app.services.response_cache import ResponseCache
+from app.services.spend_forecast_service import SpendForecastService
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.spend_trend_service import SpendTrendService
 
 router = APIRouter(prefix="/dashboard", tags=["ダッシュボード"])
 
 
 @router.get("/summary")
 def get_summary(
+    request: Request,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """サマリー情報を取得（ExpenseItemベース集計）"""
+    """サマリー情報を取得（日次集計ベース、期間は日単位）"""
     # デフォルトは今月
-    if not start_date:
-        start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if not end_date:
-        end_date = datetime.now()
+    default_start, default_end = DashboardService.current_month_period()
+    start_date = start_date or default_start
+    end_date = end_date or default_end
 
-    # 総支出（ExpenseItemの合計）
-    total_expenses = db.query(func.sum(ExpenseItem.line_total)).join(Expense).filter(
-        Expense.user_id == current_user.id,
-        Expense.occurred_at >= start_date,
-        Expense.occurred_at <= end_date
-    ).scalar() or 0
+    # 集計は日単位のため、キャッシュ・ETagも日付の範囲で共有する（ウォームアップと同じキー）
+    params = DashboardService.summary_params(start_date, end_date)
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"{DashboardService.SUMMARY_ENDPOINT}:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    # 出費件数（Expenseの件数）
-    expense_count = db.query(func.count(Expense.id)).filter(
-        Expense.user_id == current_user.id,
-        Expense.occurred_at >= start_date,
-        Expense.occurred_at <= end_date
-    ).scalar() or 0
+    response = ResponseCache.get_or_compute(
+        current_user.id,
+        DashboardService.SUMMARY_ENDPOINT,
+        params,
+        version,
+        lambda: DashboardService.build_summary(db, current_user.id, start_date, end_date)
+    )
+    return set_cache_headers(response, etag)
 
-    # 商品明細数
-    item_count = db.query(func.count(ExpenseItem.id)).join(Expense).filter(
-        Expense.user_id == current_user.id,
-        Expense.occurred_at >= start_date,
-        Expense.occurred_at <= end_date
-    ).scalar() or 0
-
-    # カテゴリ別集計（ExpenseItemベース）
-    category_breakdown = db.query(
-        Category.id,
-        Category.name,
-        Category.color,
-        func.sum(ExpenseItem.line_total).label('total'),
-        func.count(ExpenseItem.id).label('count')
-    ).join(ExpenseItem, ExpenseItem.category_id == Category.id)\
-     .join(Expense, ExpenseItem.expense_id == Expense.id)\
-     .filter(
-        Expense.user_id == current_user.id,
-        Expense.occurred_at >= start_date,
-        Expense.occurred_at <= end_date
-    ).group_by(Category.id, Category.name, Category.color).all()
-
-    # 日別集計（グラフ用）- Expenseの日付で、ExpenseItemの合計を集計
-    daily_expenses = db.query(
-        func.date(Expense.occurred_at).label('date'),
-        func.sum(ExpenseItem.line_total).label('total')
-    ).join(ExpenseItem, ExpenseItem.expense_id == Expense.id)\
-     .filter(
-        Expense.user_id == current_user.id,
-        Expense.occurred_at >= start_date,
-        Expense.occurred_at <= end_date
-    ).group_by(func.date(Expense.occurred_at)).order_by('date').all()
-
-    # 前月比較
-    prev_month_start = (start_date - timedelta(days=30)).replace(day=1)
-    prev_month_end = start_date - timedelta(days=1)
-    prev_month_total = db.query(func.sum(ExpenseItem.line_total)).join(Expense).filter(
+
+@router.get("/trends")
+def get_trends(
+    request: Request,
+    months: int = Query(12, ge=1, le=120),
+    group: str = Query("category", pattern="^(category|payment_method)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """月別の支出推移を取得（カテゴリ別または支払い方法別、日次集計ベース）"""
+    today = datetime.now().date()
+    params = {"months": months, "group": group, "today": today}
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"dashboard_trends:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    monthly = SpendTrendService.monthly(db, current_user.id, months, group, today)
+    response = ORJSONResponse(SpendTrendService.present(db, monthly, group))
+    return set_cache_headers(response, etag)
+
+
+@router.get("/forecast")
+def get_forecast(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """当月の月末支出の予測（カテゴリ別）と、当月の異常な日・明細を取得"""
+    today = datetime.now().date()
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"dashboard_forecast:{current_user.id}", version, {"today": today})
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = ResponseCache.get_or_compute(
+        current_user.id,
+        "dashboard_forecast",
+        {"today": today},
+        version,
+        lambda: SpendForecastService.forecast(db, current_user.id, today)
+    )
+    return set_cache_headers(response, etag)
+
+
+@router.get("/merchants")
+def get_merchants(
+    request: Request,
+    response: Response,
+    months: int = Query(3, ge=1, le=36),
+    limit: int = Query(20, ge=1, le=100),
+    order_by: str = Query("total", pattern="^(total|visits)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """店舗別の支出分析（上位店舗・来店頻度・平均客単価、月別店舗集計ベース）"""
+    today = datetime.now().date()
+    start_month = SpendTrendService.month_starts(months, today)[0]
+    params = {"months": months, "limit": limit, "order_by": order_by, "today": today}
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"dashboard_merchants:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    in_range = (
+        MonthlyMerchantRollup.user_id == current_user.id,
+        MonthlyMerchantRollup.month >= start_month
+    )
+    overall = db.query(
+        func.sum(MonthlyMerchantRollup.total_amount).label('total'),
+        func.sum(MonthlyMerchantRollup.visit_count).label('visits')
+    ).filter(*in_range).one()
+    overall_total = int(overall.total or 0)
+
+    total_col = func.sum(MonthlyMerchantRollup.total_amount)
+    visits_col = func.sum(MonthlyMerchantRollup.visit_count)
+    rows = db.query(
+        MonthlyMerchantRollup.merchant_key,
+        func.max(MonthlyMerchantRollup.merchant_name).label('merchant_name'),
+        total_col.label('total'),
+        visits_col.label('visits'),
+        func.count(MonthlyMerchantRollup.month).label('active_months'),
+        func.max(MonthlyMerchantRollup.last_visited_at).label('last_visited_at')
+    ).filter(*in_range)\
+     .group_by(MonthlyMerchantRollup.merchant_key)\
+     .order_by((total_col if order_by == "total" else visits_col).desc(), MonthlyMerchantRollup.merchant_key)\
+     .limit(limit).all()
+
+    return {
+        "period": {"start_month": str(start_month), "months": months},
+        "total_amount": overall_total,
+        "visit_count": int(overall.visits or 0),
+        "merchants": [
+            {
+                "merchant_key": row.merchant_key,
+                "merchant_name": row.merchant_name,
+                "total_amount": int(row.total),
+                "visit_count": int(row.visits),
+                "average_basket": round(int(row.total) / int(row.visits)) if row.visits else 0,
+                "visits_per_month": round(int(row.visits) / months, 2),
+                "active_months": row.active_months,
+                "share_percent": round(int(row.total) / overall_total * 100, 1) if overall_total > 0 else 0,
+                "last_visited_at": row.last_visited_at
+            }
+            for row in rows
+        ]
+    }
+
+
+@router.get("/merchants/{merchant_key}")
+def get_merchant_detail(
+    merchant_key: str,
+    request: Request,
+    response: Response,
+    months: int = Query(12, ge=1, le=36),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """店舗ごとの月別推移と最近の来店（idx_user_merchant_occurredを使う範囲スキャン）"""
+    today = datetime.now().date()
+    start_month = SpendTrendService.month_starts(months, today)[0]
+    params = {"merchant_key": merchant_key, "months": months, "limit": limit, "today": today}
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"dashboard_merchant:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    monthly = db.query(MonthlyMerchantRollup).filter(
+        MonthlyMerchantRollup.user_id == current_user.id,
+        MonthlyMerchantRollup.month >= start_month,
+        MonthlyMerchantRollup.merchant_key == merchant_key
+    ).order_by(MonthlyMerchantRollup.month).all()
+
+    recent = db.query(
+        Expense.id, Expense.occurred_at, Expense.merchant_name, Expense.title, Expense.total_amount
+    ).filter(
         Expense.user_id == current_user.id,
-        Expense.occurred_at >= prev_month_start,
-        Expense.occurred_at <= prev_month_end
-    ).scalar() or 0
+        Expense.merchant_key == merchant_key
+    ).order_by(Expense.occurred_at.desc()).limit(limit).all()
 
-    change_from_prev = float(total_expenses) - float(prev_month_total)
-    change_percent = (change_from_prev / float(prev_month_total) * 100) if prev_month_total > 0 else 0
+    if not monthly and not recent:
+        raise HTTPException(status_code=404, detail="店舗が見つかりません")
 
+    total = sum(m.total_amount for m in monthly)
+    visits = sum(m.visit_count for m in monthly)
     return {
-        "total_expenses": float(total_expenses),
-        "expense_count": expense_count,
-        "item_count": item_count,
-        "average_expense": float(total_expenses / expense_count) if expense_count > 0 else 0,
-        "category_breakdown": [
+        "merchant_key": merchant_key,
+        "merchant_name": recent[0].merchant_name if recent else monthly[-1].merchant_name,
+        "total_amount": total,
+        "visit_count": visits,
+        "average_basket": round(total / visits) if visits else 0,
+        "monthly": [
             {
-                "category_id": cat.id,
-                "category_name": cat.name,
-                "color": cat.color,
-                "total": float(cat.total),
-                "count": cat.count,
-                "percentage": float(cat.total / total_expenses * 100) if total_expenses > 0 else 0
+                "month": SpendRollupService.month_label(m.month),
+                "total_amount": m.total_amount,
+                "visit_count": m.visit_count
             }
-            for cat in category_breakdown
+            for m in monthly
         ],
-        "daily_expenses": [
+        "recent_visits": [
             {
-                "date": str(day.date),
-                "total": float(day.total)
+                "expense_id": row.id,
+                "occurred_at": row.occurred_at,
+                "title": row.title,
+                "total_amount": row.total_amount
             }
-            for day in daily_expenses
-        ],
-        "comparison": {
-            "previous_month_total": float(prev_month_total),
-            "change_amount": change_from_prev,
-            "change_percent": change_percent
-        },
-        "period": {
-            "start_date": str(start_date),
-            "end_date": str(end_date)
-        }
+            for row in recent
+        ]
     }
 
 
-@router.get("/recent-expenses")
-def get_recent_expenses(
-    limit: int = Query(10, ge=1, le=50),
+@router.get("/categories/{category_id}/items")
+def get_category_items(
+    category_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """最近の出費を取得"""
-    expenses = db.query(Expense).filter(
-        Expense.user_id == current_user.id
-    ).options(joinedload(Expense.items), joinedload(Expense.receipt))\
-     .order_by(Expense.occurred_at.desc(), Expense.created_at.desc())\
-     .limit(limit)\
-     .all()
-
-    # 全カテゴリIDのマップを一括取得（N+1問題の回避）
-    category_ids = set()
-    for expense in expenses:
-        for item in expense.items:
-            if item.category_id:
-                category_ids.add(item.category_id)
-
-    category_map = {}
-    if category_ids:
-        categories = db.query(Category).filter(Category.id.in_(category_ids)).all()
-        category_map = {cat.id: cat.name for cat in categories}
-
-    result = []
-    for expense in expenses:
-        # ExpenseItemsを全てカテゴリ名付きで返す
-        items_with_category = []
-        for item in expense.items:
-            items_with_category.append({
+    """
+    カテゴリの商品明細を新しい順に取得（ダッシュボードからの掘り下げ用）
+
+    明細を (発生日時, ID) のキーセットで直接辿るため、深いページでも先頭と同じコストで返せる。
+    次のページは応答の next_cursor を cursor に渡して取得する。
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "category_id": category_id,
+        "limit": limit,
+        "cursor": cursor,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"dashboard_category_items:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    category = db.query(Category).filter(Category.id == category_id).first()
+    if not category:
+        raise HTTPException(status_code=404, detail="カテゴリが見つかりません")
+
+    # idx_item_user_category_occurred の順に読み、親Expenseは返す行の分だけ主キーで引く
+    query = db.query(
+        ExpenseItem,
+        Expense.merchant_name,
+        Expense.title
+    ).join(Expense, Expense.id == ExpenseItem.expense_id)\
+     .filter(
+        ExpenseItem.user_id == current_user.id,
+        ExpenseItem.category_id == category_id
+    )
+    if start_date:
+        query = query.filter(ExpenseItem.occurred_at >= start_date)
+    if end_date:
+        query = query.filter(ExpenseItem.occurred_at <= end_date)
+    if after:
+        after_occurred_at, after_id = after
+        query = query.filter(or_(
+            ExpenseItem.occurred_at < after_occurred_at,
+            and_(ExpenseItem.occurred_at == after_occurred_at, ExpenseItem.id < after_id)
+        ))
+
+    rows = query.order_by(ExpenseItem.occurred_at.desc(), ExpenseItem.id.desc())\
+                .limit(limit + 1)\
+                .all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last_item = rows[-1][0] if rows else None
+
+    return {
+        "category": {"id": category.id, "name": category.name, "color": category.color},
+        "items": [
+            {
                 "id": item.id,
                 "expense_id": item.expense_id,
-                "position": item.position,
+                "occurred_at": item.occurred_at,
+                "merchant_name": merchant_name,
+                "expense_title": title,
                 "product_name": item.product_name,
                 "quantity": float(item.quantity) if item.quantity else None,
                 "unit_price": item.unit_price,
                 "line_total": item.line_total,
-                "category_id": item.category_id,
                 "category_source": item.category_source.value if item.category_source else None,
-                "ai_confidence": float(item.ai_confidence) if item.ai_confidence else None,
-                "category_name": category_map.get(item.category_id) if item.category_id else None
-            })
-
-        result.append({
-            "id": expense.id,
-            "user_id": expense.user_id,
-            "total_amount": float(expense.total_amount),
-            "occurred_at": expense.occurred_at,
-            "merchant_name": expense.merchant_name,
-            "title": expense.title,
-            "description": expense.description,
-            "note": expense.note,
-            "currency": expense.currency,
-            "payment_method": expense.payment_method,
-            "status": expense.status.value if hasattr(expense.status, 'value') else expense.status,
-            "created_at": expense.created_at,
-            "updated_at": expense.updated_at,
-            "items": items_with_category,
-            "receipt": {"id": expense.receipt.id, "file_path": expense.receipt.file_path} if expense.receipt else None
-        })
-
-    return result
+                "ai_confidence": float(item.ai_confidence) if item.ai_confidence else None
+            }
+            for item, merchant_name, title in rows
+        ],
+        "next_cursor": encode_cursor(last_item.occurred_at, last_item.id) if has_more else None
+    }
+
+
+@router.get("/recent-expenses")
+def get_recent_expenses(
+    request: Request,
+    limit: int = Query(DashboardService.RECENT_EXPENSES_DEFAULT_LIMIT, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """最近の出費を取得"""
+    params = DashboardService.recent_expenses_params(limit)
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"{DashboardService.RECENT_EXPENSES_ENDPOINT}:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = ResponseCache.get_or_compute(
+        current_user.id,
+        DashboardService.RECENT_EXPENSES_ENDPOINT,
+        params,
+        version,
+        lambda: DashboardService.build_recent_expenses(db, current_user.id, limit)
+    )
+    return set_cache_headers(response, etag)
+
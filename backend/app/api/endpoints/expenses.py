@@ -1,13 +1,13 @@
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, or_
 from app.database import get_db
 from app.models.user import User
 from app.models.expense import Expense, ExpenseStatus
 from app.models.expense_item import ExpenseItem, CategorySource
-from app.models.category import Category
 from app.schemas.expense import (
     Expense as ExpenseSchema,
     ExpenseCreate,
@@ -15,20 +15,36 @@ from app.schemas.expense import (
     ExpenseWithReceipt,
     ExpenseListResponse,
     ManualExpenseCreate,
-    ExpenseItemWithCategory,
+    BulkManualExpenseCreate,
+    BulkManualExpenseResponse,
+    BulkItemRecategorize,
+    BulkItemRecategorizeResponse,
     ExpenseItemUpdate,
     ExpenseItem as ExpenseItemSchema
 )
 from app.api.deps import get_current_user
-from app.tasks.ai_tasks import classify_expense_task, classify_expense_item_task
+from app.api.etag import build_etag, etag_matches, not_modified, set_cache_headers
+from app.api.responses import ORJSONResponse
+from app.services.data_version_service import DataVersionService
+from app.services.expense_view_service import ExpenseViewService
+from app.services.expense_search_service import ExpenseSearchService
+from app.services.manual_expense_service import ManualExpenseService
+from app.services.item_category_service import ItemCategoryService
+from app.services.expense_export_service import ExpenseExportService, MEDIA_TYPES
+from app.utils.cursor import encode_expense_cursor, decode_expense_cursor, decode_search_cursor
+from app.services.expense_event_service import ExpenseEventService, ExpenseEvent
+from app.tasks.ai_tasks import classify_expense_item_task, classify_expenses_task, enqueue_reclassify
 
 router = APIRouter(prefix="/expenses", tags=["出費管理"])
 
 
 @router.get("/", response_model=ExpenseListResponse)
 def list_expenses(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor（指定時はキーセットページング）"),
+    paging: str = Query("offset", pattern="^(offset|cursor)$", description="cursor: 件数を数えずキーセットで取得"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     category_id: Optional[int] = None,
@@ -36,7 +52,34 @@ def list_expenses(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """出費一覧を取得"""
+    """
+    出費一覧を取得（発生日時・作成日時・IDの降順）
+
+    paging=cursor または cursor を指定するとキーセットページングになり、
+    skip と総件数（total）の集計を行わない。次のページは next_cursor を cursor に渡して取得する。
+    既定のオフセット方式では従来どおり total を返す。
+    """
+    keyset = cursor is not None or paging == "cursor"
+    try:
+        after = decode_expense_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "skip": None if keyset else skip,
+        "limit": limit,
+        "cursor": cursor,
+        "keyset": keyset,
+        "start_date": start_date,
+        "end_date": end_date,
+        "category_id": category_id,
+        "status": status.value if status else None
+    }
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"expenses:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     query = db.query(Expense).filter(Expense.user_id == current_user.id)
 
     if start_date:
@@ -46,46 +89,114 @@ def list_expenses(
     if status:
         query = query.filter(Expense.status == status)
 
-    # カテゴリIDでフィルタする場合、ExpenseItemsを介してフィルタ
+    # カテゴリIDでフィルタする場合、ExpenseItemsの存在で絞る（JOINでは出費が明細数だけ重複するため）
     if category_id:
-        query = query.join(ExpenseItem).filter(ExpenseItem.category_id == category_id)
-
-    total = query.count()
-    expenses = query.options(joinedload(Expense.items), joinedload(Expense.receipt))\
-                    .order_by(Expense.occurred_at.desc(), Expense.created_at.desc())\
-                    .offset(skip)\
-                    .limit(limit)\
-                    .all()
-
-    # カテゴリIDのマップを一括取得（N+1問題の回避）
-    all_category_ids = set()
-    for expense in expenses:
-        for item in expense.items:
-            if item.category_id:
-                all_category_ids.add(item.category_id)
-
-    category_map = {}
-    if all_category_ids:
-        categories = db.query(Category).filter(Category.id.in_(all_category_ids)).all()
-        category_map = {cat.id: cat.name for cat in categories}
-
-    # ExpenseItemsにカテゴリ名を付与
-    result_expenses = []
-    for expense in expenses:
-        expense_dict = ExpenseWithReceipt.model_validate(expense)
-
-        # ItemsにCategory名を付与
-        items_with_category = []
-        for item in expense.items:
-            item_dict = ExpenseItemWithCategory.model_validate(item)
-            if item.category_id and item.category_id in category_map:
-                item_dict.category_name = category_map[item.category_id]
-            items_with_category.append(item_dict)
-
-        expense_dict.items = items_with_category
-        result_expenses.append(expense_dict)
-
-    return ExpenseListResponse(total=total, expenses=result_expenses)
+        query = query.filter(Expense.items.any(ExpenseItem.category_id == category_id))
+
+    total = None if keyset else query.count()
+
+    if after:
+        after_occurred_at, after_created_at, after_id = after
+        query = query.filter(or_(
+            Expense.occurred_at < after_occurred_at,
+            and_(Expense.occurred_at == after_occurred_at, Expense.created_at < after_created_at),
+            and_(
+                Expense.occurred_at == after_occurred_at,
+                Expense.created_at == after_created_at,
+                Expense.id < after_id
+            )
+        ))
+
+    # idx_user_occurred_created の順に読み、1件多く取得して次のページの有無を判定する
+    query = query.options(*ExpenseViewService.load_options())\
+                 .order_by(Expense.occurred_at.desc(), Expense.created_at.desc(), Expense.id.desc())
+    if not keyset:
+        query = query.offset(skip)
+    expenses = query.limit(limit + 1).all()
+
+    has_more = len(expenses) > limit
+    expenses = expenses[:limit]
+    last = expenses[-1] if expenses else None
+    next_cursor = (
+        encode_expense_cursor(last.occurred_at, last.created_at, last.id) if has_more else None
+    )
+
+    # 組み立てた辞書をそのまま出力する（ExpenseListResponseはドキュメント用）
+    response = ORJSONResponse({
+        "total": total,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "expenses": ExpenseViewService.to_dicts(db, expenses)
+    })
+    return set_cache_headers(response, etag)
+
+
+@router.get("/search")
+def search_expenses(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="検索語（店舗名・タイトル・商品名）"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor"),
+    include_ocr: bool = Query(False, description="レシートのOCR全文も検索する"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    出費を全文検索（一致度・IDの降順）
+
+    検索語はカテゴリルールと同じ正規化（全角/半角・カタカナ/ひらがな等）をしてから照合する。
+    次のページは next_cursor を cursor に渡して取得する。
+    """
+    try:
+        after = decode_search_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "q": q,
+        "limit": limit,
+        "cursor": cursor,
+        "include_ocr": include_ocr,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+    version = DataVersionService.get_user_data_version(current_user.id, db)
+    etag = build_etag(f"expense_search:{current_user.id}", version, params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    result = ExpenseSearchService.search(
+        db, current_user.id, q, limit,
+        after=after, include_ocr=include_ocr, start=start_date, end=end_date
+    )
+    return set_cache_headers(ORJSONResponse(result), etag)
+
+
+@router.get("/export")
+def export_expenses(
+    format: str = Query("csv", pattern="^(csv|jsonl)$", description="csv または jsonl"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    出費を明細単位でエクスポート（発生日時の古い順）
+
+    明細1行ごとに出費の項目とカテゴリ名を付けて出力する。
+    出費をページごとに短いトランザクションで読んでから送信するため、期間が長くてもメモリ使用量は一定で、
+    送信が遅くても接続を保持し続けない。
+    """
+    filename = f"expenses_{datetime.now():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        ExpenseExportService.stream(current_user.id, format, start_date, end_date),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        }
+    )
 
 
 @router.get("/{expense_id}", response_model=ExpenseWithReceipt)
@@ -98,30 +209,53 @@ def get_expense(
     expense = db.query(Expense).filter(
         Expense.id == expense_id,
         Expense.user_id == current_user.id
-    ).options(joinedload(Expense.items), joinedload(Expense.receipt)).first()
+    ).options(*ExpenseViewService.load_options()).first()
 
     if not expense:
         raise HTTPException(status_code=404, detail="出費が見つかりません")
 
-    expense_dict = ExpenseWithReceipt.model_validate(expense)
+    return ORJSONResponse(ExpenseViewService.to_dict(expense, ExpenseViewService.category_names(db)))
 
-    # カテゴリIDのマップを一括取得（N+1問題の回避）
-    category_ids = {item.category_id for item in expense.items if item.category_id}
-    category_map = {}
-    if category_ids:
-        categories = db.query(Category).filter(Category.id.in_(category_ids)).all()
-        category_map = {cat.id: cat.name for cat in categories}
 
-    # ItemsにCategory名を付与
-    items_with_category = []
-    for item in expense.items:
-        item_dict = ExpenseItemWithCategory.model_validate(item)
-        if item.category_id and item.category_id in category_map:
-            item_dict.category_name = category_map[item.category_id]
-        items_with_category.append(item_dict)
+@router.get("/{expense_id}/events")
+def stream_expense_events(
+    expense_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    出費の処理進捗をServer-Sent Eventsで配信
 
-    expense_dict.items = items_with_category
-    return expense_dict
+    接続直後に現在の状態を送り、以降はOCR・分類タスクが発行するイベントを中継する。
+    completed / failed を送信した時点でストリームを終了する。
+    """
+    expense = db.query(Expense).filter(
+        Expense.id == expense_id,
+        Expense.user_id == current_user.id
+    ).first()
+
+    if not expense:
+        raise HTTPException(status_code=404, detail="出費が見つかりません")
+
+    status_value = expense.status.value if hasattr(expense.status, 'value') else expense.status
+    # 既に処理が終わっている場合は終了イベントとして返す
+    if status_value == ExpenseStatus.COMPLETED.value:
+        snapshot_event = ExpenseEvent.COMPLETED
+    elif status_value == ExpenseStatus.FAILED.value:
+        snapshot_event = ExpenseEvent.FAILED
+    else:
+        snapshot_event = ExpenseEvent.STATUS
+    snapshot = ExpenseEventService.build_event(expense_id, snapshot_event, status=status_value)
+
+    return StreamingResponse(
+        ExpenseEventService.stream(expense_id, snapshot, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # リバースプロキシのバッファリングを無効化
+        }
+    )
 
 
 @router.post("/manual", response_model=ExpenseSchema)
@@ -132,17 +266,14 @@ def create_manual_expense(
 ):
     """手入力で出費を登録（ExpenseItem自動作成）"""
     # ステータスを事前に決定
-    if expense_in.category_id or expense_in.skip_ai_classification:
-        initial_status = ExpenseStatus.COMPLETED
-    else:
-        initial_status = ExpenseStatus.PROCESSING
+    initial_status = ManualExpenseService.initial_status(expense_in)
 
     # Expense（決済ヘッダ）作成
     expense = Expense(
         user_id=current_user.id,
         occurred_at=expense_in.occurred_at,
         merchant_name=expense_in.merchant_name,
-        title=expense_in.merchant_name or expense_in.product_name or "手入力",
+        title=ManualExpenseService.title_of(expense_in),
         total_amount=expense_in.total_amount,
         payment_method=expense_in.payment_method,
         description=expense_in.description,
@@ -154,7 +285,7 @@ def create_manual_expense(
     db.flush()  # IDを取得
 
     # ExpenseItem作成（最低1つ）
-    product_name = expense_in.product_name or expense_in.note or expense_in.merchant_name or "購入品"
+    product_name = ManualExpenseService.product_name_of(expense_in)
     expense_item = ExpenseItem(
         expense_id=expense.id,
         position=0,
@@ -168,12 +299,74 @@ def create_manual_expense(
     db.refresh(expense)
 
     # AI分類が必要な場合のみタスク起動
+    # QUEUEDは投入前に発行する（先に完了したタスクの終了イベントを上書きしないため）
     if initial_status == ExpenseStatus.PROCESSING:
+        ExpenseEventService.publish(expense.id, ExpenseEvent.QUEUED, status=initial_status.value)
         classify_expense_item_task.delay(expense_item.id)
 
     return expense
 
 
+@router.post("/bulk", response_model=BulkManualExpenseResponse)
+def create_manual_expenses_bulk(
+    bulk_in: BulkManualExpenseCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    手入力の出費をまとめて登録（1件ずつの /manual と同じ内容）
+
+    全件を検証してから1トランザクションで登録し、AI分類が必要な出費は
+    1つのタスクでまとめて分類する。1件でも不正な値があれば何も登録しない。
+    """
+    errors = ManualExpenseService.validate(db, bulk_in.expenses)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    results = ManualExpenseService.create_manual_bulk(db, current_user.id, bulk_in.expenses)
+    db.commit()
+
+    # AI分類が必要な出費だけをまとめて1タスクで分類
+    processing_ids = [r["id"] for r in results if r["status"] == ExpenseStatus.PROCESSING.value]
+    if processing_ids:
+        # QUEUEDは投入前に発行する（先に完了したタスクの終了イベントを上書きしないため）
+        for expense_id in processing_ids:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.QUEUED, status=ExpenseStatus.PROCESSING.value)
+        classify_expenses_task.delay(processing_ids)
+
+    return {
+        "created": len(results),
+        "classification_queued": len(processing_ids),
+        "expenses": results
+    }
+
+
+@router.patch("/items", response_model=BulkItemRecategorizeResponse)
+def recategorize_expense_items(
+    bulk_in: BulkItemRecategorize,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    複数の商品明細のカテゴリをまとめて変更（決定ソースはmanual）
+
+    1件でも見つからない・他のユーザーの明細があれば何も変更しない。
+    """
+    if not ItemCategoryService.active_category_ids(db, [bulk_in.category_id]):
+        raise HTTPException(status_code=404, detail="カテゴリが見つかりません")
+
+    item_ids = sorted(set(bulk_in.item_ids))
+    rows = ItemCategoryService.find_owned(db, current_user.id, item_ids)
+    if len(rows) != len(item_ids):
+        found = {row.id for row in rows}
+        missing = [item_id for item_id in item_ids if item_id not in found]
+        raise HTTPException(status_code=404, detail=f"商品明細が見つかりません: {missing}")
+
+    result = ItemCategoryService.recategorize(db, current_user.id, rows, bulk_in.category_id)
+    db.commit()
+    return {**result, "category_id": bulk_in.category_id}
+
+
 @router.put("/{expense_id}", response_model=ExpenseSchema)
 def update_expense(
     expense_id: int,
@@ -240,24 +433,22 @@ def reclassify_expense(
     if not expense:
         raise HTTPException(status_code=404, detail="出費が見つかりません")
 
-    # 全ExpenseItemsを再分類
-    items = db.query(ExpenseItem).filter(ExpenseItem.expense_id == expense_id).all()
+    item_count = db.query(func.count(ExpenseItem.id)).filter(ExpenseItem.expense_id == expense_id).scalar() or 0
 
-    if not items:
+    if item_count == 0:
         return {"message": "再分類する商品がありません"}
 
-    # 各ItemのAI分類タスクを起動
-    for item in items:
-        # カテゴリをクリアしてAI分類対象にする
-        item.category_id = None
-        item.category_source = None
-        item.ai_confidence = None
-        classify_expense_item_task.delay(item.id)
-
+    # カテゴリのクリアと分類はExpense単位の一括タスクで行う
+    # 短時間に重複したリクエストは待機中の1タスクにまとめられる
     expense.status = ExpenseStatus.PROCESSING
     db.commit()
 
-    return {"message": f"{len(items)}個の商品の再分類を開始しました"}
+    # QUEUEDは投入前に発行する（まとめられた場合も待機中のタスクはまだ開始していない）
+    ExpenseEventService.publish(expense_id, ExpenseEvent.QUEUED, status=ExpenseStatus.PROCESSING.value)
+    if not enqueue_reclassify(expense_id):
+        return {"message": "再分類は既に受け付けています"}
+
+    return {"message": f"{item_count}個の商品の再分類を開始しました"}
 
 
 @router.put("/{expense_id}/items/{item_id}", response_model=ExpenseItemSchema)
@@ -0,0 +1,214 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_admin, get_current_user, get_db
+from app.api.etag import build_etag, etag_matches, not_modified, set_cache_headers
+from app.api.responses import ORJSONResponse
+from app.models.household import Household
+from app.models.user import User
+from app.services.dashboard_service import DashboardService
+from app.services.data_version_service import DataVersionService
+from app.services.household_service import HouseholdService
+
+router = APIRouter(prefix="/households", tags=["世帯"])
+
+
+class HouseholdCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    member_ids: List[int] = Field(default_factory=list)
+
+
+class HouseholdUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    member_ids: Optional[List[int]] = None
+
+
+class HouseholdMember(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+
+
+class HouseholdResponse(BaseModel):
+    id: int
+    name: str
+    members: List[HouseholdMember]
+
+
+def _to_response(household: Household) -> HouseholdResponse:
+    return HouseholdResponse(
+        id=household.id,
+        name=household.name,
+        members=[
+            HouseholdMember(id=member.id, username=member.username, full_name=member.full_name)
+            for member in household.members
+        ]
+    )
+
+
+def _get_own_household(current_user: User, db: Session) -> Household:
+    if current_user.household_id is None:
+        raise HTTPException(status_code=404, detail="世帯に所属していません")
+    household = db.query(Household).filter(Household.id == current_user.household_id).first()
+    if not household:
+        raise HTTPException(status_code=404, detail="世帯が見つかりません")
+    return household
+
+
+def _set_members(db: Session, household: Household, member_ids: List[int]) -> None:
+    users = db.query(User).filter(User.id.in_(member_ids)).all() if member_ids else []
+    if len(users) != len(set(member_ids)):
+        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+    for user in users:
+        if user.household_id is not None and user.household_id != household.id:
+            raise HTTPException(status_code=400, detail=f"{user.username} は既に別の世帯に所属しています")
+    household.members = users
+
+
+@router.get("/me", response_model=HouseholdResponse)
+def get_my_household(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """所属する世帯とメンバーを取得"""
+    return _to_response(_get_own_household(current_user, db))
+
+
+@router.get("/me/summary")
+def get_household_summary(
+    request: Request,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """世帯のサマリーを取得（メンバーごとのサマリーを合算）"""
+    household = _get_own_household(current_user, db)
+    default_start, default_end = DashboardService.current_month_period()
+    start_date = start_date or default_start
+    end_date = end_date or default_end
+
+    # いずれかのメンバーの書き込みで版が変わる（メンバーの増減でも変わる）
+    versions = DataVersionService.get_users_data_versions([member.id for member in household.members], db)
+    params = DashboardService.summary_params(start_date, end_date)
+    etag = build_etag(f"household_summary:{household.id}", HouseholdService.composite_version(versions), params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = ORJSONResponse(HouseholdService.summary(db, household.members, versions, start_date, end_date))
+    return set_cache_headers(response, etag)
+
+
+@router.get("/me/trends")
+def get_household_trends(
+    request: Request,
+    months: int = Query(12, ge=1, le=120),
+    group: str = Query("category", pattern="^(category|payment_method)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """世帯の月別の支出推移を取得（メンバーごとの月別推移を合算）"""
+    household = _get_own_household(current_user, db)
+    today = datetime.now().date()
+    versions = DataVersionService.get_users_data_versions([member.id for member in household.members], db)
+    params = {"months": months, "group": group, "today": today}
+    etag = build_etag(f"household_trends:{household.id}", HouseholdService.composite_version(versions), params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = ORJSONResponse(HouseholdService.trends(db, household.members, months, group, today))
+    return set_cache_headers(response, etag)
+
+
+@router.get("/me/categories")
+def get_household_categories(
+    request: Request,
+    month: Optional[str] = Query(None, description="対象月（YYYY-MM、省略時は今月）"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """世帯の月のカテゴリ別合計とメンバーごとの内訳を取得"""
+    household = _get_own_household(current_user, db)
+    if month:
+        try:
+            month_start = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="月は YYYY-MM 形式で指定してください")
+    else:
+        month_start = datetime.now().date().replace(day=1)
+
+    versions = DataVersionService.get_users_data_versions([member.id for member in household.members], db)
+    etag = build_etag(
+        f"household_categories:{household.id}", HouseholdService.composite_version(versions), {"month": month_start}
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = ORJSONResponse(HouseholdService.categories(db, household.members, month_start))
+    return set_cache_headers(response, etag)
+
+
+@router.get("/", response_model=List[HouseholdResponse])
+def list_households(
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """世帯一覧を取得（管理者のみ）"""
+    households = db.query(Household).order_by(Household.id).all()
+    return [_to_response(household) for household in households]
+
+
+@router.post("/", response_model=HouseholdResponse)
+def create_household(
+    household_in: HouseholdCreate,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """世帯を作成してメンバーを所属させる（管理者のみ）"""
+    household = Household(name=household_in.name)
+    db.add(household)
+    _set_members(db, household, household_in.member_ids)
+    db.commit()
+    db.refresh(household)
+    return _to_response(household)
+
+
+@router.put("/{household_id}", response_model=HouseholdResponse)
+def update_household(
+    household_id: int,
+    household_in: HouseholdUpdate,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """世帯の名前・メンバーを更新（管理者のみ、member_idsは全メンバーを指定）"""
+    household = db.query(Household).filter(Household.id == household_id).first()
+    if not household:
+        raise HTTPException(status_code=404, detail="世帯が見つかりません")
+
+    if household_in.name is not None:
+        household.name = household_in.name
+    if household_in.member_ids is not None:
+        _set_members(db, household, household_in.member_ids)
+
+    db.commit()
+    db.refresh(household)
+    return _to_response(household)
+
+
+@router.delete("/{household_id}")
+def delete_household(
+    household_id: int,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """世帯を削除（管理者のみ、メンバーのユーザーは残る）"""
+    household = db.query(Household).filter(Household.id == household_id).first()
+    if not household:
+        raise HTTPException(status_code=404, detail="世帯が見つかりません")
+
+    household.members = []
+    db.delete(household)
+    db.commit()
+    return {"message": "世帯を削除しました"}
@@ -0,0 +1,90 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_admin
+from app.config import settings
+from app.database import get_db
+from app.models.expense_item import ExpenseItem
+from app.models.user import User
+from app.services.backfill_service import ClassificationBackfillService, BackfillStatus
+from app.tasks.maintenance_tasks import backfill_classification_task
+
+router = APIRouter(prefix="/maintenance", tags=["メンテナンス"])
+
+
+class BackfillStartRequest(BaseModel):
+    batch_size: Optional[int] = Field(None, ge=1, le=200)
+    rate_per_minute: Optional[int] = Field(None, ge=0)  # 0: 上限なし
+    restart: bool = False  # Trueの場合はチェックポイントを破棄して最初から
+
+
+@router.get("/backfill-classification")
+def get_backfill_status(
+    current_user: User = Depends(get_current_admin)
+):
+    """未分類商品の一括分類の進捗を取得（管理者のみ）"""
+    state = ClassificationBackfillService.get_state()
+    if not state:
+        return {"status": None}
+    return ClassificationBackfillService.describe(state)
+
+
+@router.post("/backfill-classification")
+def start_backfill(
+    request_in: BackfillStartRequest,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    未分類商品の一括分類を開始（管理者のみ）
+
+    一時停止・中断したジョブがある場合はチェックポイントから再開する。
+    """
+    state = ClassificationBackfillService.get_state()
+
+    if ClassificationBackfillService.is_active(state) and not request_in.restart:
+        raise HTTPException(status_code=409, detail="一括分類は既に実行中です")
+
+    resumable = state and state["status"] in (BackfillStatus.RUNNING, BackfillStatus.PAUSED)
+    if resumable and not request_in.restart:
+        state = ClassificationBackfillService.resume_state(state)
+        if request_in.batch_size:
+            state["batch_size"] = request_in.batch_size
+        if request_in.rate_per_minute is not None:
+            state["rate_per_minute"] = request_in.rate_per_minute
+    else:
+        # 開始時点の最大IDまでを対象にし、実行中に追加された商品は通常の分類フローに任せる
+        max_item_id = db.query(func.max(ExpenseItem.id)).scalar() or 0
+        total = db.query(func.count(ExpenseItem.id)).filter(
+            ExpenseItem.id <= max_item_id,
+            ExpenseItem.category_id.is_(None)
+        ).scalar() or 0
+        state = ClassificationBackfillService.new_state(
+            job_id=uuid.uuid4().hex,
+            max_item_id=max_item_id,
+            total=total,
+            batch_size=request_in.batch_size or settings.CLASSIFICATION_BATCH_SIZE,
+            rate_per_minute=(
+                request_in.rate_per_minute
+                if request_in.rate_per_minute is not None
+                else settings.BACKFILL_RATE_PER_MINUTE
+            ),
+        )
+
+    ClassificationBackfillService.save_state(state)
+    backfill_classification_task.delay(state["job_id"], state["step"])
+    return ClassificationBackfillService.describe(state)
+
+
+@router.delete("/backfill-classification")
+def cancel_backfill(
+    current_user: User = Depends(get_current_admin)
+):
+    """未分類商品の一括分類を停止（管理者のみ、チェックポイントは保持され再開可能）"""
+    state = ClassificationBackfillService.pause()
+    if not state:
+        raise HTTPException(status_code=404, detail="実行中の一括分類はありません")
+    return ClassificationBackfillService.describe(state)
@@ -8,6 +8,7 @@ from app.models.expense import Expense, ExpenseStatus
 from app.models.receipt import Receipt
 from app.api.deps import get_current_user
 from app.services.image_service import ImageService
+from app.services.expense_event_service import ExpenseEventService, ExpenseEvent
 from app.tasks.ocr_tasks import process_receipt_ocr
 from app.config import settings
 import os
@@ -66,6 +67,8 @@ async def upload_receipt(
 
         # 自動処理フラグがTrueの場合、OCRタスクを実行
         if auto_process:
+            # QUEUEDは投入前に発行する（先に完了したタスクの終了イベントを上書きしないため）
+            ExpenseEventService.publish(expense.id, ExpenseEvent.QUEUED, status=ExpenseStatus.PENDING.value)
             process_receipt_ocr.delay(expense.id, skip_ai=False)
 
         return {
@@ -98,7 +101,14 @@ def process_receipt(
     if not receipt:
         raise HTTPException(status_code=404, detail="レシートが見つかりません")
 
+    # 手動で再処理する場合は自動再試行の回数をリセット
+    expense.retry_count = 0
+    expense.next_retry_at = None
+    db.commit()
+
     # OCRタスクを実行
+    # QUEUEDは投入前に発行する（先に完了したタスクの終了イベントを上書きしないため）
+    ExpenseEventService.publish(expense_id, ExpenseEvent.QUEUED, status=expense.status.value)
     process_receipt_ocr.delay(expense_id, skip_ai=skip_ai)
 
     return {"message": "OCR処理を開始しました"}
@@ -0,0 +1,53 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+
+# 応答はユーザーごとに異なるため共有キャッシュには保存させず、毎回ETagで再検証させる
+CACHE_CONTROL = "private, no-cache"
+VARY = "Authorization"
+
+
+def build_etag(scope: str, version: Optional[str], params: Dict[str, Any]) -> Optional[str]:
+    """
+    データ版数とパラメータから強いETagを生成
+
+    版数が取得できない場合（Redis障害時）はNoneを返し、ETagを付けない。
+    """
+    if version is None:
+        return None
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha1(f"{scope}:{version}:{params_json}".encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """If-None-MatchがETagと一致するか（If-None-Matchは弱い比較で判定する）"""
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def set_cache_headers(response: Response, etag: Optional[str]) -> Response:
+    """ETagと再検証用のキャッシュヘッダーを付与"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = VARY
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    """304 Not Modified（本文なし）"""
+    return set_cache_headers(Response(status_code=304), etag)
@@ -0,0 +1,15 @@
+from typing import Any
+from fastapi.responses import JSONResponse
+from app.utils.serialization import dumps
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    orjsonでシリアライズするJSON応答
+
+    エンドポイントが組み立てた辞書をPydanticの検証を通さずにそのまま出力する。
+    この応答を返すエンドポイントの response_model はAPIドキュメント用の宣言になる。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -68,6 +68,29 @@ class Settings(BaseSettings):
     CLAUDE_CLI_PATH: str = "claude"
     CLAUDE_MODEL: str = "claude-sonnet-4-5-20250929"
 
+    # Celery
+    CELERY_RESULT_EXPIRES: int = 3600  # 結果を保存するタスクの結果保持期間（秒）
+    CELERY_RESULT_MAX_BYTES: int = 16384  # 保存を許可する結果の最大サイズ（バイト）
+
+    # Classification
+    CLASSIFICATION_BATCH_SIZE: int = 30  # 1回のcodex execでまとめて分類する最大商品数
+    RECLASSIFY_DEBOUNCE_SECONDS: int = 3  # 再分類リクエストをまとめる待ち時間（秒）
+    BACKFILL_RATE_PER_MINUTE: int = 60  # 一括再分類（バックフィル）で処理する最大商品数/分
+
+    # Retry (failed / stalled receipts)
+    RETRY_SWEEP_INTERVAL_SECONDS: int = 300  # 失敗レシートの再試行スイープ間隔（秒）
+    RETRY_MAX_ATTEMPTS: int = 5  # 自動再試行の上限回数
+    RETRY_BASE_DELAY_SECONDS: int = 300  # 再試行間隔の基準（試行ごとに倍）
+    RETRY_STALE_PROCESSING_MINUTES: int = 30  # この時間PROCESSINGのままなら停止とみなす
+    RETRY_SWEEP_LIMIT: int = 20  # 1回のスイープで再投入する最大件数
+    CODEX_CIRCUIT_FAILURE_THRESHOLD: int = 5  # この回数連続で失敗したら回路を開く
+    CODEX_CIRCUIT_WINDOW_SECONDS: int = 300  # 失敗回数を数える期間（秒）
+    CODEX_CIRCUIT_COOLDOWN_SECONDS: int = 600  # 回路を開いておく時間（秒）
+
+    # Dashboard cache
+    DASHBOARD_CACHE_TTL_SECONDS: int = 600  # ダッシュボード応答キャッシュの保持期間（秒、0で無効）
+    DASHBOARD_WARMUP_DELAY_SECONDS: int = 10  # 処理完了後のウォームアップをまとめる待ち時間（秒、負の値で無効）
+
     # Application
     BACKEND_PORT: int = 8000
     FRONTEND_PORT: int = 5173
@@ -1,10 +1,15 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 from app.config import settings
 from app.database import engine, Base, SessionLocal
 from app.api.endpoints import auth, users, categories, expenses, receipts, dashboard, ai_settings
 from app.api.endpoints import category_rules
+from app.api.endpoints import maintenance
+from app.api.endpoints import budgets
+from app.api.responses import ORJSONResponse
+from app.api.endpoints import households
 import os
 import logging
 import time
@@ -15,9 +20,14 @@ logger = logging.getLogger(__name__)
 
 # モデルをインポート（テーブル作成のため）
 from app.models import user, category, expense, expense_item, receipt, ai_settings as ai_settings_model, category_rule
+from app.models import daily_spend_rollup, monthly_merchant_rollup, monthly_category_rollup, budget, household
 from app.models.user import User
 from app.models.category import Category
 from app.utils.security import get_password_hash
+from app.services.task_metrics import TaskMetrics
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.data_version_service import DataVersionService
+from app.services.budget_service import BudgetService
 
 logger.info("🚀 Starting AI Kakeibo API...")
 
@@ -25,10 +35,17 @@ logger.info("🚀 Starting AI Kakeibo API...")
 Base.metadata.create_all(bind=engine)
 logger.info("✅ Database tables created/verified")
 
+# 出費・明細の書き込み時に日次集計を同じトランザクションで更新し、commit後にデータ版数を進める
+# （予算の閾値通知も集計の更新に合わせてcommit後に発行する）
+SpendRollupService.install(SessionLocal)
+DataVersionService.install(SessionLocal)
+BudgetService.install(SessionLocal)
+
 app = FastAPI(
     title="AI家計簿 API",
     description="AIを利用した家計簿アプリケーション",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # リクエストログミドルウェア
@@ -52,6 +69,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache"],
 )
 
 # APIルーター登録
@@ -63,6 +81,9 @@ app.include_router(receipts.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
 app.include_router(ai_settings.router, prefix="/api")
 app.include_router(category_rules.router, prefix="/api")
+app.include_router(maintenance.router, prefix="/api")
+app.include_router(budgets.router, prefix="/api")
+app.include_router(households.router, prefix="/api")
 
 # 静的ファイル（レシート画像）
 if os.path.exists(settings.UPLOAD_DIR):
@@ -177,6 +198,12 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Celeryタスクのメトリクス（Prometheusテキスト形式）"""
+    return TaskMetrics.render_prometheus()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=settings.BACKEND_PORT)
@@ -4,5 +4,11 @@ from app.models.expense import Expense
 from app.models.expense_item import ExpenseItem
 from app.models.receipt import Receipt
 from app.models.category_rule import CategoryRule
+from app.models.daily_spend_rollup import DailySpendRollup
+from app.models.monthly_merchant_rollup import MonthlyMerchantRollup
+from app.models.monthly_category_rollup import MonthlyCategoryRollup
+from app.models.budget import Budget
+from app.models.household import Household
 
-__all__ = ["User", "Category", "Expense", "ExpenseItem", "Receipt", "CategoryRule"]
+__all__ = ["User", "Category", "Expense", "ExpenseItem", "Receipt", "CategoryRule", "DailySpendRollup", "MonthlyMerchantRollup",
+           "MonthlyCategoryRollup", "Budget", "Household"]
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Budget(Base):
+    """カテゴリ別の月予算（ユーザーごと）"""
+
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
+    amount = Column(Integer, nullable=False)  # 月の予算額（円）
+    alert_thresholds = Column(String(50), nullable=False, default="80,100")  # 通知する消化率（%、カンマ区切り）
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    category = relationship("Category")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'category_id', name='uq_budget_user_category'),
+    )
+
+    @property
+    def threshold_percents(self):
+        """通知する消化率（%）の昇順リスト"""
+        values = []
+        for part in (self.alert_thresholds or "").split(","):
+            part = part.strip()
+            if part.isdigit():
+                values.append(int(part))
+        return sorted(set(values))
+
+    def __repr__(self) -> str:
+        return f"<Budget(id={self.id}, user_id={self.user_id}, category_id={self.category_id}, amount={self.amount})>"
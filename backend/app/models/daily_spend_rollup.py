@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class DailySpendRollup(Base):
+    """
+    日次の支出集計（ユーザー×日付×カテゴリ×支払い方法）
+
+    ExpenseItemから導出される集計値で、正はあくまでExpenseItem側。
+    出費・明細の書き込み時に同一トランザクション内で該当日を再計算して維持する
+    （SpendRollupService参照）。ダッシュボードはこのテーブルを読むため、
+    集計コストは明細数ではなく日数に比例する。
+    """
+    __tablename__ = "daily_spend_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    spend_date = Column(Date, nullable=False)  # 発生日（occurred_atの日付部分）
+    category_id = Column(Integer, nullable=True)  # NULL: カテゴリ未設定（カテゴリ削除を妨げないよう外部キーは張らない）
+    payment_method = Column(String(50), nullable=True)  # 支払い方法（Expense.payment_method）
+
+    total_amount = Column(Integer, nullable=False, default=0)  # 行合計の和（円）
+    item_count = Column(Integer, nullable=False, default=0)  # 商品明細数
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_rollup_user_date', 'user_id', 'spend_date', 'category_id', 'payment_method'),
+    )
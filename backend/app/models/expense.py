@@ -1,7 +1,9 @@
 from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
+from app.utils.merchant import normalize_merchant_key
+from app.utils.search_text import build_search_tokens
 import enum
 
 
@@ -27,6 +29,8 @@ class Expense(Base):
     # 決済情報
     occurred_at = Column(DateTime(timezone=True), nullable=False)  # 発生日時
     merchant_name = Column(String(200), nullable=True)  # 店舗名/加盟店名
+    merchant_key = Column(String(200), nullable=True)  # 店舗名の正規化キー（店舗別集計用、merchant_nameから自動設定）
+    search_tokens = Column(Text, nullable=True)  # 全文検索用のトークン列（店舗名・タイトルから自動設定）
     title = Column(String(200), nullable=True)  # 決済のタイトル（表示用）
     total_amount = Column(Integer, nullable=False)  # 合計金額（円）
     currency = Column(String(3), nullable=False, default="JPY")  # 通貨コード
@@ -50,8 +54,12 @@ class Expense(Base):
     ai_confidence = Column(Numeric(3, 2), nullable=True)  # AI分類の信頼度（0.00-1.00）
     status = Column(Enum(ExpenseStatus), default=ExpenseStatus.PENDING)
 
+    # 自動再試行（失敗・停止したレシート処理）
+    retry_count = Column(Integer, nullable=False, default=0, server_default="0")  # 自動再試行した回数
+    next_retry_at = Column(DateTime(timezone=True), nullable=True)  # 次に再試行してよい日時
+
     # タイムスタンプ
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # リレーション
@@ -61,5 +69,30 @@ class Expense(Base):
 
     # 複合インデックス
     __table_args__ = (
-        Index('idx_user_occurred', 'user_id', 'occurred_at'),
+        # 一覧の並び順（発生日時・作成日時・IDの降順）と同じ順のキーセットページング用
+        Index('idx_user_occurred_created', 'user_id', 'occurred_at', 'created_at', 'id'),
+        Index('idx_status_retry', 'status', 'next_retry_at'),
+        Index('idx_user_merchant_occurred', 'user_id', 'merchant_key', 'occurred_at'),
+        Index('ft_expenses_search', 'search_tokens', mysql_prefix='FULLTEXT'),
     )
+
+    @validates('merchant_name')
+    def _sync_merchant_key(self, key, value):
+        """店舗名の設定時に正規化キーも更新（全ての書き込み経路で一致させる）"""
+        self.merchant_key = normalize_merchant_key(value)
+        self.search_tokens = build_search_tokens(value, self.title)
+        return value
+
+    @validates('status')
+    def _reset_retry_on_completion(self, key, value):
+        """完了したら自動再試行の回数をリセット（後で別の失敗が起きても上限まで再試行できるように）"""
+        if value == ExpenseStatus.COMPLETED:
+            self.retry_count = 0
+            self.next_retry_at = None
+        return value
+
+    @validates('title')
+    def _sync_search_tokens(self, key, value):
+        """タイトルの設定時に検索用のトークン列も更新"""
+        self.search_tokens = build_search_tokens(self.merchant_name, value)
+        return value
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Enum, Index, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Enum, Index, Boolean, event, inspect, select, update
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
+from app.models.expense import Expense
 import enum
 
 
@@ -25,9 +26,14 @@ class ExpenseItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False)
 
+    # 親Expenseの値の複製（明細を直接キーセットで辿るため、Expenseから自動設定）
+    user_id = Column(Integer, nullable=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=True)
+
     # 明細情報
     position = Column(Integer, nullable=False, default=0)  # レシート上の順序
     product_name = Column(String(200), nullable=False)     # 商品名（必須）
+    search_tokens = Column(Text, nullable=True)            # 全文検索用のトークン列（商品名から自動設定）
     quantity = Column(Numeric(10, 3), nullable=True)       # 数量
     unit_price = Column(Integer, nullable=True)            # 単価（円）
     line_total = Column(Integer, nullable=False)           # 行合計（円・税込み）
@@ -57,7 +63,43 @@ class ExpenseItem(Base):
     __table_args__ = (
         Index('idx_expense_position', 'expense_id', 'position'),
         Index('idx_expense_category', 'expense_id', 'category_id'),
+        Index('idx_item_user_category_occurred', 'user_id', 'category_id', 'occurred_at', 'id'),
+        Index('ft_expense_items_search', 'search_tokens', mysql_prefix='FULLTEXT'),
     )
 
+    @validates('product_name')
+    def _sync_search_tokens(self, key, value):
+        """商品名の設定時に検索用のトークン列も更新（全ての書き込み経路で一致させる）"""
+        self.search_tokens = build_search_tokens(value)
+        return value
+
     def __repr__(self):
         return f"<ExpenseItem(id={self.id}, product={self.product_name}, amount={self.line_total})>"
+
+
+@event.listens_for(ExpenseItem, "before_insert")
+def _copy_expense_fields(mapper, connection, target):
+    """明細の追加時に親Expenseのユーザー・発生日時を複製"""
+    expense = inspect(target).dict.get("expense")
+    if expense is not None:
+        target.user_id = expense.user_id
+        target.occurred_at = expense.occurred_at
+        return
+    row = connection.execute(
+        select(Expense.user_id, Expense.occurred_at).where(Expense.id == target.expense_id)
+    ).first()
+    if row is not None:
+        target.user_id, target.occurred_at = row
+
+
+@event.listens_for(Expense, "after_update")
+def _propagate_expense_fields(mapper, connection, target):
+    """Expenseのユーザー・発生日時が変わったら明細の複製も更新"""
+    state = inspect(target)
+    if not (state.attrs.occurred_at.history.has_changes() or state.attrs.user_id.history.has_changes()):
+        return
+    connection.execute(
+        update(ExpenseItem.__table__)
+        .where(ExpenseItem.__table__.c.expense_id == target.id)
+        .values(user_id=target.user_id, occurred_at=target.occurred_at)
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Household(Base):
+    """世帯（家計をまとめて見るユーザーのグループ）"""
+
+    __tablename__ = "households"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # リレーション
+    members = relationship("User", back_populates="household", order_by="User.id")
+
+    def __repr__(self) -> str:
+        return f"<Household(id={self.id}, name={self.name})>"
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class MonthlyCategoryRollup(Base):
+    """
+    月別のカテゴリ集計（ユーザー×月×カテゴリ）
+
+    日次集計（daily_spend_rollup）を月単位にまとめた値で、予算の消化状況の表示に使う。
+    日次集計を再計算した月だけを、同じトランザクション内で日次集計から作り直す
+    （SpendRollupService参照）。
+    """
+    __tablename__ = "monthly_category_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)  # 月初日
+    category_id = Column(Integer, nullable=True)  # NULL: カテゴリ未設定
+
+    total_amount = Column(Integer, nullable=False, default=0)  # 行合計の和（円）
+    item_count = Column(Integer, nullable=False, default=0)  # 商品明細数
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_category_rollup_user_month', 'user_id', 'month', 'category_id'),
+    )
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class MonthlyMerchantRollup(Base):
+    """
+    月別の店舗集計（ユーザー×月×店舗）
+
+    Expenseから導出される集計値。来店回数は出費（会計）の件数、
+    金額は出費の合計金額（total_amount）で数える。
+    日次集計と同じく書き込み時に該当月を再計算して維持する（SpendRollupService参照）。
+    """
+    __tablename__ = "monthly_merchant_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)  # 月初日
+    merchant_key = Column(String(200), nullable=False)  # Expense.merchant_key
+    merchant_name = Column(String(200), nullable=True)  # 表示用の店舗名（代表値）
+
+    visit_count = Column(Integer, nullable=False, default=0)  # 来店回数（出費件数）
+    total_amount = Column(Integer, nullable=False, default=0)  # 合計金額（円）
+    last_visited_at = Column(DateTime(timezone=True), nullable=True)  # その月の最終来店日時
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_merchant_rollup_user_month', 'user_id', 'month', 'merchant_key'),
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
+from app.utils.search_text import build_search_tokens, ocr_text
 
 
 class Receipt(Base):
@@ -24,6 +25,7 @@ class Receipt(Base):
 
     # OCR結果とメタデータ
     ocr_raw_output = Column(Text, nullable=True)  # OCRの完全なJSON出力
+    ocr_search_tokens = Column(Text, nullable=True)  # 全文検索用のトークン列（OCR出力の文字列から自動設定）
     ocr_engine = Column(String(50), nullable=True)  # OCRエンジン名（"codex", "yomitoku", etc.）
     ocr_model = Column(String(100), nullable=True)  # 使用されたモデル名
     schema_version = Column(String(20), nullable=True)  # JSONスキーマバージョン
@@ -33,3 +35,13 @@ class Receipt(Base):
 
     # リレーション
     expense = relationship("Expense", back_populates="receipt")
+
+    __table_args__ = (
+        Index('ft_receipts_ocr_search', 'ocr_search_tokens', mysql_prefix='FULLTEXT'),
+    )
+
+    @validates('ocr_raw_output')
+    def _sync_ocr_search_tokens(self, key, value):
+        """OCR出力の設定時に検索用のトークン列も更新"""
+        self.ocr_search_tokens = build_search_tokens(ocr_text(value))
+        return value
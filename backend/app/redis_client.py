@@ -0,0 +1,31 @@
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+# 同期クライアント（APIエンドポイント・Celeryタスクから共用）
+# 接続は初回コマンド実行時に確立される
+redis_client = redis.Redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    socket_timeout=5,
+    socket_connect_timeout=5,
+    health_check_interval=30
+)
+
+
+def get_async_redis() -> aioredis.Redis:
+    """非同期クライアントを生成（ストリーミング応答など長時間接続用、呼び出し側でacloseすること）"""
+    return aioredis.Redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        health_check_interval=30
+    )
+
+
+def create_subscriber_redis() -> redis.Redis:
+    """pub/sub購読用の同期クライアントを生成（listenでブロックするためソケットタイムアウトなし）"""
+    return redis.Redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        health_check_interval=30
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
@@ -113,7 +113,9 @@ class ExpenseWithReceipt(Expense):
 
 
 class ExpenseListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None  # キーセットページングでは集計しない
+    has_more: bool = False
+    next_cursor: Optional[str] = None
     expenses: List[ExpenseWithReceipt]
 
 
@@ -128,3 +130,40 @@ class ManualExpenseCreate(BaseModel):
     category_id: Optional[int] = None  # 手入力の場合は指定可能
     skip_ai_classification: bool = False  # AI分類をスキップするか
     payment_method: Optional[str] = None  # 支払い方法
+
+
+# 一括登録で1リクエストに含められる最大件数
+MAX_BULK_EXPENSES = 500
+
+
+class BulkManualExpenseCreate(BaseModel):
+    """手入力の一括登録用のスキーマ"""
+    expenses: List[ManualExpenseCreate] = Field(..., min_length=1, max_length=MAX_BULK_EXPENSES)
+
+
+class BulkExpenseResult(BaseModel):
+    id: int  # 作成したExpenseのID
+    item_id: int  # 作成したExpenseItemのID
+    status: str
+
+
+class BulkManualExpenseResponse(BaseModel):
+    created: int  # 作成した出費の件数
+    classification_queued: int  # AI分類を待つ出費の件数
+    expenses: List[BulkExpenseResult]  # リクエストと同じ順序
+
+
+# 一括再分類で1リクエストに含められる最大明細数
+MAX_BULK_ITEMS = 1000
+
+
+class BulkItemRecategorize(BaseModel):
+    """商品明細の一括カテゴリ変更用のスキーマ"""
+    item_ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+    category_id: int  # 変更後のカテゴリ
+
+
+class BulkItemRecategorizeResponse(BaseModel):
+    updated: int  # カテゴリが変わった明細の件数
+    unchanged: int  # 既に手入力で同じカテゴリだった明細の件数
+    category_id: int
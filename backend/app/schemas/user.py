@@ -25,6 +25,7 @@ class User(UserBase):
     id: int
     is_active: bool
     is_admin: bool
+    household_id: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+from typing import Dict, Optional
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 実行中のステップからの保存: 同じジョブ・同じステップで実行中の場合だけ書き込む（比較と書き込みを1操作で行う）
+_SAVE_STEP_SCRIPT = redis_client.register_script("""
+local raw = redis.call('GET', KEYS[1])
+if not raw then return 0 end
+local current = cjson.decode(raw)
+if current['job_id'] ~= ARGV[1] or current['status'] ~= ARGV[2] or tonumber(current['step']) ~= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[4])
+return 1
+""")
+
+# 停止: 実行中の場合だけ保存済みの状態の status を書き換える（実行中のステップの保存と競合しない）
+_PAUSE_SCRIPT = redis_client.register_script("""
+local raw = redis.call('GET', KEYS[1])
+if not raw then return nil end
+local current = cjson.decode(raw)
+if current['status'] ~= ARGV[1] then return nil end
+current['status'] = ARGV[2]
+current['updated_at'] = tonumber(ARGV[3])
+local updated = cjson.encode(current)
+redis.call('SET', KEYS[1], updated)
+return updated
+""")
+
+
+class BackfillStatus:
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+
+
+class ClassificationBackfillService:
+    """
+    未分類商品の一括分類（バックフィル）の進捗管理
+
+    進捗はRedisにチェックポイントとして保存し、ワーカー再起動後も続きから再開できるようにする。
+    各ステップはjob_idとstepを持ち、現在の状態と一致しないメッセージ（重複・古い再送）は無視される。
+    """
+
+    STATE_KEY = "maintenance:classification_backfill"
+    STALE_SECONDS = 600  # この時間更新が無い実行中ジョブは停止したものとみなす
+
+    @staticmethod
+    def get_state() -> Optional[Dict]:
+        raw = redis_client.get(ClassificationBackfillService.STATE_KEY)
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    def save_state(state: Dict) -> None:
+        state["updated_at"] = time.time()
+        redis_client.set(ClassificationBackfillService.STATE_KEY, json.dumps(state))
+
+    @staticmethod
+    def save_step_state(state: Dict, job_id: str, step: int) -> bool:
+        """
+        実行中のステップ（job_id, step）から状態を保存
+
+        ステップの実行中に停止・再開されていた場合（保存済みの状態が実行中でない、またはstepが進んでいる）は
+        書き込まずFalseを返す。呼び出し側は次のステップを投入しない。
+        """
+        state["updated_at"] = time.time()
+        saved = _SAVE_STEP_SCRIPT(
+            keys=[ClassificationBackfillService.STATE_KEY],
+            args=[job_id, BackfillStatus.RUNNING, step, json.dumps(state)]
+        )
+        return bool(saved)
+
+    @staticmethod
+    def pause() -> Optional[Dict]:
+        """実行中のジョブを停止（実行中でなければNone）"""
+        updated = _PAUSE_SCRIPT(
+            keys=[ClassificationBackfillService.STATE_KEY],
+            args=[BackfillStatus.RUNNING, BackfillStatus.PAUSED, time.time()]
+        )
+        return json.loads(updated) if updated else None
+
+    @staticmethod
+    def new_state(job_id: str, max_item_id: int, total: int, batch_size: int, rate_per_minute: int) -> Dict:
+        now = time.time()
+        return {
+            "job_id": job_id,
+            "status": BackfillStatus.RUNNING,
+            "step": 0,
+            "last_item_id": 0,
+            "max_item_id": max_item_id,
+            "total": total,
+            "processed": 0,
+            "classified": 0,
+            "unresolved": 0,
+            "expenses_completed": 0,
+            "batch_size": batch_size,
+            "rate_per_minute": rate_per_minute,
+            "consecutive_failures": 0,
+            "last_error": None,
+            "started_at": now,
+            "resumed_at": now,
+            "processed_at_resume": 0,
+            "updated_at": now,
+        }
+
+    @staticmethod
+    def resume_state(state: Dict) -> Dict:
+        state["status"] = BackfillStatus.RUNNING
+        state["step"] += 1  # 古いメッセージを無効化する
+        state["consecutive_failures"] = 0
+        state["last_error"] = None
+        state["resumed_at"] = time.time()
+        state["processed_at_resume"] = state["processed"]
+        return state
+
+    @staticmethod
+    def is_active(state: Optional[Dict]) -> bool:
+        """実行中かつ最近更新されているジョブがあるか"""
+        if not state or state.get("status") != BackfillStatus.RUNNING:
+            return False
+        return time.time() - state.get("updated_at", 0) < ClassificationBackfillService.STALE_SECONDS
+
+    @staticmethod
+    def describe(state: Dict) -> Dict:
+        """状態にスループットと残り時間の見積もりを付与"""
+        now = time.time()
+        processed_since_resume = state["processed"] - state.get("processed_at_resume", 0)
+        active_seconds = max(state.get("updated_at", now) - state.get("resumed_at", now), 0)
+        throughput = processed_since_resume / active_seconds * 60 if active_seconds > 0 else None
+        remaining = max(state["total"] - state["processed"], 0)
+
+        eta_seconds = None
+        if state["status"] == BackfillStatus.RUNNING and throughput:
+            eta_seconds = int(remaining / throughput * 60)
+
+        return {
+            **state,
+            "remaining": remaining,
+            "progress_percent": round(state["processed"] / state["total"] * 100, 1) if state["total"] else 100.0,
+            "throughput_per_minute": round(throughput, 1) if throughput is not None else None,
+            "eta_seconds": eta_seconds,
+            "stale": state["status"] == BackfillStatus.RUNNING and not ClassificationBackfillService.is_active(state),
+        }
@@ -0,0 +1,182 @@
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.budget import Budget
+from app.models.category import Category
+from app.models.monthly_category_rollup import MonthlyCategoryRollup
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# session.info に溜める、commit後に発行する予算イベントのキー
+PENDING_EVENTS_KEY = "budget_pending_events"
+
+
+class BudgetStatus:
+    OK = "ok"            # 通知の閾値未満
+    WARNING = "warning"  # 最初の通知閾値以上・予算以内
+    OVER = "over"        # 予算超過
+
+
+class BudgetService:
+    """
+    カテゴリ別予算の消化状況と閾値通知
+
+    消化額は月別カテゴリ集計（monthly_category_rollup）を読むだけなので、
+    表示のコストは予算の数に比例し、明細数には依存しない。
+    集計の更新時（SpendRollupService）に更新前後の値を受け取り、
+    閾値をまたいだ予算があればcommit後にイベントを発行する。
+    """
+
+    CHANNEL_PREFIX = "budget_events"
+    ALERTS_PREFIX = "budget_alerts"
+    MAX_ALERTS = 50  # ユーザーごとに保持する直近の通知数
+
+    @staticmethod
+    def channel(user_id: int) -> str:
+        return f"{BudgetService.CHANNEL_PREFIX}:{user_id}"
+
+    @staticmethod
+    def alerts_key(user_id: int) -> str:
+        return f"{BudgetService.ALERTS_PREFIX}:{user_id}"
+
+    @staticmethod
+    def install(session_factory) -> None:
+        """セッションファクトリにイベントリスナーを登録（同じファクトリへの重複登録はしない）"""
+        if event.contains(session_factory, "after_commit", BudgetService._publish_pending):
+            return
+        event.listen(session_factory, "after_commit", BudgetService._publish_pending)
+        event.listen(session_factory, "after_rollback", BudgetService._discard)
+
+    @staticmethod
+    def status_of(amount: int, spent: int, thresholds: List[int]) -> str:
+        if spent > amount:
+            return BudgetStatus.OVER
+        if thresholds and amount > 0 and spent * 100 >= amount * thresholds[0]:
+            return BudgetStatus.WARNING
+        return BudgetStatus.OK
+
+    @staticmethod
+    def statuses(db: Session, user_id: int, month: date) -> List[Dict]:
+        """有効な予算ごとの消化状況（予算の数＋1クエリ分のコスト）"""
+        budgets = db.query(Budget, Category.name, Category.color)\
+                    .join(Category, Budget.category_id == Category.id)\
+                    .filter(Budget.user_id == user_id, Budget.is_active == True)\
+                    .order_by(Category.sort_order, Category.name).all()
+        if not budgets:
+            return []
+
+        spent_by_category = dict(db.query(
+            MonthlyCategoryRollup.category_id,
+            MonthlyCategoryRollup.total_amount
+        ).filter(
+            MonthlyCategoryRollup.user_id == user_id,
+            MonthlyCategoryRollup.month == month,
+            MonthlyCategoryRollup.category_id.in_([b.category_id for b, _, _ in budgets])
+        ).all())
+
+        result = []
+        for budget, category_name, color in budgets:
+            spent = int(spent_by_category.get(budget.category_id, 0))
+            thresholds = budget.threshold_percents
+            result.append({
+                "id": budget.id,
+                "category_id": budget.category_id,
+                "category_name": category_name,
+                "color": color,
+                "amount": budget.amount,
+                "spent": spent,
+                "remaining": budget.amount - spent,
+                "percent": round(spent / budget.amount * 100, 1) if budget.amount > 0 else 0,
+                "status": BudgetService.status_of(budget.amount, spent, thresholds),
+                "alert_thresholds": thresholds
+            })
+        return result
+
+    @staticmethod
+    def evaluate(
+        session: Session,
+        user_id: int,
+        month: date,
+        before: Dict[Optional[int], int],
+        after: Dict[Optional[int], int]
+    ) -> None:
+        """
+        集計の更新前後を比べ、閾値を上向きにまたいだ予算のイベントを積む（commit後に発行）
+
+        SpendRollupServiceがcommit直前（同じトランザクション内）に呼び出す。
+        """
+        changed = [
+            category_id for category_id in set(before) | set(after)
+            if category_id is not None and before.get(category_id, 0) != after.get(category_id, 0)
+        ]
+        if not changed:
+            return
+
+        budgets = session.query(Budget).filter(
+            Budget.user_id == user_id,
+            Budget.is_active == True,
+            Budget.category_id.in_(changed)
+        ).all()
+
+        pending = session.info.setdefault(PENDING_EVENTS_KEY, [])
+        for budget in budgets:
+            old_spent = int(before.get(budget.category_id, 0))
+            new_spent = int(after.get(budget.category_id, 0))
+            for threshold in budget.threshold_percents:
+                limit = budget.amount * threshold
+                if old_spent * 100 < limit <= new_spent * 100:
+                    pending.append({
+                        "event": "budget_threshold",
+                        "user_id": user_id,
+                        "budget_id": budget.id,
+                        "category_id": budget.category_id,
+                        "month": month.strftime("%Y-%m"),
+                        "threshold": threshold,
+                        "amount": budget.amount,
+                        "spent": new_spent,
+                        "status": BudgetService.status_of(budget.amount, new_spent, budget.threshold_percents),
+                        "timestamp": datetime.now(timezone.utc).isoformat()
+                    })
+
+    @staticmethod
+    def _publish_pending(session: Session) -> None:
+        """after_commit: 積んだ予算イベントを発行（通知は補助的な機能のため失敗してもログのみ）"""
+        events = session.info.pop(PENDING_EVENTS_KEY, [])
+        if not events:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for payload in events:
+                message = json.dumps(payload, ensure_ascii=False)
+                key = BudgetService.alerts_key(payload["user_id"])
+                pipe.lpush(key, message)
+                pipe.ltrim(key, 0, BudgetService.MAX_ALERTS - 1)
+                pipe.publish(BudgetService.channel(payload["user_id"]), message)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"予算イベントの発行に失敗: {len(events)}件 - {str(e)}")
+
+    @staticmethod
+    def _discard(session: Session) -> None:
+        """after_rollback: 取り消された変更のイベントを破棄"""
+        session.info.pop(PENDING_EVENTS_KEY, None)
+
+    @staticmethod
+    def recent_alerts(user_id: int, limit: int = 20) -> List[Dict]:
+        """直近の予算通知（新しい順）"""
+        try:
+            raw = redis_client.lrange(BudgetService.alerts_key(user_id), 0, limit - 1)
+        except Exception as e:
+            logger.warning(f"予算通知の取得に失敗: user_id={user_id} - {str(e)}")
+            return []
+        alerts = []
+        for item in raw:
+            try:
+                alerts.append(json.loads(item))
+            except ValueError:
+                continue
+        return alerts
@@ -1,8 +1,21 @@
 import re
-import unicodedata
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import List, Optional, Pattern, Sequence, Tuple
 from sqlalchemy.orm import Session
 from app.models.category_rule import CategoryRule, MatchType
+from app.utils.search_text import normalize_japanese
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """照合用に前処理済みのルール（セッションに依存しない）"""
+    id: int
+    category_id: int
+    confidence: float
+    priority: int
+    match_type: MatchType
+    tokens: Tuple[str, ...] = ()
+    regex: Optional[Pattern] = None
 
 
 class CategoryRuleService:
@@ -10,21 +23,7 @@ class CategoryRuleService:
 
     @staticmethod
     def normalize_text(text: str) -> str:
-        if not text:
-            return ""
-        normalized = unicodedata.normalize("NFKC", text).strip().lower()
-        return CategoryRuleService._katakana_to_hiragana(normalized)
-
-    @staticmethod
-    def _katakana_to_hiragana(text: str) -> str:
-        chars = []
-        for ch in text:
-            code = ord(ch)
-            if 0x30A1 <= code <= 0x30F6:
-                chars.append(chr(code - 0x60))
-            else:
-                chars.append(ch)
-        return "".join(chars)
+        return normalize_japanese(text)
 
     @staticmethod
     def validate_regex(pattern: str) -> None:
@@ -34,31 +33,64 @@ class CategoryRuleService:
             raise ValueError(f"無効な正規表現です: {exc}")
 
     @staticmethod
-    def find_match(db: Session, text_candidates: List[str]) -> Optional[CategoryRule]:
-        normalized_texts = [CategoryRuleService.normalize_text(t) for t in text_candidates if t]
-        if not normalized_texts:
-            return None
-        target = " ".join(t for t in normalized_texts if t)
-        if not target:
-            return None
-
-        rules = db.query(CategoryRule).filter(CategoryRule.is_active == True).order_by(
+    def load_active_rules(db: Session) -> List[CategoryRule]:
+        return db.query(CategoryRule).filter(CategoryRule.is_active == True).order_by(
             CategoryRule.priority.asc(), CategoryRule.id.asc()
         ).all()
 
+    @staticmethod
+    def compile_rules(rules: Sequence[CategoryRule]) -> Tuple[CompiledRule, ...]:
+        """ルールを照合用に前処理（トークンの正規化・正規表現のコンパイル）"""
+        compiled = []
         for rule in rules:
             if rule.match_type == MatchType.CONTAINS:
-                tokens = [CategoryRuleService.normalize_text(token) for token in rule.pattern.split("|")]
-                if any(token and token in target for token in tokens):
-                    return rule
+                tokens = tuple(
+                    token for token in
+                    (CategoryRuleService.normalize_text(t) for t in rule.pattern.split("|"))
+                    if token
+                )
+                regex = None
             else:
+                tokens = ()
                 try:
-                    if re.search(rule.pattern, target):
-                        return rule
+                    regex = re.compile(rule.pattern)
                 except re.error:
                     continue
+            compiled.append(CompiledRule(
+                id=rule.id,
+                category_id=rule.category_id,
+                confidence=rule.confidence,
+                priority=rule.priority,
+                match_type=rule.match_type,
+                tokens=tokens,
+                regex=regex,
+            ))
+        return tuple(compiled)
+
+    @staticmethod
+    def match_compiled(rules: Sequence[CompiledRule], text_candidates: List[str]) -> Optional[CompiledRule]:
+        """前処理済みルールを優先度順に照合し、最初に一致したルールを返す"""
+        normalized_texts = [CategoryRuleService.normalize_text(t) for t in text_candidates if t]
+        target = " ".join(t for t in normalized_texts if t)
+        if not target:
+            return None
+
+        for rule in rules:
+            if rule.match_type == MatchType.CONTAINS:
+                if any(token in target for token in rule.tokens):
+                    return rule
+            elif rule.regex is not None and rule.regex.search(target):
+                return rule
         return None
 
+    @staticmethod
+    def find_match(db: Session, text_candidates: List[str]) -> Optional[CategoryRule]:
+        rules = CategoryRuleService.load_active_rules(db)
+        matched = CategoryRuleService.match_compiled(CategoryRuleService.compile_rules(rules), text_candidates)
+        if not matched:
+            return None
+        return next(rule for rule in rules if rule.id == matched.id)
+
     @staticmethod
     def test_rule(db: Session, text: str) -> Optional[CategoryRule]:
         return CategoryRuleService.find_match(db, [text])
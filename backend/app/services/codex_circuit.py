@@ -0,0 +1,59 @@
+import logging
+from app.config import settings
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class CodexCircuit:
+    """
+    codex execの障害検知（サーキットブレーカー）
+
+    一定時間内に失敗がCODEX_CIRCUIT_FAILURE_THRESHOLD回続いたら回路を開き、
+    クールダウンが明けるまで自動再試行を止める。状態はRedisで全ワーカーと共有する。
+    """
+
+    FAILURES_KEY = "codex_circuit:failures"
+    OPEN_KEY = "codex_circuit:open"
+
+    @staticmethod
+    def record_success() -> None:
+        try:
+            redis_client.delete(CodexCircuit.FAILURES_KEY)
+        except Exception as e:
+            logger.debug(f"サーキット状態の更新に失敗: {str(e)}")
+
+    @staticmethod
+    def record_failure() -> None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.incr(CodexCircuit.FAILURES_KEY)
+            pipe.expire(CodexCircuit.FAILURES_KEY, settings.CODEX_CIRCUIT_WINDOW_SECONDS)
+            failures, _ = pipe.execute()
+            if failures >= settings.CODEX_CIRCUIT_FAILURE_THRESHOLD:
+                opened = redis_client.set(
+                    CodexCircuit.OPEN_KEY, failures, nx=True, ex=settings.CODEX_CIRCUIT_COOLDOWN_SECONDS
+                )
+                if opened:
+                    logger.warning(
+                        f"codexの失敗が{failures}回続いたため、{settings.CODEX_CIRCUIT_COOLDOWN_SECONDS}秒間自動再試行を停止します"
+                    )
+        except Exception as e:
+            logger.debug(f"サーキット状態の更新に失敗: {str(e)}")
+
+    @staticmethod
+    def record(result: dict) -> None:
+        """CodexServiceの戻り値から成否を記録（codex側の障害でない失敗は数えない）"""
+        if result.get("success"):
+            CodexCircuit.record_success()
+        elif result.get("retryable", True):
+            CodexCircuit.record_failure()
+
+    @staticmethod
+    def is_open() -> bool:
+        try:
+            return bool(redis_client.exists(CodexCircuit.OPEN_KEY))
+        except Exception as e:
+            # 状態が分からない場合は再試行を控える
+            logger.warning(f"サーキット状態の取得に失敗: {str(e)}")
+            return True
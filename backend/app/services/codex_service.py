@@ -125,6 +125,51 @@ class CodexService:
             }
         }
 
+    @staticmethod
+    def get_batch_classification_schema(categories: List[str], item_count: int) -> Dict:
+        """
+        複数商品の一括分類用のJSON Schemaを生成
+
+        Args:
+            categories: カテゴリ名のリスト
+            item_count: 分類対象の商品数
+
+        Returns:
+            Dict: JSON Schema
+        """
+        return {
+            "$schema": "https://json-schema.org/draft/2020-12/schema",
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["results"],
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["index", "category", "confidence"],
+                        "properties": {
+                            "index": {
+                                "type": "integer",
+                                "minimum": 0,
+                                "maximum": max(item_count - 1, 0)
+                            },
+                            "category": {
+                                "type": "string",
+                                "enum": categories
+                            },
+                            "confidence": {
+                                "type": "number",
+                                "minimum": 0.0,
+                                "maximum": 1.0
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
     @staticmethod
     def process_receipt_ocr(
         image_path: str,
@@ -269,7 +314,8 @@ class CodexService:
             return {
                 "success": False,
                 "error": str(e),
-                "raw_output": None
+                "raw_output": None,
+                "retryable": False  # codex側の障害ではない
             }
         except Exception as e:
             logger.exception(f"OCR処理中にエラーが発生: {str(e)}")
@@ -451,3 +497,181 @@ class CodexService:
                 except Exception as e:
                     logger.warning(f"Schema file削除失敗: {schema_file_path} - {str(e)}")
 
+    @staticmethod
+    def classify_expense_batch(
+        items: List[Dict],
+        store_name: Optional[str],
+        note: Optional[str],
+        categories: List[str],
+        model: str = "gpt-5.1-codex-mini",
+        sandbox_mode: str = "read-only",
+        skip_git_repo_check: bool = True,
+        system_prompt: Optional[str] = None
+    ) -> Dict:
+        """
+        同じレシートの複数商品を1回のcodex execでまとめて分類
+
+        Args:
+            items: 商品のリスト（各要素は product_name, amount を持つ。
+                   複数レシートの商品を混ぜる場合は store_name, note も商品ごとに指定する）
+            store_name: 店舗名（全商品共通の場合）
+            note: 備考（全商品共通の場合）
+            categories: カテゴリ名のリスト
+            model: 使用するモデル
+            sandbox_mode: サンドボックスモード
+            skip_git_repo_check: Gitリポジトリチェックをスキップ
+
+        Returns:
+            Dict: {
+                "success": bool,
+                "results": List[Dict] (成功時、itemsと同じ順序で category, confidence を持つ),
+                "error": str (失敗時)
+            }
+        """
+        if not items:
+            return {"success": True, "results": []}
+
+        schema_file_path = None
+        try:
+            logger.info(f"codex 一括分類処理開始: items={len(items)}, model={model}")
+
+            # JSON Schemaを一時ファイルに保存
+            schema = CodexService.get_batch_classification_schema(categories, len(items))
+            with tempfile.NamedTemporaryFile(
+                mode='w',
+                suffix='.json',
+                delete=False,
+                encoding='utf-8'
+            ) as schema_file:
+                json.dump(schema, schema_file, ensure_ascii=False, indent=2)
+                schema_file_path = schema_file.name
+
+            input_data = {
+                "store_name": store_name,
+                "note": note,
+                "items": [
+                    {
+                        "index": index,
+                        "product_name": item.get("product_name"),
+                        "amount": item.get("amount"),
+                        **{key: item[key] for key in ("store_name", "note") if item.get(key)}
+                    }
+                    for index, item in enumerate(items)
+                ]
+            }
+
+            categories_json = json.dumps(categories, ensure_ascii=False)
+            expense_json = json.dumps(input_data, ensure_ascii=False)
+            base_prompt = system_prompt or (
+                "あなたは家計簿の支出カテゴリ分類器です。外部コマンド実行やファイル操作、推測による補完は禁止です。"
+                "次のJSONのみを根拠に分類し、必ず候補から1つ選んでください。迷ったら『その他』を選び、confidenceは0.3以下に設定してください。"
+                "出力は余計な文章なしでminified JSONのみ。"
+            )
+
+            prompt = (
+                f"{base_prompt}\n候補カテゴリ: {categories_json}\n"
+                "対象JSONのitemsの各商品を分類し、indexごとに1件ずつ返してください。\n"
+                "出力形式: {\"results\":[{\"index\":0,\"category\":\"<候補>\",\"confidence\":0.0-1.0}]}\n"
+                f"対象JSON: {expense_json}"
+            )
+
+            # codex execコマンドを構築
+            cmd = ["codex", "exec"]
+
+            if skip_git_repo_check:
+                cmd.append("--skip-git-repo-check")
+
+            if sandbox_mode:
+                cmd.extend(["--sandbox", sandbox_mode])
+
+            cmd.extend([
+                "-m", model,
+                "--output-schema", schema_file_path,
+                prompt
+            ])
+
+            logger.info(f"codex exec command (batch): items={len(items)}")
+
+            # codex execを実行（商品数に応じてタイムアウトを延長）
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=60 + 5 * len(items),
+                shell=False,  # セキュリティのため明示的に指定
+                check=False   # return codeを手動でチェック
+            )
+
+            logger.debug(f"Return code: {result.returncode}")
+            logger.debug(f"STDOUT: {result.stdout}")
+            if result.stderr:
+                logger.debug(f"STDERR: {result.stderr}")
+
+            if result.returncode != 0:
+                raise Exception(f"codex exec failed (code {result.returncode}): {result.stderr}")
+
+            output = result.stdout.strip()
+
+            if not output:
+                raise Exception("codex execの出力が空です")
+
+            try:
+                data = json.loads(output)
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON parse error: {e}")
+                logger.error(f"Output: {output}")
+                raise Exception(f"JSONパースエラー: {str(e)}")
+
+            # indexで突き合わせ、欠落・不正な結果はフォールバックカテゴリで埋める
+            fallback_category = CodexService._fallback_category(categories)
+            by_index = {}
+            for entry in data.get("results", []) if isinstance(data, dict) else []:
+                if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                    by_index[entry["index"]] = entry
+
+            results = []
+            for index in range(len(items)):
+                entry = by_index.get(index, {})
+                category = entry.get("category")
+                confidence = entry.get("confidence", 0.0)
+
+                if not isinstance(category, str) or category not in categories:
+                    logger.warning(f"index={index}: カテゴリがスキーマに一致しないためフォールバックします")
+                    category = fallback_category
+                    confidence = 0.0
+
+                if not isinstance(confidence, (int, float)):
+                    confidence = 0.0
+
+                if fallback_category and category == fallback_category and confidence > 0.3:
+                    confidence = 0.3
+
+                results.append({"category": category, "confidence": confidence})
+
+            logger.info(f"一括分類成功: items={len(results)}")
+
+            return {
+                "success": True,
+                "results": results
+            }
+
+        except subprocess.TimeoutExpired:
+            logger.error("codex exec がタイムアウトしました")
+            return {
+                "success": False,
+                "error": "分類処理がタイムアウトしました"
+            }
+        except Exception as e:
+            logger.exception(f"一括分類処理中にエラーが発生: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        finally:
+            # 一時ファイルを削除
+            if schema_file_path and os.path.exists(schema_file_path):
+                try:
+                    os.unlink(schema_file_path)
+                    logger.debug(f"Schema file deleted: {schema_file_path}")
+                except Exception as e:
+                    logger.warning(f"Schema file削除失敗: {schema_file_path} - {str(e)}")
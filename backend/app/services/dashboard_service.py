@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.category import Category
+from app.models.daily_spend_rollup import DailySpendRollup
+from app.models.expense import Expense
+from app.services.data_version_service import DataVersionService
+from app.services.expense_view_service import ExpenseViewService
+from app.services.response_cache import ResponseCache
+
+
+class DashboardService:
+    """
+    ダッシュボードの応答の組み立てと事前計算
+
+    エンドポイントとウォームアップタスクが同じ組み立て・同じキャッシュキーを使うため、
+    処理完了後にワーカーで計算した応答を、次に画面を開いたときにそのまま返せる。
+    """
+
+    SUMMARY_ENDPOINT = "dashboard_summary"
+    RECENT_EXPENSES_ENDPOINT = "dashboard_recent_expenses"
+    RECENT_EXPENSES_DEFAULT_LIMIT = 10  # 画面の既定の表示件数
+
+    @staticmethod
+    def current_month_period(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """サマリーの既定の期間（今月1日0時〜現在）"""
+        now = now or datetime.now()
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), now
+
+    @staticmethod
+    def summary_params(start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """サマリーのキャッシュ・ETagのパラメータ（集計は日単位のため日付の範囲で共有する）"""
+        return {"start_date": start_date.date(), "end_date": end_date.date()}
+
+    @staticmethod
+    def recent_expenses_params(limit: int) -> Dict[str, Any]:
+        return {"limit": limit}
+
+    @staticmethod
+    def build_summary(db: Session, user_id: int, start_date: datetime, end_date: datetime) -> dict:
+        """期間のサマリー（合計・カテゴリ別・日別・前月比）"""
+        # 前月比較の期間
+        prev_month_start = (start_date - timedelta(days=30)).replace(day=1)
+        prev_month_end = start_date - timedelta(days=1)
+
+        # 日次集計は日単位のため、期間も日付で扱う
+        start_day = start_date.date()
+        end_day = end_date.date()
+        prev_start_day = prev_month_start.date()
+        prev_end_day = prev_month_end.date()
+
+        # 1. 前月〜当期間の日次集計を日付×カテゴリでまとめて取得し、
+        #    合計・カテゴリ別・日別・前月合計をここから組み立てる（読む行数は日数×カテゴリ数）
+        rollup_rows = db.query(
+            DailySpendRollup.spend_date.label('date'),
+            DailySpendRollup.category_id.label('category_id'),
+            Category.name.label('category_name'),
+            Category.color.label('color'),
+            func.sum(DailySpendRollup.total_amount).label('total'),
+            func.sum(DailySpendRollup.item_count).label('count')
+        ).outerjoin(Category, DailySpendRollup.category_id == Category.id)\
+         .filter(
+            DailySpendRollup.user_id == user_id,
+            DailySpendRollup.spend_date >= min(prev_start_day, start_day),
+            DailySpendRollup.spend_date <= end_day
+        ).group_by(
+            DailySpendRollup.spend_date, DailySpendRollup.category_id, Category.name, Category.color
+        ).order_by(DailySpendRollup.spend_date).all()
+
+        total_expenses = 0
+        item_count = 0
+        prev_month_total = 0
+        category_totals = {}
+        daily_totals = {}
+        for row in rollup_rows:
+            if prev_start_day <= row.date <= prev_end_day:
+                prev_month_total += row.total
+            if row.date < start_day:
+                continue
+
+            total_expenses += row.total
+            item_count += int(row.count)
+            daily_totals[row.date] = daily_totals.get(row.date, 0) + row.total
+            # カテゴリ別はカテゴリ未設定を除く（日別・合計には含める）
+            if row.category_id is None:
+                continue
+            entry = category_totals.setdefault(row.category_id, {
+                "category_id": row.category_id,
+                "category_name": row.category_name,
+                "color": row.color,
+                "total": 0,
+                "count": 0
+            })
+            entry["total"] += row.total
+            entry["count"] += int(row.count)
+
+        # 2. 出費件数は明細を持たない出費も含めるため出費テーブルから数える（idx_user_occurred_createdのみで完結）
+        expense_count = db.query(func.count(Expense.id)).filter(
+            Expense.user_id == user_id,
+            Expense.occurred_at >= datetime.combine(start_day, datetime.min.time()),
+            Expense.occurred_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        ).scalar() or 0
+
+        change_from_prev = float(total_expenses) - float(prev_month_total)
+        change_percent = (change_from_prev / float(prev_month_total) * 100) if prev_month_total > 0 else 0
+
+        return {
+            "total_expenses": float(total_expenses),
+            "expense_count": expense_count,
+            "item_count": item_count,
+            "average_expense": float(total_expenses / expense_count) if expense_count > 0 else 0,
+            "category_breakdown": [
+                {
+                    **cat,
+                    "total": float(cat["total"]),
+                    "percentage": float(cat["total"] / total_expenses * 100) if total_expenses > 0 else 0
+                }
+                for _, cat in sorted(category_totals.items())
+            ],
+            "daily_expenses": [
+                {
+                    "date": str(date_value),
+                    "total": float(total)
+                }
+                for date_value, total in daily_totals.items()
+            ],
+            "comparison": {
+                "previous_month_total": float(prev_month_total),
+                "change_amount": change_from_prev,
+                "change_percent": change_percent
+            },
+            # キャッシュは日付の範囲で共有するため、リクエストの時刻ではなく集計した日付を返す
+            "period": {
+                "start_date": str(start_day),
+                "end_date": str(end_day)
+            }
+        }
+
+    @staticmethod
+    def build_recent_expenses(db: Session, user_id: int, limit: int) -> list:
+        """最近の出費（商品はカテゴリ名付き、出費一覧と同じ形式）"""
+        expenses = db.query(Expense).filter(
+            Expense.user_id == user_id
+        ).options(*ExpenseViewService.load_options())\
+         .order_by(Expense.occurred_at.desc(), Expense.created_at.desc(), Expense.id.desc())\
+         .limit(limit)\
+         .all()
+        return ExpenseViewService.to_dicts(db, expenses)
+
+    @staticmethod
+    def warm(db: Session, user_id: int) -> bool:
+        """
+        今月のサマリーと最近の出費（既定の件数）を計算してキャッシュに保存
+
+        エンドポイントと同じく版数をDBを読む前に取得するため、計算中に書き込みがあっても
+        古い版のキーに保存されるだけで、画面には新しい版の応答が返る。
+
+        Returns:
+            bool: キャッシュを作成（または既に作成済みを確認）した場合True。版数が取れない場合False
+        """
+        version = DataVersionService.get_user_data_version(user_id, db)
+        if version is None:
+            return False
+
+        start_date, end_date = DashboardService.current_month_period()
+        limit = DashboardService.RECENT_EXPENSES_DEFAULT_LIMIT
+        ResponseCache.get_or_compute(
+            user_id,
+            DashboardService.SUMMARY_ENDPOINT,
+            DashboardService.summary_params(start_date, end_date),
+            version,
+            lambda: DashboardService.build_summary(db, user_id, start_date, end_date)
+        )
+        ResponseCache.get_or_compute(
+            user_id,
+            DashboardService.RECENT_EXPENSES_ENDPOINT,
+            DashboardService.recent_expenses_params(limit),
+            version,
+            lambda: DashboardService.build_recent_expenses(db, user_id, limit)
+        )
+        return True
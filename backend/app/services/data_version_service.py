@@ -0,0 +1,185 @@
+import logging
+from typing import Dict, Iterable, Optional, Set
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.budget import Budget
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.models.receipt import Receipt
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# session.info に溜める、commit後に版を進める対象のキー
+PENDING_USERS_KEY = "data_version_users"
+PENDING_CATEGORIES_KEY = "data_version_categories"
+
+
+class DataVersionService:
+    """
+    ユーザー単位のデータ版数（Redisカウンタ）
+
+    出費・明細・レシート・予算の変更をflush時に検出し、commit後にそのユーザーの版を進める。
+    応答キャッシュのキーに版を含めることで、書き込み経路ごとの無効化漏れが起きない。
+    カテゴリは全ユーザー共通のため、別のカウンタで管理する。
+    """
+
+    KEY_PREFIX = "data_version"
+    CATEGORIES_KEY = f"{KEY_PREFIX}:categories"
+
+    @staticmethod
+    def user_key(user_id: int) -> str:
+        return f"{DataVersionService.KEY_PREFIX}:user:{user_id}"
+
+    @staticmethod
+    def get_user_version(user_id: int) -> Optional[int]:
+        """ユーザーの版を取得（Redis障害時はNone）"""
+        try:
+            return int(redis_client.get(DataVersionService.user_key(user_id)) or 0)
+        except Exception as e:
+            logger.warning(f"データ版数の取得に失敗: user_id={user_id} - {str(e)}")
+            return None
+
+    @staticmethod
+    def get_categories_version() -> Optional[int]:
+        """カテゴリの版を取得（Redis障害時はNone）"""
+        try:
+            return int(redis_client.get(DataVersionService.CATEGORIES_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"カテゴリ版数の取得に失敗: {str(e)}")
+            return None
+
+    @staticmethod
+    def end_snapshot(db: Optional[Session]) -> None:
+        """
+        版の取得後に読み取りのトランザクションを終える
+
+        REPEATABLE READではトランザクション内の最初の読み取り（認証時のusers等）でスナップショットが決まる。
+        そのまま計算すると、スナップショットの後・版の取得前にcommitされた書き込みを含まない結果が
+        新しい版のキー（ETag）で保存されるため、以降の読み取りは版の取得後の新しいスナップショットで行う。
+        """
+        if db is not None:
+            db.rollback()
+
+    @staticmethod
+    def get_user_data_version(user_id: int, db: Optional[Session] = None) -> Optional[str]:
+        """
+        ユーザーの応答が依存する版（ユーザーの版とカテゴリの版の組）を取得
+
+        出費の応答にはカテゴリ名が含まれるため、両方を合わせた値をキャッシュキーやETagに使う。
+        Redis障害時はNone。db を渡すと取得後にそのセッションのトランザクションを終える（end_snapshot）。
+        """
+        user_version = DataVersionService.get_user_version(user_id)
+        categories_version = DataVersionService.get_categories_version() if user_version is not None else None
+        DataVersionService.end_snapshot(db)
+        if user_version is None or categories_version is None:
+            return None
+        return f"{user_version}.{categories_version}"
+
+    @staticmethod
+    def get_users_data_versions(user_ids: Iterable[int], db: Optional[Session] = None) -> Optional[Dict[int, str]]:
+        """
+        複数ユーザーの応答が依存する版をまとめて取得（世帯の集計用、1往復）
+
+        db を渡すと取得後にそのセッションのトランザクションを終える（end_snapshot）。
+
+        Returns:
+            {ユーザーID: get_user_data_versionと同じ形式の版}。Redis障害時はNone
+        """
+        user_ids = sorted(set(user_ids))
+        keys = [DataVersionService.user_key(user_id) for user_id in user_ids] + [DataVersionService.CATEGORIES_KEY]
+        try:
+            values = redis_client.mget(keys)
+        except Exception as e:
+            logger.warning(f"データ版数の取得に失敗: user_ids={user_ids} - {str(e)}")
+            DataVersionService.end_snapshot(db)
+            return None
+        DataVersionService.end_snapshot(db)
+        categories_version = int(values[-1] or 0)
+        return {
+            user_id: f"{int(value or 0)}.{categories_version}"
+            for user_id, value in zip(user_ids, values[:-1])
+        }
+
+    @staticmethod
+    def bump(user_ids: Set[int] = frozenset(), categories: bool = False) -> None:
+        """
+        版を進める
+
+        読み取り側は版を取得してからDBを読むため、commit後に版を進めれば
+        古いデータが新しい版のキャッシュとして保存されることはない。
+        """
+        if not user_ids and not categories:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.incr(DataVersionService.user_key(user_id))
+            if categories:
+                pipe.incr(DataVersionService.CATEGORIES_KEY)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"データ版数の更新に失敗: user_ids={sorted(user_ids)}, categories={categories} - {str(e)}")
+
+    @staticmethod
+    def install(session_factory) -> None:
+        """セッションファクトリにイベントリスナーを登録（同じファクトリへの重複登録はしない）"""
+        if event.contains(session_factory, "before_flush", DataVersionService._collect):
+            return
+        event.listen(session_factory, "before_flush", DataVersionService._collect)
+        event.listen(session_factory, "after_commit", DataVersionService._apply)
+        event.listen(session_factory, "after_rollback", DataVersionService._discard)
+
+    @staticmethod
+    def _expense_for(session: Session, obj) -> Optional[Expense]:
+        expense = obj.expense
+        if expense is None and obj.expense_id is not None:
+            expense = session.get(Expense, obj.expense_id)
+        return expense
+
+    @staticmethod
+    def _collect(session: Session, flush_context, instances) -> None:
+        """before_flush: 変更のあったユーザーとカテゴリ変更の有無を記録"""
+        user_ids: Set[int] = session.info.setdefault(PENDING_USERS_KEY, set())
+
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+
+            if isinstance(obj, Category):
+                session.info[PENDING_CATEGORIES_KEY] = True
+                continue
+
+            if isinstance(obj, Budget):
+                if obj.user_id is not None:
+                    user_ids.add(obj.user_id)
+                continue
+
+            if isinstance(obj, Expense):
+                expense = obj
+            elif isinstance(obj, (ExpenseItem, Receipt)):
+                expense = DataVersionService._expense_for(session, obj)
+            else:
+                continue
+
+            if expense is not None and expense.user_id is not None:
+                user_ids.add(expense.user_id)
+
+    @staticmethod
+    def mark_changed(session: Session, user_ids: Iterable[int]) -> None:
+        """ORMを経由しない書き込み（一括INSERT/UPDATE）で変わったユーザーを登録（commit後に版を進める）"""
+        session.info.setdefault(PENDING_USERS_KEY, set()).update(user_ids)
+
+    @staticmethod
+    def _apply(session: Session) -> None:
+        """after_commit: 記録したユーザー・カテゴリの版を進める"""
+        user_ids = session.info.pop(PENDING_USERS_KEY, set())
+        categories = session.info.pop(PENDING_CATEGORIES_KEY, False)
+        DataVersionService.bump(user_ids, categories)
+
+    @staticmethod
+    def _discard(session: Session) -> None:
+        """after_rollback: 取り消された変更の記録を破棄"""
+        session.info.pop(PENDING_USERS_KEY, None)
+        session.info.pop(PENDING_CATEGORIES_KEY, None)
@@ -0,0 +1,141 @@
+import enum
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+from app.redis_client import redis_client, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class ExpenseEvent(str, enum.Enum):
+    """出費処理の進捗イベント"""
+    STATUS = "status"                    # 接続時点の状態（スナップショット）
+    QUEUED = "queued"                    # タスク投入
+    OCR_STARTED = "ocr_started"          # OCR開始
+    ITEMS_CREATED = "items_created"      # 商品明細作成
+    ITEM_CLASSIFIED = "item_classified"  # 商品明細の分類完了
+    ITEM_FAILED = "item_failed"          # 商品明細の分類失敗（他の明細は継続）
+    COMPLETED = "completed"              # 処理終了
+    FAILED = "failed"                    # 処理失敗
+
+
+# これらのイベントを受け取ったらストリームを終了する
+TERMINAL_EVENTS = {ExpenseEvent.COMPLETED.value, ExpenseEvent.FAILED.value}
+
+
+class ExpenseEventService:
+    """Redis pub/subによる出費処理の進捗通知"""
+
+    CHANNEL_PREFIX = "expense_events"
+    LAST_EVENT_TTL = 3600  # 最終イベントの保持期間（秒）
+    HEARTBEAT_INTERVAL = 15  # キープアライブ送信間隔（秒）
+    MAX_STREAM_SECONDS = 600  # 1接続あたりの最大ストリーム時間（秒）
+
+    @staticmethod
+    def channel(expense_id: int) -> str:
+        return f"{ExpenseEventService.CHANNEL_PREFIX}:{expense_id}"
+
+    @staticmethod
+    def last_event_key(expense_id: int) -> str:
+        return f"{ExpenseEventService.CHANNEL_PREFIX}:{expense_id}:last"
+
+    @staticmethod
+    def build_event(expense_id: int, event: ExpenseEvent, **data) -> Dict:
+        return {
+            "event": event.value,
+            "expense_id": expense_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            **data
+        }
+
+    @staticmethod
+    def publish(expense_id: int, event: ExpenseEvent, **data) -> None:
+        """
+        進捗イベントを発行
+
+        通知は補助的な機能のため、Redis障害時もログのみで処理は継続する。
+        最終イベントを保持しておき、購読開始前に発行されたイベントも取りこぼさないようにする。
+        """
+        payload = json.dumps(
+            ExpenseEventService.build_event(expense_id, event, **data),
+            ensure_ascii=False,
+            default=str
+        )
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.set(ExpenseEventService.last_event_key(expense_id), payload, ex=ExpenseEventService.LAST_EVENT_TTL)
+            pipe.publish(ExpenseEventService.channel(expense_id), payload)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"進捗イベントの発行に失敗: expense_id={expense_id}, event={event.value} - {str(e)}")
+
+    @staticmethod
+    def format_sse(payload: str) -> str:
+        """JSON文字列をSSEフレームに変換"""
+        try:
+            event_name = json.loads(payload).get("event", "message")
+        except (ValueError, AttributeError):
+            event_name = "message"
+        return f"event: {event_name}\ndata: {payload}\n\n"
+
+    @staticmethod
+    def is_terminal(payload: str) -> bool:
+        try:
+            return json.loads(payload).get("event") in TERMINAL_EVENTS
+        except (ValueError, AttributeError):
+            return False
+
+    @staticmethod
+    async def stream(expense_id: int, snapshot: Dict, is_disconnected=None) -> AsyncIterator[str]:
+        """
+        SSEフレームを逐次生成
+
+        先に購読を開始してから最終イベントを確認することで、
+        スナップショット取得から購読開始までの間に発行されたイベントも拾う。
+
+        Args:
+            expense_id: Expense ID
+            snapshot: 最終イベントが無い場合に送る現在状態
+            is_disconnected: クライアント切断を判定するコルーチン関数
+        """
+        client = get_async_redis()
+        pubsub = client.pubsub()
+        channel = ExpenseEventService.channel(expense_id)
+        try:
+            await pubsub.subscribe(channel)
+
+            last_payload: Optional[str] = await client.get(ExpenseEventService.last_event_key(expense_id))
+            initial = last_payload or json.dumps(snapshot, ensure_ascii=False, default=str)
+            yield ExpenseEventService.format_sse(initial)
+            if ExpenseEventService.is_terminal(initial):
+                return
+
+            deadline = time.monotonic() + ExpenseEventService.MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                if is_disconnected and await is_disconnected():
+                    return
+
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=ExpenseEventService.HEARTBEAT_INTERVAL
+                )
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+
+                payload = message.get("data")
+                if not isinstance(payload, str):
+                    continue
+
+                yield ExpenseEventService.format_sse(payload)
+                if ExpenseEventService.is_terminal(payload):
+                    return
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"pub/sub接続のクローズに失敗: {str(e)}")
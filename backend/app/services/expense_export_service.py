@@ -0,0 +1,181 @@
+import csv
+import io
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from app.database import SessionLocal
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.services.reference_cache import ReferenceDataCache
+from app.utils.serialization import dumps
+
+# 1回のトランザクションで読む出費の件数（明細はその出費の分だけ読む）
+EXPORT_BATCH_SIZE = 500
+
+# 出力する列（明細1行ごとに出費の項目とカテゴリ名を付ける）
+EXPORT_COLUMNS = (
+    "expense_id",
+    "occurred_at",
+    "merchant_name",
+    "title",
+    "total_amount",
+    "currency",
+    "payment_method",
+    "status",
+    "note",
+    "item_id",
+    "position",
+    "product_name",
+    "quantity",
+    "unit_price",
+    "line_total",
+    "tax_rate",
+    "tax_included",
+    "tax_amount",
+    "category_id",
+    "category_name",
+    "category_source",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def _value(enum_value) -> Optional[str]:
+    return enum_value.value if hasattr(enum_value, "value") else enum_value
+
+
+class ExpenseExportService:
+    """
+    出費・明細のエクスポート（CSV / JSON Lines）
+
+    出費を (発生日時, 作成日時, ID) のキーセットでEXPORT_BATCH_SIZE件ずつ読み、その明細に
+    出費の項目を結合した行を書き出す。1ページごとに短いトランザクションで読み切ってから送信するため、
+    遅いクライアントへの送信中にカーソルや接続を保持しない（net_write_timeoutで途中切断されない）。
+    読むのは1ページ分だけなので、期間の長さによらずメモリ使用量は一定。
+    StreamingResponseの送信はリクエストのセッションが閉じた後に行われるため、専用のセッションを使う。
+    """
+
+    @staticmethod
+    def _page_keys(db, user_id: int, start: Optional[datetime], end: Optional[datetime],
+                   after: Optional[Tuple[datetime, datetime, int]]) -> List:
+        """after より後ろの出費の (ID, 発生日時, 作成日時) を古い順にEXPORT_BATCH_SIZE件"""
+        query = select(Expense.id, Expense.occurred_at, Expense.created_at).where(Expense.user_id == user_id)
+        if start:
+            query = query.where(Expense.occurred_at >= start)
+        if end:
+            query = query.where(Expense.occurred_at <= end)
+        if after:
+            after_occurred_at, after_created_at, after_id = after
+            query = query.where(or_(
+                Expense.occurred_at > after_occurred_at,
+                and_(Expense.occurred_at == after_occurred_at, Expense.created_at > after_created_at),
+                and_(
+                    Expense.occurred_at == after_occurred_at,
+                    Expense.created_at == after_created_at,
+                    Expense.id > after_id
+                )
+            ))
+        # idx_user_occurred_created の順に読む
+        query = query.order_by(Expense.occurred_at, Expense.created_at, Expense.id).limit(EXPORT_BATCH_SIZE)
+        return db.execute(query).all()
+
+    @staticmethod
+    def _item_rows(db, expense_ids: List[int]) -> List:
+        """指定した出費の明細に出費の項目を結合した行"""
+        return db.execute(
+            select(
+                Expense.id.label("expense_id"),
+                Expense.occurred_at,
+                Expense.merchant_name,
+                Expense.title,
+                Expense.total_amount,
+                Expense.currency,
+                Expense.payment_method,
+                Expense.status,
+                Expense.note,
+                ExpenseItem.id.label("item_id"),
+                ExpenseItem.position,
+                ExpenseItem.product_name,
+                ExpenseItem.quantity,
+                ExpenseItem.unit_price,
+                ExpenseItem.line_total,
+                ExpenseItem.tax_rate,
+                ExpenseItem.tax_included,
+                ExpenseItem.tax_amount,
+                ExpenseItem.category_id,
+                ExpenseItem.category_source,
+            ).join(ExpenseItem, ExpenseItem.expense_id == Expense.id)
+            .where(Expense.id.in_(expense_ids))
+            .order_by(Expense.occurred_at, Expense.created_at, Expense.id, ExpenseItem.position)
+        ).all()
+
+    @staticmethod
+    def iter_rows(user_id: int, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Iterator[Dict]:
+        """エクスポートする行（EXPORT_COLUMNSの辞書）を発生日時の古い順に返す"""
+        db = SessionLocal()
+        try:
+            category_names = ReferenceDataCache.get(db).category_name_by_id
+            after = None
+            while True:
+                keys = ExpenseExportService._page_keys(db, user_id, start, end, after)
+                if not keys:
+                    break
+                rows = ExpenseExportService._item_rows(db, [key.id for key in keys])
+                # 送信（yield）の前にトランザクションを終えて接続を返す
+                db.rollback()
+                last = keys[-1]
+                after = (last.occurred_at, last.created_at, last.id)
+
+                for row in rows:
+                    yield {
+                        **row._asdict(),
+                        "status": _value(row.status),
+                        "category_source": _value(row.category_source),
+                        "category_name": category_names.get(row.category_id) if row.category_id else None
+                    }
+                if len(keys) < EXPORT_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_csv(rows: Iterator[Dict]) -> Iterator[bytes]:
+        """CSVのバイト列（Excelで文字化けしないようBOM付きUTF-8）をEXPORT_BATCH_SIZE行ごとに返す"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in (row[column] for column in EXPORT_COLUMNS)
+            ])
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def iter_jsonl(rows: Iterator[Dict]) -> Iterator[bytes]:
+        """1行1オブジェクトのJSONのバイト列をEXPORT_BATCH_SIZE行ごとに返す"""
+        chunk = []
+        for row in rows:
+            chunk.append(dumps({column: row[column] for column in EXPORT_COLUMNS}))
+            if len(chunk) >= EXPORT_BATCH_SIZE:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    @staticmethod
+    def stream(user_id: int, format: str, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Iterator[bytes]:
+        rows = ExpenseExportService.iter_rows(user_id, start, end)
+        if format == "jsonl":
+            return ExpenseExportService.iter_jsonl(rows)
+        return ExpenseExportService.iter_csv(rows)
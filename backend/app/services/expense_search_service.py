@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import and_, func, literal, or_, select, union_all
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.models.receipt import Receipt
+from app.services.expense_view_service import ExpenseViewService
+from app.utils.cursor import encode_search_cursor
+from app.utils.search_text import build_boolean_query
+
+# 検索対象ごとのスコアの重み（店舗名・タイトル > 商品名 > OCR全文）
+MERCHANT_WEIGHT = 2.0
+ITEM_WEIGHT = 1.0
+OCR_WEIGHT = 0.5
+
+# カーソルで比較するため、スコアはSQL側で丸めてから並べる
+SCORE_DIGITS = 6
+
+
+class ExpenseSearchService:
+    """
+    出費の全文検索（店舗名・タイトル、商品名、レシートのOCR全文）
+
+    各テーブルのトークン列（app.utils.search_text で作成）のFULLTEXT索引に
+    BOOLEAN MODEで問い合わせ、検索対象ごとのスコアを重み付きで合算して出費単位に順位付けする。
+    合算・並べ替え・カーソル（スコア, ID）の条件・LIMITは1つのSQLで行い、
+    検索対象ごとの件数の上限は設けない（一致した出費は全てページをたどって取得できる）。
+    LIKE '%...%' の全件走査は行わない。
+    """
+
+    @staticmethod
+    def _with_period(query, column, start: Optional[datetime], end: Optional[datetime]):
+        if start:
+            query = query.where(column >= start)
+        if end:
+            query = query.where(column <= end)
+        return query
+
+    @staticmethod
+    def _hits(user_id: int, against: str, include_ocr: bool,
+              start: Optional[datetime], end: Optional[datetime]):
+        """検索対象ごとの (出費ID, 重み付きスコア, 対象名) を縦に並べたサブクエリ"""
+        merchant_score = match(Expense.search_tokens, against=against).in_boolean_mode()
+        merchant = select(
+            Expense.id.label("expense_id"),
+            (merchant_score * MERCHANT_WEIGHT).label("score"),
+            literal("merchant").label("source")
+        ).where(Expense.user_id == user_id, merchant_score > 0)
+        merchant = ExpenseSearchService._with_period(merchant, Expense.occurred_at, start, end)
+
+        # 1つの出費で複数の明細が一致した場合は最も高いスコアを使う
+        item_score = match(ExpenseItem.search_tokens, against=against).in_boolean_mode()
+        item = select(
+            ExpenseItem.expense_id,
+            (func.max(item_score) * ITEM_WEIGHT).label("score"),
+            literal("item").label("source")
+        ).where(ExpenseItem.user_id == user_id, item_score > 0)
+        item = ExpenseSearchService._with_period(item, ExpenseItem.occurred_at, start, end)\
+            .group_by(ExpenseItem.expense_id)
+
+        sources = [merchant, item]
+        if include_ocr:
+            ocr_score = match(Receipt.ocr_search_tokens, against=against).in_boolean_mode()
+            ocr = select(
+                Receipt.expense_id,
+                (ocr_score * OCR_WEIGHT).label("score"),
+                literal("ocr").label("source")
+            ).join(Expense, Expense.id == Receipt.expense_id)\
+             .where(Expense.user_id == user_id, ocr_score > 0)
+            sources.append(ExpenseSearchService._with_period(ocr, Expense.occurred_at, start, end))
+
+        return union_all(*sources).subquery("hits")
+
+    @staticmethod
+    def search(db: Session, user_id: int, q: str, limit: int,
+               after: Optional[Tuple[float, int]] = None, include_ocr: bool = False,
+               start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict:
+        """
+        検索結果の1ページ（スコア・IDの降順、after より後ろ）
+
+        次のページは next_cursor（最後に返した出費の (スコア, ID)）で取得する。
+        """
+        against = build_boolean_query(q)
+        page = []
+        if against:
+            hits = ExpenseSearchService._hits(user_id, against, include_ocr, start, end)
+            score = func.round(func.sum(hits.c.score), SCORE_DIGITS)
+            query = select(
+                hits.c.expense_id,
+                score.label("score"),
+                func.group_concat(hits.c.source).label("sources")
+            ).group_by(hits.c.expense_id)
+            if after:
+                after_score, after_id = after
+                query = query.having(or_(
+                    score < after_score,
+                    and_(score == after_score, hits.c.expense_id < after_id)
+                ))
+            page = db.execute(
+                query.order_by(score.desc(), hits.c.expense_id.desc()).limit(limit + 1)
+            ).all()
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_search_cursor(float(page[-1].score), page[-1].expense_id) if has_more else None
+
+        expense_ids = [row.expense_id for row in page]
+        expenses = db.query(Expense).filter(Expense.id.in_(expense_ids))\
+                     .options(*ExpenseViewService.load_options()).all() if expense_ids else []
+        by_id = {expense.id: expense for expense in expenses}
+
+        category_names = ExpenseViewService.category_names(db)
+        results = []
+        for row in page:
+            expense = by_id.get(row.expense_id)
+            if expense is None:
+                continue
+            results.append({
+                "score": float(row.score),
+                "matched": row.sources.split(","),
+                "expense": ExpenseViewService.to_dict(expense, category_names)
+            })
+
+        return {
+            "query": q,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "results": results
+        }
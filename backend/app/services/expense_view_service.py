@@ -0,0 +1,92 @@
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.services.reference_cache import ReferenceDataCache
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _value(enum_value) -> Optional[str]:
+    return enum_value.value if hasattr(enum_value, "value") else enum_value
+
+
+class ExpenseViewService:
+    """
+    出費（商品明細・レシート・カテゴリ名付き）の応答の組み立て
+
+    一覧・詳細・最近の出費で同じ読み込み方と同じ組み立てを使う。
+    明細はselectinloadで出費IDのIN句により別クエリで読むため、LIMIT付きの一覧でも
+    出費の行が明細数だけ増えることはない（レシートは1対1のためJOINのまま）。
+    カテゴリ名はプロセス内の参照データキャッシュから引き、リクエストごとに読まない。
+    キャッシュはカテゴリの版を確認して読み直すため、応答キャッシュ・ETagの版より古い名前は使われない。
+    """
+
+    @staticmethod
+    def load_options() -> tuple:
+        """出費の応答に必要なリレーションの読み込み方（query.options(*...) に渡す）"""
+        return (selectinload(Expense.items), joinedload(Expense.receipt))
+
+    @staticmethod
+    def category_names(db: Session) -> Dict[int, str]:
+        """カテゴリID→名前（無効化されたカテゴリも含む）"""
+        return ReferenceDataCache.get(db).category_name_by_id
+
+    @staticmethod
+    def item_to_dict(item: ExpenseItem, category_names: Dict[int, str]) -> Dict:
+        return {
+            "id": item.id,
+            "expense_id": item.expense_id,
+            "position": item.position,
+            "product_name": item.product_name,
+            "quantity": _float(item.quantity),
+            "unit_price": item.unit_price,
+            "line_total": item.line_total,
+            "tax_rate": _float(item.tax_rate),
+            "tax_included": item.tax_included,
+            "tax_amount": item.tax_amount,
+            "category_id": item.category_id,
+            "category_source": _value(item.category_source),
+            "ai_confidence": _float(item.ai_confidence),
+            "category_name": category_names.get(item.category_id) if item.category_id else None
+        }
+
+    @staticmethod
+    def to_dict(expense: Expense, category_names: Dict[int, str]) -> Dict:
+        receipt = expense.receipt
+        return {
+            "id": expense.id,
+            "user_id": expense.user_id,
+            "occurred_at": expense.occurred_at,
+            "merchant_name": expense.merchant_name,
+            "title": expense.title,
+            "total_amount": expense.total_amount,
+            "currency": expense.currency,
+            "payment_method": expense.payment_method,
+            "card_brand": expense.card_brand,
+            "card_last4": expense.card_last4,
+            "points_used": expense.points_used,
+            "points_earned": expense.points_earned,
+            "points_program": expense.points_program,
+            "description": expense.description,
+            "note": expense.note,
+            "status": _value(expense.status),
+            "ai_confidence": _float(expense.ai_confidence),
+            "created_at": expense.created_at,
+            "updated_at": expense.updated_at,
+            "receipt": {
+                "id": receipt.id,
+                "original_filename": receipt.original_filename,
+                "file_path": receipt.file_path,
+                "ocr_processed": receipt.ocr_processed,
+                "created_at": receipt.created_at
+            } if receipt else None,
+            "items": [ExpenseViewService.item_to_dict(item, category_names) for item in expense.items]
+        }
+
+    @staticmethod
+    def to_dicts(db: Session, expenses: List[Expense]) -> List[Dict]:
+        category_names = ExpenseViewService.category_names(db)
+        return [ExpenseViewService.to_dict(expense, category_names) for expense in expenses]
@@ -0,0 +1,167 @@
+import json
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.models.category import Category
+from app.models.monthly_category_rollup import MonthlyCategoryRollup
+from app.models.user import User
+from app.services.dashboard_service import DashboardService
+from app.services.response_cache import ResponseCache
+from app.services.spend_trend_service import SpendTrendService
+
+
+class HouseholdService:
+    """
+    世帯（複数ユーザー）の集計
+
+    メンバーごとの集計（日次・月別集計とそのキャッシュ）をそのまま取得し、メモリ上で合算する。
+    明細や出費を複数ユーザーに広げて読み直さないため、コストはメンバー数に比例するだけで済み、
+    各メンバーのキャッシュは本人のダッシュボードとも共有される。
+    """
+
+    @staticmethod
+    def member_label(user: User) -> Dict:
+        return {"user_id": user.id, "name": user.full_name or user.username}
+
+    @staticmethod
+    def composite_version(versions: Optional[Dict[int, str]]) -> Optional[str]:
+        """メンバーごとの版を1つの版にまとめる（どのメンバーの書き込みでも変わる、ETag用）"""
+        if versions is None:
+            return None
+        return ",".join(f"{user_id}:{version}" for user_id, version in sorted(versions.items()))
+
+    @staticmethod
+    def summary(
+        db: Session,
+        members: List[User],
+        versions: Optional[Dict[int, str]],
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict:
+        """メンバーごとのサマリー（本人のダッシュボードと同じキャッシュ）を合算"""
+        params = DashboardService.summary_params(start_date, end_date)
+        summaries = []
+        for member in members:
+            body, _ = ResponseCache.get_or_compute_body(
+                member.id,
+                DashboardService.SUMMARY_ENDPOINT,
+                params,
+                versions.get(member.id) if versions is not None else None,
+                lambda: DashboardService.build_summary(db, member.id, start_date, end_date)
+            )
+            summaries.append(json.loads(body))
+
+        total_expenses = sum(s["total_expenses"] for s in summaries)
+        expense_count = sum(s["expense_count"] for s in summaries)
+        prev_month_total = sum(s["comparison"]["previous_month_total"] for s in summaries)
+
+        category_totals: Dict[int, Dict] = {}
+        daily_totals: Dict[str, float] = {}
+        for s in summaries:
+            for cat in s["category_breakdown"]:
+                entry = category_totals.setdefault(cat["category_id"], {
+                    "category_id": cat["category_id"],
+                    "category_name": cat["category_name"],
+                    "color": cat["color"],
+                    "total": 0.0,
+                    "count": 0
+                })
+                entry["total"] += cat["total"]
+                entry["count"] += cat["count"]
+            for day in s["daily_expenses"]:
+                daily_totals[day["date"]] = daily_totals.get(day["date"], 0.0) + day["total"]
+
+        change_from_prev = total_expenses - prev_month_total
+        return {
+            "total_expenses": total_expenses,
+            "expense_count": expense_count,
+            "item_count": sum(s["item_count"] for s in summaries),
+            "average_expense": total_expenses / expense_count if expense_count > 0 else 0,
+            "category_breakdown": [
+                {**cat, "percentage": cat["total"] / total_expenses * 100 if total_expenses > 0 else 0}
+                for _, cat in sorted(category_totals.items())
+            ],
+            "daily_expenses": [
+                {"date": date_value, "total": total}
+                for date_value, total in sorted(daily_totals.items())
+            ],
+            "comparison": {
+                "previous_month_total": prev_month_total,
+                "change_amount": change_from_prev,
+                "change_percent": change_from_prev / prev_month_total * 100 if prev_month_total > 0 else 0
+            },
+            "members": [
+                {
+                    **HouseholdService.member_label(member),
+                    "total_expenses": s["total_expenses"],
+                    "expense_count": s["expense_count"]
+                }
+                for member, s in zip(members, summaries)
+            ],
+            "period": {
+                "start_date": str(start_date),
+                "end_date": str(end_date)
+            }
+        }
+
+    @staticmethod
+    def trends(db: Session, members: List[User], months: int, group: str, today: date) -> Dict:
+        """メンバーごとの月別推移（月単位の版でキャッシュ済み）を合算"""
+        merged = SpendTrendService.merge([
+            SpendTrendService.monthly(db, member.id, months, group, today) for member in members
+        ])
+        return SpendTrendService.present(db, merged, group)
+
+    @staticmethod
+    def categories(db: Session, members: List[User], month: date) -> Dict:
+        """
+        月のカテゴリ別合計とメンバーごとの内訳
+
+        月別カテゴリ集計（ユーザー×月×カテゴリで1行）のメンバー分だけを読み、メモリ上で合算する。
+        """
+        rows = db.query(
+            MonthlyCategoryRollup.user_id,
+            MonthlyCategoryRollup.category_id,
+            MonthlyCategoryRollup.total_amount,
+            MonthlyCategoryRollup.item_count
+        ).filter(
+            MonthlyCategoryRollup.user_id.in_([member.id for member in members]),
+            MonthlyCategoryRollup.month == month
+        ).all()
+
+        category_ids = {row.category_id for row in rows if row.category_id is not None}
+        labels = {}
+        if category_ids:
+            categories = db.query(Category.id, Category.name, Category.color)\
+                           .filter(Category.id.in_(category_ids)).all()
+            labels = {cat.id: {"category_name": cat.name, "color": cat.color} for cat in categories}
+
+        totals: Dict[Optional[int], Dict] = {}
+        for row in rows:
+            entry = totals.setdefault(row.category_id, {
+                "category_id": row.category_id,
+                **labels.get(row.category_id, {"category_name": "未分類", "color": None}),
+                "total": 0,
+                "count": 0,
+                "members": {}
+            })
+            entry["total"] += row.total_amount
+            entry["count"] += row.item_count
+            entry["members"][row.user_id] = entry["members"].get(row.user_id, 0) + row.total_amount
+
+        total = sum(entry["total"] for entry in totals.values())
+        return {
+            "month": month.strftime("%Y-%m"),
+            "total": total,
+            "categories": [
+                {
+                    **entry,
+                    "percentage": round(entry["total"] / total * 100, 1) if total > 0 else 0,
+                    "members": [
+                        {**HouseholdService.member_label(member), "total": entry["members"].get(member.id, 0)}
+                        for member in members
+                    ]
+                }
+                for entry in sorted(totals.values(), key=lambda e: -e["total"])
+            ]
+        }
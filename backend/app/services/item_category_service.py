@@ -0,0 +1,77 @@
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem, CategorySource
+from app.services.data_version_service import DataVersionService
+from app.services.spend_rollup_service import SpendRollupService
+
+
+class ItemCategoryService:
+    """
+    商品明細のカテゴリの一括変更
+
+    所有確認を1回のSELECT、変更を1回のUPDATEで行う。UPDATEはORMのオブジェクトを
+    経由しないため、集計の再計算と版の更新は対象を明示的に登録してcommit時に1回だけ行う。
+    """
+
+    @staticmethod
+    def active_category_ids(db: Session, category_ids: Iterable[int]) -> Set[int]:
+        """
+        指定したIDのうち有効なカテゴリのID
+
+        プロセス内の参照データキャッシュは他のワーカーでの追加・無効化がTTLまで反映されないため、
+        書き込み前の検証はcategoriesテーブルを直接読む。
+        """
+        category_ids = set(category_ids)
+        if not category_ids:
+            return set()
+        rows = db.query(Category.id).filter(Category.id.in_(category_ids), Category.is_active == True).all()
+        return {row.id for row in rows}
+
+    @staticmethod
+    def find_owned(db: Session, user_id: int, item_ids: List[int]) -> List:
+        """ユーザーの出費に属する明細の (ID, カテゴリ, 決定ソース, 発生日時)"""
+        return db.query(
+            ExpenseItem.id,
+            ExpenseItem.category_id,
+            ExpenseItem.category_source,
+            Expense.occurred_at
+        ).join(Expense, Expense.id == ExpenseItem.expense_id).filter(
+            ExpenseItem.id.in_(item_ids),
+            Expense.user_id == user_id
+        ).all()
+
+    @staticmethod
+    def recategorize(db: Session, user_id: int, rows: List, category_id: int) -> Dict:
+        """
+        明細のカテゴリを手入力として変更（commitは呼び出し側）
+
+        Args:
+            rows: find_owned で取得した明細
+            category_id: 変更後のカテゴリID
+
+        Returns:
+            Dict: {"updated": 変更した件数, "unchanged": 変更不要だった件数}
+        """
+        targets = [
+            row for row in rows
+            if not (row.category_id == category_id and row.category_source == CategorySource.MANUAL)
+        ]
+        if targets:
+            db.execute(
+                update(ExpenseItem)
+                .where(ExpenseItem.id.in_([row.id for row in targets]))
+                .values(category_id=category_id, category_source=CategorySource.MANUAL, ai_confidence=None)
+                .execution_options(synchronize_session=False)
+            )
+            # 集計が変わるのはカテゴリが変わった明細の日だけ（店舗別集計はカテゴリに依存しない）
+            SpendRollupService.mark_dirty(
+                db, user_id,
+                [row.occurred_at for row in targets if row.category_id != category_id],
+                merchants=False
+            )
+            DataVersionService.mark_changed(db, [user_id])
+
+        return {"updated": len(targets), "unchanged": len(rows) - len(targets)}
@@ -0,0 +1,124 @@
+from typing import Dict, List
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.expense import Expense, ExpenseStatus
+from app.models.expense_item import ExpenseItem, CategorySource
+from app.schemas.expense import ManualExpenseCreate
+from app.services.data_version_service import DataVersionService
+from app.services.item_category_service import ItemCategoryService
+from app.services.spend_rollup_service import SpendRollupService
+from app.utils.merchant import normalize_merchant_key
+from app.utils.search_text import build_search_tokens
+
+# 文字列カラムの長さ（DBで切り詰め・エラーになる前にまとめて検証する）
+MAX_NAME_LENGTH = 200
+MAX_PAYMENT_METHOD_LENGTH = 50
+
+
+class ManualExpenseService:
+    """
+    手入力の出費の登録（1件・一括）
+
+    一括登録では出費と明細をそれぞれ複数行のINSERT（出費はIDをRETURNINGで受け取る）で
+    1トランザクションに書き込む。ORMのオブジェクトを経由しないため、モデルのvalidates・
+    明細のbefore_insert・セッションのflush時の集計/版の検出は働かない。
+    それらが設定する値（正規化キー・検索トークン・明細の複製列）はここで計算し、
+    集計の再計算と版の更新は対象を明示的に登録してcommit時に行う。
+    """
+
+    @staticmethod
+    def initial_status(entry: ManualExpenseCreate) -> ExpenseStatus:
+        """カテゴリ指定またはAI分類スキップなら完了、それ以外はAI分類待ち"""
+        if entry.category_id or entry.skip_ai_classification:
+            return ExpenseStatus.COMPLETED
+        return ExpenseStatus.PROCESSING
+
+    @staticmethod
+    def title_of(entry: ManualExpenseCreate) -> str:
+        return entry.merchant_name or entry.product_name or "手入力"
+
+    @staticmethod
+    def product_name_of(entry: ManualExpenseCreate) -> str:
+        return entry.product_name or entry.note or entry.merchant_name or "購入品"
+
+    @staticmethod
+    def validate(db: Session, entries: List[ManualExpenseCreate]) -> List[str]:
+        """全件をまとめて検証し、エラーメッセージ（何件目かを含む）の一覧を返す"""
+        # カテゴリは有効なものだけを、全件分まとめて1回のSELECTで確認する
+        active_category_ids = ItemCategoryService.active_category_ids(
+            db, [entry.category_id for entry in entries if entry.category_id is not None]
+        )
+        errors = []
+        for index, entry in enumerate(entries):
+            prefix = f"expenses[{index}]"
+            if entry.total_amount < 0:
+                errors.append(f"{prefix}.total_amount: 0以上で指定してください")
+            if entry.category_id is not None and entry.category_id not in active_category_ids:
+                errors.append(f"{prefix}.category_id: カテゴリが見つかりません: {entry.category_id}")
+            for field, value in (
+                ("merchant_name", entry.merchant_name),
+                ("product_name", ManualExpenseService.product_name_of(entry)),
+            ):
+                if value and len(value) > MAX_NAME_LENGTH:
+                    errors.append(f"{prefix}.{field}: {MAX_NAME_LENGTH}文字以内で指定してください")
+            if entry.payment_method and len(entry.payment_method) > MAX_PAYMENT_METHOD_LENGTH:
+                errors.append(f"{prefix}.payment_method: {MAX_PAYMENT_METHOD_LENGTH}文字以内で指定してください")
+        return errors
+
+    @staticmethod
+    def create_manual_bulk(db: Session, user_id: int, entries: List[ManualExpenseCreate]) -> List[Dict]:
+        """
+        手入力の出費をまとめて登録（commitは呼び出し側）
+
+        Returns:
+            List[Dict]: 入力と同じ順序の {"id", "item_id", "status"}
+        """
+        statuses = [ManualExpenseService.initial_status(entry) for entry in entries]
+        header_rows = []
+        for entry, status in zip(entries, statuses):
+            title = ManualExpenseService.title_of(entry)
+            header_rows.append({
+                "user_id": user_id,
+                "occurred_at": entry.occurred_at,
+                "merchant_name": entry.merchant_name,
+                "merchant_key": normalize_merchant_key(entry.merchant_name),
+                "search_tokens": build_search_tokens(entry.merchant_name, title),
+                "title": title,
+                "total_amount": entry.total_amount,
+                "payment_method": entry.payment_method,
+                "description": entry.description,
+                "note": entry.note,
+                "status": status
+            })
+        # MariaDB 10.5以上のINSERT ... RETURNINGで、複数行のINSERTのまま入力順にIDを受け取る
+        expense_ids = db.scalars(
+            insert(Expense).returning(Expense.id, sort_by_parameter_order=True),
+            header_rows
+        ).all()
+
+        item_rows = []
+        for entry, expense_id in zip(entries, expense_ids):
+            product_name = ManualExpenseService.product_name_of(entry)
+            item_rows.append({
+                "expense_id": expense_id,
+                "user_id": user_id,
+                "occurred_at": entry.occurred_at,
+                "position": 0,
+                "product_name": product_name,
+                "search_tokens": build_search_tokens(product_name),
+                "line_total": entry.total_amount,
+                "category_id": entry.category_id,
+                "category_source": CategorySource.MANUAL if entry.category_id else None
+            })
+        item_ids = db.scalars(
+            insert(ExpenseItem).returning(ExpenseItem.id, sort_by_parameter_order=True),
+            item_rows
+        ).all()
+
+        SpendRollupService.mark_dirty(db, user_id, [entry.occurred_at for entry in entries])
+        DataVersionService.mark_changed(db, [user_id])
+
+        return [
+            {"id": expense_id, "item_id": item_id, "status": status.value}
+            for expense_id, item_id, status in zip(expense_ids, item_ids, statuses)
+        ]
@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.ai_settings import AISettings
+from app.models.category import Category
+from app.redis_client import redis_client, create_subscriber_redis
+from app.services.category_rule_service import CategoryRuleService, CompiledRule
+from app.services.data_version_service import DataVersionService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AISettingsSnapshot:
+    """AI設定のスナップショット（セッションに依存しない）"""
+    ocr_model: str
+    ocr_enabled: bool
+    classification_model: str
+    classification_enabled: bool
+    sandbox_mode: Optional[str]
+    skip_git_repo_check: bool
+    ocr_system_prompt: Optional[str] = None
+    classification_system_prompt: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """カテゴリ・AI設定・分類ルールの読み取り専用スナップショット"""
+    active_category_names: List[str]
+    category_id_by_name: Dict[str, int]
+    category_name_by_id: Dict[int, str]  # 無効化されたカテゴリも含む（既存明細の表示用）
+    ai_settings: AISettingsSnapshot
+    rules: Tuple[CompiledRule, ...] = field(default_factory=tuple)
+    categories_version: Optional[int] = None  # 読込前に取得したカテゴリの版（Redis障害時はNone）
+
+    def find_rule(self, text_candidates: List[str]) -> Optional[CompiledRule]:
+        return CategoryRuleService.match_compiled(self.rules, text_candidates)
+
+
+def _column_default(column_name: str):
+    default = AISettings.__table__.c[column_name].default
+    return default.arg if default is not None and default.is_scalar else None
+
+
+class ReferenceDataCache:
+    """
+    プロセス単位の参照データキャッシュ
+
+    カテゴリ・AI設定・分類ルールはタスクごとに再取得せずプロセス内で共有する。
+    取得のたびにカテゴリの版（DataVersionService）を1回読み、読込時の版から進んでいれば再読込するため、
+    カテゴリの変更はpub/subの通知を取りこぼしても次の取得から反映される。
+    AI設定・分類ルールの変更はRedis pub/subの無効化通知で即時に反映し、
+    通知を取りこぼした場合もTTL経過後には必ず再読込される。
+    """
+
+    CHANNEL = "reference_data:invalidate"
+    TTL_SECONDS = 300
+
+    _lock = threading.Lock()
+    _snapshot: Optional[ReferenceData] = None
+    _loaded_at: float = 0.0
+    _generation: int = 0
+    _listener_pid: Optional[int] = None
+
+    @classmethod
+    def _is_fresh(cls, snapshot: Optional[ReferenceData], categories_version: Optional[int]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.categories_version == categories_version
+            and time.monotonic() - cls._loaded_at < cls.TTL_SECONDS
+        )
+
+    @classmethod
+    def get(cls, db: Session) -> ReferenceData:
+        """参照データを取得（期限切れ・無効化済み・カテゴリの版が進んだ場合はDBから再読込）"""
+        cls._ensure_listener()
+        categories_version = DataVersionService.get_categories_version()
+
+        snapshot = cls._snapshot
+        if cls._is_fresh(snapshot, categories_version):
+            return snapshot
+
+        with cls._lock:
+            snapshot = cls._snapshot
+            if cls._is_fresh(snapshot, categories_version):
+                return snapshot
+
+            generation = cls._generation
+            # 呼び出し側のトランザクションは版の取得より前のスナップショットで読んでいる可能性があるため、
+            # 版の取得後に始まる別のセッションで読む（古いカテゴリ名に新しい版が付かない）
+            with Session(bind=db.get_bind()) as load_db:
+                snapshot = cls._load(load_db, categories_version)
+            # 読込中に無効化通知が届いた場合は古い可能性があるため保持しない
+            if generation == cls._generation:
+                cls._snapshot = snapshot
+                cls._loaded_at = time.monotonic()
+            return snapshot
+
+    @classmethod
+    def invalidate_local(cls) -> None:
+        """このプロセスのキャッシュを破棄"""
+        cls._generation += 1
+        cls._snapshot = None
+
+    @classmethod
+    def publish_invalidation(cls, kind: str) -> None:
+        """
+        全プロセスへ無効化を通知
+
+        エンドポイントで参照データを変更・コミットした後に呼び出す。
+        """
+        cls.invalidate_local()
+        try:
+            redis_client.publish(cls.CHANNEL, kind)
+        except Exception as e:
+            logger.warning(f"参照データの無効化通知に失敗（TTLで反映されます）: {kind} - {str(e)}")
+
+    @staticmethod
+    def _load(db: Session, categories_version: Optional[int]) -> ReferenceData:
+        categories = db.query(Category).order_by(Category.sort_order, Category.name).all()
+        active = [cat for cat in categories if cat.is_active]
+
+        ai_settings = db.query(AISettings).first()
+        if ai_settings:
+            ai_snapshot = AISettingsSnapshot(
+                ocr_model=ai_settings.ocr_model,
+                ocr_enabled=bool(ai_settings.ocr_enabled),
+                classification_model=ai_settings.classification_model,
+                classification_enabled=bool(ai_settings.classification_enabled),
+                sandbox_mode=ai_settings.sandbox_mode,
+                skip_git_repo_check=bool(ai_settings.skip_git_repo_check),
+                ocr_system_prompt=ai_settings.ocr_system_prompt,
+                classification_system_prompt=ai_settings.classification_system_prompt,
+            )
+        else:
+            # 未作成の場合はデフォルト値を使う（タスクからは書き込まない）
+            ai_snapshot = AISettingsSnapshot(
+                ocr_model=_column_default("ocr_model"),
+                ocr_enabled=_column_default("ocr_enabled"),
+                classification_model=_column_default("classification_model"),
+                classification_enabled=_column_default("classification_enabled"),
+                sandbox_mode=_column_default("sandbox_mode"),
+                skip_git_repo_check=_column_default("skip_git_repo_check"),
+            )
+
+        rules = CategoryRuleService.compile_rules(CategoryRuleService.load_active_rules(db))
+
+        return ReferenceData(
+            active_category_names=[cat.name for cat in active],
+            category_id_by_name={cat.name: cat.id for cat in active},
+            category_name_by_id={cat.id: cat.name for cat in categories},
+            ai_settings=ai_snapshot,
+            rules=rules,
+            categories_version=categories_version,
+        )
+
+    @classmethod
+    def _ensure_listener(cls) -> None:
+        """購読スレッドをプロセスごとに1つ起動（prefork後の子プロセスでも起動する）"""
+        pid = os.getpid()
+        if cls._listener_pid == pid:
+            return
+
+        with cls._lock:
+            if cls._listener_pid == pid:
+                return
+            cls._listener_pid = pid
+            # fork元のキャッシュは引き継がない
+            cls.invalidate_local()
+            thread = threading.Thread(
+                target=cls._listen,
+                name="reference-data-invalidation",
+                daemon=True
+            )
+            thread.start()
+
+    @classmethod
+    def _listen(cls) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = create_subscriber_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(cls.CHANNEL)
+                # 再接続までの間の変更を取りこぼしている可能性があるため破棄
+                cls.invalidate_local()
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        logger.info(f"参照データの無効化通知を受信: {message.get('data')}")
+                        cls.invalidate_local()
+            except Exception as e:
+                logger.warning(f"参照データ無効化の購読が切断されました。再接続します: {str(e)}")
+                time.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
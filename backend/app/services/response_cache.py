@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi.responses import Response
+from app.config import settings
+from app.redis_client import redis_client
+from app.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    ユーザー単位のJSON応答キャッシュ
+
+    キーに (ユーザー, エンドポイント, パラメータ, データ版数) を含めるため、
+    書き込みで版が進めば古いエントリは参照されなくなる（削除は不要、TTLで消える）。
+    ヒット時はシリアライズ済みのJSONをそのまま返す。
+    """
+
+    KEY_PREFIX = "response_cache"
+
+    @staticmethod
+    def build_key(user_id: int, endpoint: str, params: Dict[str, Any], version: str) -> str:
+        params_json = json.dumps(params, sort_keys=True, default=str)
+        params_hash = hashlib.sha1(params_json.encode("utf-8")).hexdigest()[:16]
+        return f"{ResponseCache.KEY_PREFIX}:{user_id}:{endpoint}:{version}:{params_hash}"
+
+    @staticmethod
+    def render(content: Any) -> str:
+        """応答と同じ形式（ORJSONResponse）でシリアライズ"""
+        return dumps(content).decode("utf-8")
+
+    @staticmethod
+    def json_response(body: str, cache_status: str) -> Response:
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"X-Cache": cache_status}
+        )
+
+    @staticmethod
+    def get_or_compute_body(
+        user_id: int,
+        endpoint: str,
+        params: Dict[str, Any],
+        version: Optional[str],
+        compute: Callable[[], Any]
+    ) -> Tuple[str, str]:
+        """
+        キャッシュ済みのJSON文字列を返し、無ければ計算して保存する
+
+        版数（DataVersionService.get_user_data_version）は呼び出し側がDBを読む前に、dbを渡して取得しておく
+        （取得後にトランザクションを終えるため、計算は版より新しいスナップショットで行われる）。
+        計算中に書き込みがあってもその結果は古い版のキーに保存されるだけで、新しい版では再計算される。
+        版数が無い（Redis障害時）場合はキャッシュを使わずに計算する。
+
+        Returns:
+            (JSON文字列, キャッシュの状態 HIT/MISS/BYPASS)
+        """
+        ttl = settings.DASHBOARD_CACHE_TTL_SECONDS
+        if version is None or ttl <= 0:
+            return ResponseCache.render(compute()), "BYPASS"
+
+        key = ResponseCache.build_key(user_id, endpoint, params, version)
+        try:
+            cached = redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"応答キャッシュの取得に失敗: {key} - {str(e)}")
+            cached = None
+        if cached is not None:
+            return cached, "HIT"
+
+        body = ResponseCache.render(compute())
+        try:
+            redis_client.set(key, body, ex=ttl)
+        except Exception as e:
+            logger.warning(f"応答キャッシュの保存に失敗: {key} - {str(e)}")
+        return body, "MISS"
+
+    @staticmethod
+    def get_or_compute(
+        user_id: int,
+        endpoint: str,
+        params: Dict[str, Any],
+        version: Optional[str],
+        compute: Callable[[], Any]
+    ) -> Response:
+        """キャッシュ済みの応答を返し、無ければ計算して保存する（get_or_compute_bodyの応答版）"""
+        body, cache_status = ResponseCache.get_or_compute_body(user_id, endpoint, params, version, compute)
+        return ResponseCache.json_response(body, cache_status)
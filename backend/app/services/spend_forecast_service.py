@@ -0,0 +1,344 @@
+import calendar
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.category import Category
+from app.models.daily_spend_rollup import DailySpendRollup
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.services.spend_rollup_service import SpendRollupService
+from app.services.spend_trend_service import SpendTrendService
+
+# 修正Zスコア（中央値・MADによる頑健なZ値）の係数と、異常とみなす閾値
+MODIFIED_Z_FACTOR = 0.6745
+ANOMALY_Z_THRESHOLD = 3.5
+# 予測の幅（片側95%の正規近似）
+FORECAST_INTERVAL_Z = 1.645
+
+
+@dataclass(frozen=True)
+class SpendHistory:
+    """
+    当月より前の履歴の配列と統計量（ユーザー単位でプロセス内にキャッシュ）
+
+    カテゴリ0はカテゴリ未設定を表す。
+    """
+    category_ids: np.ndarray      # (C,) カテゴリID（昇順）
+    daily_rate: np.ndarray        # (C,) 直近RATE_WINDOW_DAYS日の1日あたり平均支出
+    daily_std: np.ndarray         # (C,) 同期間の日別支出の標準偏差
+    total_daily_std: float        # 同期間の日別合計の標準偏差
+    day_log_median: float         # 支出のあった日の日別合計（log）の中央値
+    day_log_mad: float            # 同MAD
+    day_samples: int              # 支出のあった日数
+    item_log_median: np.ndarray   # (C,) カテゴリ別の明細行合計（log）の中央値
+    item_log_mad: np.ndarray      # (C,) 同MAD
+    item_samples: np.ndarray      # (C,) カテゴリ別の明細数
+
+
+def _group_median(groups: np.ndarray, values: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """グループ別の中央値と件数（並べ替え1回、件数0のグループはNaN）"""
+    counts = np.bincount(groups, minlength=n_groups)
+    medians = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return medians, counts
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    medians[has] = (sorted_values[lo] + sorted_values[hi]) / 2
+    return medians, counts
+
+
+def _robust_z(values: np.ndarray, median, mad) -> np.ndarray:
+    """修正Zスコア（MADが0の箇所は0）"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = MODIFIED_Z_FACTOR * (values - median) / mad
+    return np.where(np.isfinite(z), z, 0.0)
+
+
+def _project(spent: np.ndarray, daily_rate: np.ndarray, daily_std: np.ndarray,
+             days_elapsed: int, days_in_month: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    月末予測とその幅（カテゴリ別）
+
+    ペースは当月の実績と履歴の直近ペースを経過日数の割合で加重平均する（月初ほど履歴を重視）。
+    """
+    remaining = days_in_month - days_elapsed
+    weight = days_elapsed / days_in_month
+    rate = weight * (spent / days_elapsed) + (1 - weight) * daily_rate
+    projected = spent + rate * remaining
+    spread = FORECAST_INTERVAL_Z * daily_std * np.sqrt(remaining)
+    return projected, spread
+
+
+class SpendForecastService:
+    """
+    月末の支出予測と異常検知
+
+    日次集計と明細の行合計をNumPy配列として読み、予測・統計量はすべてベクトル演算で求める。
+    当月より前の履歴（HISTORY_MONTHSか月分）の配列と統計量は、その月々の集計の版
+    （SpendRollupService）をキーにプロセス内にキャッシュするため、過去月が編集されない限り
+    リクエストごとに読むのは当月分だけになる。
+    """
+
+    HISTORY_MONTHS = 12
+    RATE_WINDOW_DAYS = 90        # 1日あたりの支出ペースを求める直近の日数
+    MIN_DAY_SAMPLES = 14         # 日別の異常判定に必要な履歴の日数
+    MIN_ITEM_SAMPLES = 10        # 明細の異常判定に必要なカテゴリ内の履歴件数
+    MAX_ANOMALIES = 20
+    MAX_CACHED_USERS = 256
+
+    _lock = threading.Lock()
+    _history_cache: "OrderedDict[int, Tuple[tuple, SpendHistory]]" = OrderedDict()
+
+    @staticmethod
+    def _month_start(day: date) -> date:
+        return day.replace(day=1)
+
+    @staticmethod
+    def _load_history(db: Session, user_id: int, start: date, end: date) -> SpendHistory:
+        """[start, end) の日次集計・明細から履歴の配列と統計量を作る"""
+        n_days = (end - start).days
+        zero = func.coalesce(DailySpendRollup.category_id, 0)
+        rollup = np.array(db.query(
+            func.datediff(DailySpendRollup.spend_date, start),
+            zero,
+            func.sum(DailySpendRollup.total_amount)
+        ).filter(
+            DailySpendRollup.user_id == user_id,
+            DailySpendRollup.spend_date >= start,
+            DailySpendRollup.spend_date < end
+        ).group_by(DailySpendRollup.spend_date, zero).all(), dtype=np.int64).reshape(-1, 3)
+
+        items = np.array(db.query(
+            func.coalesce(ExpenseItem.category_id, 0),
+            ExpenseItem.line_total
+        ).filter(
+            ExpenseItem.user_id == user_id,
+            ExpenseItem.occurred_at >= datetime.combine(start, datetime.min.time()),
+            ExpenseItem.occurred_at < datetime.combine(end, datetime.min.time()),
+            ExpenseItem.line_total > 0
+        ).all(), dtype=np.int64).reshape(-1, 2)
+
+        category_ids = np.union1d(rollup[:, 1], items[:, 0])
+        n_categories = len(category_ids)
+
+        # カテゴリ×日の行列（当月より前のn_days日分）
+        matrix = np.zeros((n_categories, n_days))
+        np.add.at(matrix, (np.searchsorted(category_ids, rollup[:, 1]), rollup[:, 0]), rollup[:, 2])
+        recent = matrix[:, -SpendForecastService.RATE_WINDOW_DAYS:]
+        totals = matrix.sum(axis=0)
+
+        spent_days = np.log(totals[totals > 0])
+        day_median = float(np.median(spent_days)) if len(spent_days) else 0.0
+        day_mad = float(np.median(np.abs(spent_days - day_median))) if len(spent_days) else 0.0
+
+        item_groups = np.searchsorted(category_ids, items[:, 0])
+        item_values = np.log(items[:, 1].astype(np.float64))
+        item_median, item_counts = _group_median(item_groups, item_values, n_categories)
+        item_mad, _ = _group_median(item_groups, np.abs(item_values - item_median[item_groups]), n_categories)
+
+        return SpendHistory(
+            category_ids=category_ids,
+            daily_rate=recent.mean(axis=1) if recent.size else np.zeros(n_categories),
+            daily_std=recent.std(axis=1) if recent.size else np.zeros(n_categories),
+            total_daily_std=float(recent.sum(axis=0).std()) if recent.size else 0.0,
+            day_log_median=day_median,
+            day_log_mad=day_mad,
+            day_samples=len(spent_days),
+            item_log_median=item_median,
+            item_log_mad=item_mad,
+            item_samples=item_counts
+        )
+
+    @classmethod
+    def history(cls, db: Session, user_id: int, today: date) -> SpendHistory:
+        """
+        当月より前の履歴を取得（過去月の集計の版が変わらない限りプロセス内のキャッシュを使う）
+
+        当月の書き込みでは過去月の版は変わらないため、アップロード直後でも履歴は読み直さない。
+        """
+        month_start = cls._month_start(today)
+        starts = SpendTrendService.month_starts(cls.HISTORY_MONTHS + 1, today)[:-1]
+        labels = [SpendRollupService.month_label(start) for start in starts]
+        versions = SpendRollupService.get_month_versions(user_id, labels, db)
+        key = (tuple(labels), tuple(versions)) if versions is not None else None
+
+        if key is not None:
+            with cls._lock:
+                cached = cls._history_cache.get(user_id)
+                if cached is not None and cached[0] == key:
+                    cls._history_cache.move_to_end(user_id)
+                    return cached[1]
+
+        history = cls._load_history(db, user_id, starts[0], month_start)
+
+        if key is not None:
+            with cls._lock:
+                cls._history_cache[user_id] = (key, history)
+                cls._history_cache.move_to_end(user_id)
+                while len(cls._history_cache) > cls.MAX_CACHED_USERS:
+                    cls._history_cache.popitem(last=False)
+        return history
+
+    @classmethod
+    def forecast(cls, db: Session, user_id: int, today: date) -> Dict:
+        """
+        当月の月末支出の予測（カテゴリ別・合計）と、当月の異常な日・明細
+
+        予測は「当月の実績＋残り日数×1日あたりのペース」で、ペースは当月の実績と
+        履歴の直近ペースを経過日数の割合で加重平均する（月初ほど履歴を重視）。
+        異常は履歴の中央値・MAD（log）に対する修正Zスコアで判定する。
+        """
+        history = cls.history(db, user_id, today)
+        month_start = cls._month_start(today)
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        days_elapsed = today.day
+        remaining = days_in_month - days_elapsed
+
+        zero = func.coalesce(DailySpendRollup.category_id, 0)
+        current = np.array(db.query(
+            func.datediff(DailySpendRollup.spend_date, month_start),
+            zero,
+            func.sum(DailySpendRollup.total_amount)
+        ).filter(
+            DailySpendRollup.user_id == user_id,
+            DailySpendRollup.spend_date >= month_start,
+            DailySpendRollup.spend_date <= today
+        ).group_by(DailySpendRollup.spend_date, zero).all(), dtype=np.int64).reshape(-1, 3)
+
+        current_items = np.array(db.query(
+            ExpenseItem.id,
+            func.coalesce(ExpenseItem.category_id, 0),
+            ExpenseItem.line_total
+        ).filter(
+            ExpenseItem.user_id == user_id,
+            ExpenseItem.occurred_at >= datetime.combine(month_start, datetime.min.time()),
+            ExpenseItem.occurred_at < datetime.combine(today + timedelta(days=1), datetime.min.time()),
+            ExpenseItem.line_total > 0
+        ).all(), dtype=np.int64).reshape(-1, 3)
+
+        # 履歴と当月のカテゴリをそろえる（履歴に無いカテゴリは統計量なし）
+        category_ids = np.union1d(history.category_ids, np.union1d(current[:, 1], current_items[:, 1]))
+        n_categories = len(category_ids)
+        hist_index = np.searchsorted(category_ids, history.category_ids)
+
+        def aligned(values: np.ndarray, fill) -> np.ndarray:
+            result = np.full(n_categories, fill, dtype=np.float64)
+            result[hist_index] = values
+            return result
+
+        daily_rate = aligned(history.daily_rate, 0.0)
+        daily_std = aligned(history.daily_std, 0.0)
+        item_median = aligned(history.item_log_median, np.nan)
+        item_mad = aligned(history.item_log_mad, np.nan)
+        item_samples = aligned(history.item_samples, 0)
+
+        # 当月のカテゴリ×日
+        matrix = np.zeros((n_categories, days_elapsed))
+        np.add.at(matrix, (np.searchsorted(category_ids, current[:, 1]), current[:, 0]), current[:, 2])
+        spent = matrix.sum(axis=1)
+
+        # 月末予測
+        projected, spread = _project(spent, daily_rate, daily_std, days_elapsed, days_in_month)
+        total_spent = float(spent.sum())
+        total_projected = float(projected.sum())
+        total_spread = FORECAST_INTERVAL_Z * history.total_daily_std * np.sqrt(remaining)
+
+        # 異常な日（日別合計が履歴の分布から大きく外れた日）
+        day_totals = matrix.sum(axis=0)
+        anomalous_days = []
+        if history.day_samples >= cls.MIN_DAY_SAMPLES and history.day_log_mad > 0:
+            with np.errstate(divide="ignore"):
+                day_z = _robust_z(np.log(day_totals), history.day_log_median, history.day_log_mad)
+            flagged = np.flatnonzero((day_totals > 0) & (day_z > ANOMALY_Z_THRESHOLD))
+            top_category = category_ids[matrix.argmax(axis=0)] if len(flagged) else None
+            for day_index in flagged[np.argsort(-day_z[flagged])][:cls.MAX_ANOMALIES]:
+                anomalous_days.append({
+                    "date": str(month_start + timedelta(days=int(day_index))),
+                    "total": int(day_totals[day_index]),
+                    "typical": int(round(np.exp(history.day_log_median))),
+                    "score": round(float(day_z[day_index]), 2),
+                    "top_category_id": int(top_category[day_index]) or None
+                })
+
+        # 異常な明細（行合計がカテゴリの履歴の分布から大きく外れた明細）
+        anomalous_items = []
+        if len(current_items):
+            groups = np.searchsorted(category_ids, current_items[:, 1])
+            values = np.log(current_items[:, 2].astype(np.float64))
+            item_z = _robust_z(values, item_median[groups], item_mad[groups])
+            eligible = (item_samples[groups] >= cls.MIN_ITEM_SAMPLES) & (item_mad[groups] > 0)
+            flagged = np.flatnonzero(eligible & (item_z > ANOMALY_Z_THRESHOLD))
+            flagged = flagged[np.argsort(-item_z[flagged])][:cls.MAX_ANOMALIES]
+            if len(flagged):
+                ids = [int(i) for i in current_items[flagged, 0]]
+                details = {
+                    row.id: row for row in db.query(
+                        ExpenseItem.id, ExpenseItem.expense_id, ExpenseItem.product_name, ExpenseItem.occurred_at,
+                        Expense.merchant_name
+                    ).join(Expense, Expense.id == ExpenseItem.expense_id).filter(ExpenseItem.id.in_(ids)).all()
+                }
+                for index in flagged:
+                    row = details.get(int(current_items[index, 0]))
+                    if row is None:
+                        continue
+                    anomalous_items.append({
+                        "id": row.id,
+                        "expense_id": row.expense_id,
+                        "product_name": row.product_name,
+                        "merchant_name": row.merchant_name,
+                        "occurred_at": row.occurred_at,
+                        "category_id": int(current_items[index, 1]) or None,
+                        "line_total": int(current_items[index, 2]),
+                        "typical": int(round(np.exp(item_median[groups[index]]))),
+                        "score": round(float(item_z[index]), 2)
+                    })
+
+        # 表示名（当月に支出か予測のあるカテゴリのみ）
+        shown = np.flatnonzero((spent > 0) | (projected > 0))
+        names = {}
+        shown_ids = [int(category_ids[i]) for i in shown if category_ids[i] != 0]
+        if shown_ids:
+            names = {
+                cat.id: cat for cat in db.query(Category.id, Category.name, Category.color)
+                .filter(Category.id.in_(shown_ids)).all()
+            }
+
+        categories = []
+        for i in shown[np.argsort(-projected[shown])]:
+            category_id = int(category_ids[i]) or None
+            category = names.get(category_id)
+            categories.append({
+                "category_id": category_id,
+                "category_name": category.name if category else "未分類",
+                "color": category.color if category else None,
+                "spent": int(spent[i]),
+                "projected": int(round(projected[i])),
+                "low": int(round(max(spent[i], projected[i] - spread[i]))),
+                "high": int(round(projected[i] + spread[i]))
+            })
+
+        return {
+            "month": SpendRollupService.month_label(today),
+            "days_elapsed": days_elapsed,
+            "days_in_month": days_in_month,
+            "total": {
+                "spent": int(total_spent),
+                "projected": int(round(total_projected)),
+                "low": int(round(max(total_spent, total_projected - total_spread))),
+                "high": int(round(total_projected + total_spread))
+            },
+            "categories": categories,
+            "anomalies": {
+                "days": anomalous_days,
+                "items": anomalous_items
+            }
+        }
@@ -0,0 +1,411 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, func, select, insert, delete, inspect, literal
+from sqlalchemy.orm import Session
+from app.models.expense import Expense
+from app.models.expense_item import ExpenseItem
+from app.models.daily_spend_rollup import DailySpendRollup
+from app.models.monthly_merchant_rollup import MonthlyMerchantRollup
+from app.models.monthly_category_rollup import MonthlyCategoryRollup
+from app.redis_client import redis_client
+from app.services.budget_service import BudgetService
+from app.services.data_version_service import DataVersionService
+
+logger = logging.getLogger(__name__)
+
+# session.info に溜める再計算対象（(user_id, date) の集合）のキー
+DIRTY_KEY = "spend_rollup_dirty"
+# session.info に溜める店舗集計の再計算対象（(user_id, 月初日) の集合）のキー
+MERCHANT_DIRTY_KEY = "merchant_rollup_dirty"
+# session.info に溜める、commit後に版を進める (user_id, "YYYY-MM") の集合のキー
+CHANGED_MONTHS_KEY = "spend_rollup_changed_months"
+
+# 変更されると集計値が変わる属性
+EXPENSE_ROLLUP_ATTRS = ("user_id", "occurred_at", "payment_method")
+ITEM_ROLLUP_ATTRS = ("expense_id", "line_total", "category_id")
+EXPENSE_MERCHANT_ATTRS = ("user_id", "occurred_at", "merchant_name", "total_amount")
+
+RollupKey = Tuple[int, date]
+
+
+class SpendRollupService:
+    """
+    日次支出集計（daily_spend_rollup）・月別カテゴリ集計（monthly_category_rollup）・
+    月別店舗集計（monthly_merchant_rollup）の維持
+
+    出費・明細の追加/編集/再分類/削除をセッションのflush時に検出し、
+    commit直前に影響のあった (ユーザー, 日付) だけを明細から再計算する。
+    差分加算ではなく日単位の再計算にしているため、どの書き込み経路でも
+    二重計上やずれが起きず、再計算のコストもその日の明細数に収まる。
+
+    集計が変わった月はcommit後にRedisの月単位の版を進める。月別の集計結果は
+    この版をキーに含めてキャッシュするため、過去月は編集されない限り再計算されない。
+    """
+
+    VERSION_PREFIX = "spend_rollup_version"
+    EPOCH_KEY = f"{VERSION_PREFIX}:epoch"  # 修復スクリプトで全体を作り直したときに進める
+
+    @staticmethod
+    def install(session_factory) -> None:
+        """セッションファクトリにイベントリスナーを登録（同じファクトリへの重複登録はしない）"""
+        if event.contains(session_factory, "before_flush", SpendRollupService._collect):
+            return
+        event.listen(session_factory, "before_flush", SpendRollupService._collect)
+        event.listen(session_factory, "before_commit", SpendRollupService._apply)
+        event.listen(session_factory, "after_commit", SpendRollupService._bump_changed_months)
+        event.listen(session_factory, "after_rollback", SpendRollupService._discard)
+
+    @staticmethod
+    def month_label(day: date) -> str:
+        return day.strftime("%Y-%m")
+
+    @staticmethod
+    def month_version_key(user_id: int, month: str) -> str:
+        return f"{SpendRollupService.VERSION_PREFIX}:{user_id}:{month}"
+
+    @staticmethod
+    def get_month_versions(user_id: int, months: List[str], db: Optional[Session] = None) -> Optional[List[str]]:
+        """
+        月ごとの集計の版を取得（Redis障害時はNone）
+
+        版は「全体の作り直し回数.その月の更新回数」の形で、どちらかが進めば変わる。
+        db を渡すと取得後にそのセッションのトランザクションを終える（DataVersionService.end_snapshot）。
+        """
+        try:
+            epoch, *versions = redis_client.mget(
+                [SpendRollupService.EPOCH_KEY]
+                + [SpendRollupService.month_version_key(user_id, month) for month in months]
+            )
+        except Exception as e:
+            logger.warning(f"日次集計の版の取得に失敗: user_id={user_id} - {str(e)}")
+            DataVersionService.end_snapshot(db)
+            return None
+        DataVersionService.end_snapshot(db)
+        return [f"{epoch or 0}.{version or 0}" for version in versions]
+
+    @staticmethod
+    def bump_epoch() -> None:
+        """全ユーザー・全月の版を進める（修復で集計を作り直した後に呼ぶ）"""
+        try:
+            redis_client.incr(SpendRollupService.EPOCH_KEY)
+        except Exception as e:
+            logger.error(f"日次集計の版の更新に失敗: {str(e)}")
+
+    @staticmethod
+    def _bump_changed_months(session: Session) -> None:
+        """after_commit: 集計が変わった月の版を進める"""
+        changed = session.info.pop(CHANGED_MONTHS_KEY, set())
+        if not changed:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for user_id, month in changed:
+                pipe.incr(SpendRollupService.month_version_key(user_id, month))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"日次集計の版の更新に失敗: {sorted(changed)} - {str(e)}")
+
+    @staticmethod
+    def _to_date(value) -> Optional[date]:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return None
+
+    @staticmethod
+    def _add_key(keys: Set[RollupKey], user_id, occurred_at) -> None:
+        day = SpendRollupService._to_date(occurred_at)
+        if user_id is not None and day is not None:
+            keys.add((user_id, day))
+
+    @staticmethod
+    def _attr_values(obj, attr: str):
+        """属性の現在値と変更前の値をまとめて返す（commit後に期限切れの属性は読み直す）"""
+        history = inspect(obj).attrs[attr].history
+        values = list(history.added or ()) + list(history.unchanged or ()) + list(history.deleted or ())
+        return values or [getattr(obj, attr)]
+
+    @staticmethod
+    def _expense_keys(obj: Expense, keys: Set[RollupKey]) -> None:
+        for user_id in SpendRollupService._attr_values(obj, "user_id"):
+            for occurred_at in SpendRollupService._attr_values(obj, "occurred_at"):
+                SpendRollupService._add_key(keys, user_id, occurred_at)
+
+    @staticmethod
+    def _merchant_keys(obj: Expense, keys: Set[RollupKey]) -> None:
+        days: Set[RollupKey] = set()
+        SpendRollupService._expense_keys(obj, days)
+        keys.update((user_id, day.replace(day=1)) for user_id, day in days)
+
+    @staticmethod
+    def _is_changed(obj, attrs: Tuple[str, ...]) -> bool:
+        state = inspect(obj)
+        return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+    @staticmethod
+    def _collect(session: Session, flush_context, instances) -> None:
+        """before_flush: 集計に影響する変更から再計算対象の (ユーザー, 日付/月) を集める"""
+        keys: Set[RollupKey] = session.info.setdefault(DIRTY_KEY, set())
+        merchant_keys: Set[RollupKey] = session.info.setdefault(MERCHANT_DIRTY_KEY, set())
+
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            is_dirty = obj not in session.new and obj not in session.deleted
+
+            if isinstance(obj, Expense):
+                if not is_dirty or SpendRollupService._is_changed(obj, EXPENSE_ROLLUP_ATTRS):
+                    SpendRollupService._expense_keys(obj, keys)
+                if not is_dirty or SpendRollupService._is_changed(obj, EXPENSE_MERCHANT_ATTRS):
+                    SpendRollupService._merchant_keys(obj, merchant_keys)
+
+            elif isinstance(obj, ExpenseItem):
+                if is_dirty and not SpendRollupService._is_changed(obj, ITEM_ROLLUP_ATTRS):
+                    continue
+                expense = obj.expense
+                if expense is None and obj.expense_id is not None:
+                    expense = session.get(Expense, obj.expense_id)
+                if expense is not None:
+                    SpendRollupService._expense_keys(expense, keys)
+
+    @staticmethod
+    def mark_dirty(session: Session, user_id: int, occurred_ats: Iterable[datetime],
+                   merchants: bool = True) -> None:
+        """
+        ORMを経由しない書き込み（一括INSERT/UPDATE）の再計算対象を登録
+
+        commit直前に他の変更と一緒に再計算され、月の版もcommit後に進む。
+        店舗別集計に影響しない変更（明細のカテゴリだけの変更など）は merchants=False にする。
+        """
+        keys: Set[RollupKey] = session.info.setdefault(DIRTY_KEY, set())
+        merchant_keys: Set[RollupKey] = session.info.setdefault(MERCHANT_DIRTY_KEY, set())
+        for occurred_at in occurred_ats:
+            SpendRollupService._add_key(keys, user_id, occurred_at)
+            day = SpendRollupService._to_date(occurred_at)
+            if merchants and day is not None:
+                merchant_keys.add((user_id, day.replace(day=1)))
+
+    @staticmethod
+    def _apply(session: Session) -> None:
+        """before_commit: 溜めた (ユーザー, 日付/月) を同じトランザクション内で再計算"""
+        if not session.info.get(DIRTY_KEY) and not session.info.get(MERCHANT_DIRTY_KEY):
+            return
+        # 未flushの変更を反映してから明細を読み直す（flush中に追加された対象もここで拾う）
+        session.flush()
+        keys = session.info.pop(DIRTY_KEY, set())
+        merchant_keys = session.info.pop(MERCHANT_DIRTY_KEY, set())
+        if keys:
+            SpendRollupService.refresh(session, keys)
+            session.info.setdefault(CHANGED_MONTHS_KEY, set()).update(
+                (user_id, SpendRollupService.month_label(day)) for user_id, day in keys
+            )
+            # 日次集計が変わった月のカテゴリ集計を作り直し、更新前後の差で予算の閾値を判定
+            for user_id, month in sorted({(user_id, day.replace(day=1)) for user_id, day in keys}):
+                before = SpendRollupService.category_month_totals(session, user_id, month)
+                SpendRollupService.refresh_category_month(session, month, user_id=user_id)
+                after = SpendRollupService.category_month_totals(session, user_id, month)
+                BudgetService.evaluate(session, user_id, month, before, after)
+        for user_id, month in sorted(merchant_keys):
+            SpendRollupService.refresh_merchant_month(session, month, user_id=user_id)
+
+    @staticmethod
+    def _discard(session: Session) -> None:
+        """after_rollback: 取り消された変更の再計算対象を破棄"""
+        session.info.pop(DIRTY_KEY, None)
+        session.info.pop(MERCHANT_DIRTY_KEY, None)
+        session.info.pop(CHANGED_MONTHS_KEY, None)
+
+    @staticmethod
+    def _aggregate_query(*filters):
+        """明細から (ユーザー, 日付, カテゴリ, 支払い方法) 単位の集計を作るSELECT"""
+        day = func.date(Expense.occurred_at)
+        return select(
+            Expense.user_id,
+            day,
+            ExpenseItem.category_id,
+            Expense.payment_method,
+            func.sum(ExpenseItem.line_total),
+            func.count(ExpenseItem.id)
+        ).select_from(Expense)\
+         .join(ExpenseItem, ExpenseItem.expense_id == Expense.id)\
+         .where(*filters)\
+         .group_by(Expense.user_id, day, ExpenseItem.category_id, Expense.payment_method)
+
+    @staticmethod
+    def _replace(db: Session, rollup_filters, source_filters) -> int:
+        db.execute(
+            delete(DailySpendRollup).where(*rollup_filters)
+            .execution_options(synchronize_session=False)
+        )
+        result = db.execute(
+            insert(DailySpendRollup).from_select(
+                ["user_id", "spend_date", "category_id", "payment_method", "total_amount", "item_count"],
+                SpendRollupService._aggregate_query(*source_filters)
+            )
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def refresh(db: Session, keys: Iterable[RollupKey]) -> None:
+        """
+        指定した (ユーザー, 日付) の集計を明細から再計算（commitは呼び出し側）
+
+        最小〜最大日の範囲条件でidx_user_occurred_createdを使い、対象日の明細だけを読む。
+        """
+        days_by_user = defaultdict(set)
+        for user_id, day in keys:
+            days_by_user[user_id].add(day)
+
+        for user_id, days in days_by_user.items():
+            days = sorted(days)
+            SpendRollupService._replace(
+                db,
+                rollup_filters=(
+                    DailySpendRollup.user_id == user_id,
+                    DailySpendRollup.spend_date.in_(days)
+                ),
+                source_filters=(
+                    Expense.user_id == user_id,
+                    Expense.occurred_at >= datetime.combine(days[0], datetime.min.time()),
+                    Expense.occurred_at < datetime.combine(days[-1] + timedelta(days=1), datetime.min.time()),
+                    func.date(Expense.occurred_at).in_(days)
+                )
+            )
+
+    @staticmethod
+    def rebuild(
+        db: Session,
+        start_date: date,
+        end_date: date,
+        user_id: Optional[int] = None
+    ) -> int:
+        """
+        期間内の集計を明細から作り直す（修復用、commitは呼び出し側）
+
+        Args:
+            db: DBセッション
+            start_date: 開始日（含む）
+            end_date: 終了日（含む）
+            user_id: 指定した場合はそのユーザーのみ
+
+        Returns:
+            作成した集計行数
+        """
+        rollup_filters = [
+            DailySpendRollup.spend_date >= start_date,
+            DailySpendRollup.spend_date <= end_date
+        ]
+        source_filters = [
+            Expense.occurred_at >= datetime.combine(start_date, datetime.min.time()),
+            Expense.occurred_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        ]
+        if user_id is not None:
+            rollup_filters.append(DailySpendRollup.user_id == user_id)
+            source_filters.append(Expense.user_id == user_id)
+
+        return SpendRollupService._replace(db, rollup_filters, source_filters)
+
+    @staticmethod
+    def category_month_totals(db: Session, user_id: int, month: date) -> Dict[Optional[int], int]:
+        """月別カテゴリ集計の現在値（カテゴリID → 合計金額）"""
+        rows = db.query(MonthlyCategoryRollup.category_id, MonthlyCategoryRollup.total_amount).filter(
+            MonthlyCategoryRollup.user_id == user_id,
+            MonthlyCategoryRollup.month == month
+        ).all()
+        return {row.category_id: row.total_amount for row in rows}
+
+    @staticmethod
+    def refresh_category_month(db: Session, month: date, user_id: Optional[int] = None) -> int:
+        """
+        指定月のカテゴリ集計を日次集計から作り直す（commitは呼び出し側）
+
+        読むのはその月の日次集計（日数×カテゴリ数）だけで、明細は読まない。
+
+        Returns:
+            作成した集計行数
+        """
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        rollup_filters = [MonthlyCategoryRollup.month == month]
+        source_filters = [
+            DailySpendRollup.spend_date >= month,
+            DailySpendRollup.spend_date < next_month
+        ]
+        if user_id is not None:
+            rollup_filters.append(MonthlyCategoryRollup.user_id == user_id)
+            source_filters.append(DailySpendRollup.user_id == user_id)
+
+        db.execute(
+            delete(MonthlyCategoryRollup).where(*rollup_filters)
+            .execution_options(synchronize_session=False)
+        )
+        result = db.execute(
+            insert(MonthlyCategoryRollup).from_select(
+                ["user_id", "month", "category_id", "total_amount", "item_count"],
+                select(
+                    DailySpendRollup.user_id,
+                    literal(month),
+                    DailySpendRollup.category_id,
+                    func.sum(DailySpendRollup.total_amount),
+                    func.sum(DailySpendRollup.item_count)
+                ).where(*source_filters)
+                 .group_by(DailySpendRollup.user_id, DailySpendRollup.category_id)
+            )
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def refresh_merchant_month(db: Session, month: date, user_id: Optional[int] = None) -> int:
+        """
+        指定月の店舗集計を出費から作り直す（commitは呼び出し側）
+
+        Args:
+            db: DBセッション
+            month: 対象月の月初日
+            user_id: 指定した場合はそのユーザーのみ
+
+        Returns:
+            作成した集計行数
+        """
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        rollup_filters = [MonthlyMerchantRollup.month == month]
+        source_filters = [
+            Expense.occurred_at >= datetime.combine(month, datetime.min.time()),
+            Expense.occurred_at < datetime.combine(next_month, datetime.min.time()),
+            Expense.merchant_key.isnot(None)
+        ]
+        if user_id is not None:
+            rollup_filters.append(MonthlyMerchantRollup.user_id == user_id)
+            source_filters.append(Expense.user_id == user_id)
+
+        db.execute(
+            delete(MonthlyMerchantRollup).where(*rollup_filters)
+            .execution_options(synchronize_session=False)
+        )
+        result = db.execute(
+            insert(MonthlyMerchantRollup).from_select(
+                ["user_id", "month", "merchant_key", "merchant_name", "visit_count", "total_amount", "last_visited_at"],
+                select(
+                    Expense.user_id,
+                    literal(month),
+                    Expense.merchant_key,
+                    func.max(Expense.merchant_name),
+                    func.count(Expense.id),
+                    func.coalesce(func.sum(Expense.total_amount), 0),
+                    func.max(Expense.occurred_at)
+                ).where(*source_filters)
+                 .group_by(Expense.user_id, Expense.merchant_key)
+            )
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def date_bounds(db: Session, user_id: Optional[int] = None) -> Optional[Tuple[date, date]]:
+        """出費の最初と最後の発生日（修復範囲の既定値）"""
+        query = db.query(func.min(Expense.occurred_at), func.max(Expense.occurred_at))
+        if user_id is not None:
+            query = query.filter(Expense.user_id == user_id)
+        first, last = query.one()
+        if first is None or last is None:
+            return None
+        return first.date(), last.date()
@@ -0,0 +1,203 @@
+import json
+import logging
+from datetime import date
+from typing import Dict, List
+from sqlalchemy import and_, extract, func, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.category import Category
+from app.models.daily_spend_rollup import DailySpendRollup
+from app.redis_client import redis_client
+from app.services.spend_rollup_service import SpendRollupService
+
+logger = logging.getLogger(__name__)
+
+# 集計の切り口と、日次集計テーブル上の対応カラム
+GROUP_COLUMNS = {
+    "category": DailySpendRollup.category_id,
+    "payment_method": DailySpendRollup.payment_method,
+}
+
+
+class SpendTrendService:
+    """
+    月別推移（日次集計から月×グループで集計）
+
+    月ごとの結果をSpendRollupServiceの月単位の版をキーに含めてRedisに保存する。
+    過去月は編集されない限り版が変わらないため、長期間の推移でも
+    新しく集計するのは当月と編集のあった月だけになる。
+    """
+
+    KEY_PREFIX = "spend_trend"
+    COMPLETED_MONTH_TTL = 30 * 24 * 3600  # 過去月の保持期間（版が変われば参照されなくなる）
+
+    @staticmethod
+    def month_starts(months: int, today: date) -> List[date]:
+        """当月を含む直近の月初日を古い順に返す"""
+        year, month = today.year, today.month
+        starts = []
+        for _ in range(months):
+            starts.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        return list(reversed(starts))
+
+    @staticmethod
+    def _next_month(start: date) -> date:
+        return date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+
+    @staticmethod
+    def _cache_key(user_id: int, group: str, month: str, version: str) -> str:
+        return f"{SpendTrendService.KEY_PREFIX}:{user_id}:{group}:{month}:{version}"
+
+    @staticmethod
+    def _aggregate(db: Session, user_id: int, group: str, month_starts: List[date]) -> Dict[str, List[Dict]]:
+        """指定した月の月×グループ集計（月ラベルごとのグループ行）"""
+        group_column = GROUP_COLUMNS[group]
+        year = extract("year", DailySpendRollup.spend_date)
+        month = extract("month", DailySpendRollup.spend_date)
+        rows = db.query(
+            year.label("year"),
+            month.label("month"),
+            group_column.label("key"),
+            func.sum(DailySpendRollup.total_amount).label("total"),
+            func.sum(DailySpendRollup.item_count).label("count")
+        ).filter(
+            DailySpendRollup.user_id == user_id,
+            or_(*[
+                and_(
+                    DailySpendRollup.spend_date >= start,
+                    DailySpendRollup.spend_date < SpendTrendService._next_month(start)
+                )
+                for start in month_starts
+            ])
+        ).group_by(year, month, group_column).all()
+
+        result: Dict[str, List[Dict]] = {}
+        for row in rows:
+            label = f"{int(row.year):04d}-{int(row.month):02d}"
+            result.setdefault(label, []).append({
+                "key": row.key,
+                "total": int(row.total or 0),
+                "count": int(row.count or 0)
+            })
+        for groups in result.values():
+            groups.sort(key=lambda g: -g["total"])
+        return result
+
+    @staticmethod
+    def monthly(db: Session, user_id: int, months: int, group: str, today: date) -> List[Dict]:
+        """
+        直近monthsか月の月別・グループ別の合計と明細数
+
+        Returns:
+            [{"month": "YYYY-MM", "groups": [{"key", "total", "count"}, ...]}, ...]（古い順）
+        """
+        starts = SpendTrendService.month_starts(months, today)
+        labels = [SpendRollupService.month_label(start) for start in starts]
+        current_label = SpendRollupService.month_label(today)
+
+        # 版はDBを読む前に取得する（集計中に書き込みがあっても古い版のキーに保存されるだけ）
+        versions = SpendRollupService.get_month_versions(user_id, labels, db)
+        keys = (
+            [SpendTrendService._cache_key(user_id, group, label, version) for label, version in zip(labels, versions)]
+            if versions is not None else None
+        )
+
+        cached: Dict[str, List[Dict]] = {}
+        if keys is not None:
+            try:
+                for label, raw in zip(labels, redis_client.mget(keys)):
+                    if raw is not None:
+                        cached[label] = json.loads(raw)
+            except Exception as e:
+                logger.warning(f"月別推移キャッシュの取得に失敗: user_id={user_id} - {str(e)}")
+
+        missing = [start for start, label in zip(starts, labels) if label not in cached]
+        if missing:
+            computed = SpendTrendService._aggregate(db, user_id, group, missing)
+            for start in missing:
+                label = SpendRollupService.month_label(start)
+                cached[label] = computed.get(label, [])
+
+            if keys is not None:
+                key_by_label = dict(zip(labels, keys))
+                try:
+                    pipe = redis_client.pipeline(transaction=False)
+                    for start in missing:
+                        label = SpendRollupService.month_label(start)
+                        ttl = (
+                            settings.DASHBOARD_CACHE_TTL_SECONDS if label == current_label
+                            else SpendTrendService.COMPLETED_MONTH_TTL
+                        )
+                        if ttl > 0:
+                            pipe.set(key_by_label[label], json.dumps(cached[label], ensure_ascii=False), ex=ttl)
+                    pipe.execute()
+                except Exception as e:
+                    logger.warning(f"月別推移キャッシュの保存に失敗: user_id={user_id} - {str(e)}")
+
+        return [{"month": label, "groups": cached[label]} for label in labels]
+
+    @staticmethod
+    def merge(monthly_lists: List[List[Dict]]) -> List[Dict]:
+        """
+        複数ユーザーの月別推移（monthlyの戻り値、同じ月の並び）を月×グループで合算
+
+        世帯の集計用。各ユーザーの月別キャッシュをそのまま使い、明細を横断して読み直さない。
+        """
+        if not monthly_lists:
+            return []
+        merged = []
+        for months in zip(*monthly_lists):
+            groups: Dict = {}
+            for month in months:
+                for g in month["groups"]:
+                    entry = groups.setdefault(g["key"], {"key": g["key"], "total": 0, "count": 0})
+                    entry["total"] += g["total"]
+                    entry["count"] += g["count"]
+            merged.append({
+                "month": months[0]["month"],
+                "groups": sorted(groups.values(), key=lambda g: -g["total"])
+            })
+        return merged
+
+    @staticmethod
+    def present(db: Session, monthly: List[Dict], group: str) -> Dict:
+        """月別推移に月の合計と凡例（表示名・期間合計）を付けた応答を組み立てる"""
+        # 表示名は月別結果のキャッシュに含めず、毎回付与する（カテゴリ名の変更を即時に反映するため）
+        labels = {}
+        if group == "category":
+            category_ids = {g["key"] for m in monthly for g in m["groups"] if g["key"] is not None}
+            if category_ids:
+                categories = db.query(Category.id, Category.name, Category.color)\
+                               .filter(Category.id.in_(category_ids)).all()
+                labels = {cat.id: {"name": cat.name, "color": cat.color} for cat in categories}
+            default_label = {"name": "未分類", "color": None}
+        else:
+            default_label = {"name": "未設定", "color": None}
+
+        totals = {}
+        for month in monthly:
+            for g in month["groups"]:
+                totals[g["key"]] = totals.get(g["key"], 0) + g["total"]
+
+        return {
+            "group": group,
+            "months": [
+                {
+                    "month": month["month"],
+                    "total": sum(g["total"] for g in month["groups"]),
+                    "count": sum(g["count"] for g in month["groups"]),
+                    "groups": month["groups"]
+                }
+                for month in monthly
+            ],
+            # 凡例（期間合計の多い順）
+            "groups": [
+                {
+                    "key": key,
+                    **(labels.get(key) or (default_label if key is None else {"name": str(key), "color": None})),
+                    "total": total
+                }
+                for key, total in sorted(totals.items(), key=lambda kv: -kv[1])
+            ]
+        }
@@ -0,0 +1,127 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# ヒストグラムのバケット境界（秒）
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RUNTIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 240)
+
+HISTOGRAMS = {
+    "celery_task_queue_lag_seconds": ("投入から実行開始までの待ち時間", LAG_BUCKETS),
+    "celery_task_runtime_seconds": ("タスクの実行時間", RUNTIME_BUCKETS),
+    "codex_call_seconds": ("codex execの呼び出し時間", RUNTIME_BUCKETS),
+}
+COUNTERS = {
+    "celery_task_outcomes_total": "タスクの結果別件数",
+    "celery_task_exceptions_total": "タスクで発生した例外の件数",
+}
+
+
+class TaskMetrics:
+    """
+    Celeryタスクのメトリクス（Redisに集約）
+
+    API・各ワーカープロセスから記録し、/metrics でPrometheus形式として出力する。
+    記録の失敗でタスクを止めないよう、例外はすべてログのみとする。
+    """
+
+    PREFIX = "metrics"
+    SERIES_KEY = "metrics:series"
+
+    @staticmethod
+    def _series_key(metric: str, labels: Dict[str, str]) -> Tuple[str, str]:
+        labels_json = json.dumps(labels, sort_keys=True, ensure_ascii=False)
+        return f"{TaskMetrics.PREFIX}:{metric}:{labels_json}", f"{metric}|{labels_json}"
+
+    @staticmethod
+    def observe(metric: str, labels: Dict[str, str], value: float) -> None:
+        """ヒストグラムに値を記録（バケットは非累積で保存し、出力時に累積する）"""
+        _, buckets = HISTOGRAMS[metric]
+        bucket = next((str(le) for le in buckets if value <= le), "+Inf")
+        key, member = TaskMetrics._series_key(metric, labels)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, bucket, 1)
+            pipe.hincrby(key, "count", 1)
+            pipe.hincrbyfloat(key, "sum", value)
+            pipe.sadd(TaskMetrics.SERIES_KEY, member)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"メトリクスの記録に失敗: {metric} - {str(e)}")
+
+    @staticmethod
+    def increment(metric: str, labels: Dict[str, str]) -> None:
+        key, member = TaskMetrics._series_key(metric, labels)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, "count", 1)
+            pipe.sadd(TaskMetrics.SERIES_KEY, member)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"メトリクスの記録に失敗: {metric} - {str(e)}")
+
+    @staticmethod
+    @contextmanager
+    def timer(metric: str, labels: Dict[str, str]) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            TaskMetrics.observe(metric, labels, time.monotonic() - started)
+
+    @staticmethod
+    def render_prometheus() -> str:
+        """Prometheusのテキスト形式で出力"""
+        members = sorted(redis_client.smembers(TaskMetrics.SERIES_KEY))
+        series = []
+        for member in members:
+            metric, labels_json = member.split("|", 1)
+            if metric in HISTOGRAMS or metric in COUNTERS:
+                series.append((metric, json.loads(labels_json)))
+
+        pipe = redis_client.pipeline(transaction=False)
+        for metric, labels in series:
+            pipe.hgetall(TaskMetrics._series_key(metric, labels)[0])
+        values = pipe.execute()
+
+        lines: List[str] = []
+        described = set()
+        for (metric, labels), data in zip(series, values):
+            if metric not in described:
+                described.add(metric)
+                if metric in HISTOGRAMS:
+                    lines.append(f"# HELP {metric} {HISTOGRAMS[metric][0]}")
+                    lines.append(f"# TYPE {metric} histogram")
+                else:
+                    lines.append(f"# HELP {metric} {COUNTERS[metric]}")
+                    lines.append(f"# TYPE {metric} counter")
+
+            if metric in HISTOGRAMS:
+                cumulative = 0
+                for le in HISTOGRAMS[metric][1]:
+                    cumulative += int(data.get(str(le), 0))
+                    lines.append(f"{metric}_bucket{_format_labels({**labels, 'le': str(le)})} {cumulative}")
+                cumulative += int(data.get("+Inf", 0))
+                lines.append(f"{metric}_bucket{_format_labels({**labels, 'le': '+Inf'})} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {float(data.get('sum', 0))}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {int(data.get('count', 0))}")
+            else:
+                lines.append(f"{metric}{_format_labels(labels)} {int(data.get('count', 0))}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
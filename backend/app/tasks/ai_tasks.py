@@ -1,12 +1,18 @@
 from app.tasks.celery_app import celery_app
+from app.config import settings
 from app.database import SessionLocal
+from app.redis_client import redis_client
 from app.models.expense import Expense, ExpenseStatus
 from app.models.expense_item import ExpenseItem, CategorySource
-from app.models.category import Category
-from app.models.ai_settings import AISettings
 from app.services.codex_service import CodexService
-from app.services.category_rule_service import CategoryRuleService
+from app.services.reference_cache import ReferenceDataCache, ReferenceData
+from app.services.codex_circuit import CodexCircuit
+from app.services.task_metrics import TaskMetrics
+from app.services.expense_event_service import ExpenseEventService, ExpenseEvent
+from app.tasks.dashboard_tasks import enqueue_dashboard_warmup
 from sqlalchemy.exc import OperationalError, DBAPIError
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,12 +32,14 @@ def classify_expense_item_task(expense_item_id: int):
         expense_item_id: ExpenseItem ID
     """
     db = SessionLocal()
+    parent_expense_id = None
     try:
         # ExpenseItemを取得
         expense_item = db.query(ExpenseItem).filter(ExpenseItem.id == expense_item_id).first()
         if not expense_item:
             logger.error(f"ExpenseItem not found: {expense_item_id}")
             return {"success": False, "error": "ExpenseItem not found"}
+        parent_expense_id = expense_item.expense_id
 
         # 既にカテゴリが設定されている場合はスキップ
         if expense_item.category_id is not None:
@@ -44,17 +52,16 @@ def classify_expense_item_task(expense_item_id: int):
             logger.error(f"Expense not found for ExpenseItem: {expense_item_id}")
             return {"success": False, "error": "Expense not found"}
 
-        # カテゴリ一覧を取得
-        categories = db.query(Category).filter(Category.is_active == True).all()
-        category_names = [cat.name for cat in categories]
-        category_map = {cat.id: cat.name for cat in categories}
+        # カテゴリ・AI設定・ルールはプロセス内キャッシュから取得
+        reference = ReferenceDataCache.get(db)
+        category_names = reference.active_category_names
+        category_map = reference.category_name_by_id
 
         if not category_names:
             logger.warning("No active categories found")
             return {"success": False, "error": "No active categories"}
 
-        matched_rule = CategoryRuleService.find_match(
-            db,
+        matched_rule = reference.find_rule(
             [
                 expense_item.product_name,
                 expense.merchant_name,
@@ -75,6 +82,8 @@ def classify_expense_item_task(expense_item_id: int):
                 expense.status = ExpenseStatus.COMPLETED
                 db.commit()
             category_name = category_map.get(matched_rule.category_id)
+            _publish_item_classified(expense.id, expense.user_id, expense_item_id, matched_rule.category_id,
+                                     category_name, CategorySource.RULE, uncategorized_count)
             logger.info(
                 "ルールで分類: item_id=%s, category_id=%s, priority=%s",
                 expense_item_id,
@@ -93,15 +102,13 @@ def classify_expense_item_task(expense_item_id: int):
                 "uncategorized_remaining": uncategorized_count,
             }
 
-        ai_settings = db.query(AISettings).first()
-        if not ai_settings:
-            ai_settings = AISettings()
-            db.add(ai_settings)
-            db.commit()
-            db.refresh(ai_settings)
+        ai_settings = reference.ai_settings
 
         if not ai_settings.classification_enabled:
             logger.info("Classification is disabled in settings")
+            ExpenseEventService.publish(
+                expense.id, ExpenseEvent.ITEM_FAILED, expense_item_id=expense_item_id, error="Classification is disabled"
+            )
             return {"success": False, "error": "Classification is disabled"}
 
         logger.info(
@@ -111,20 +118,26 @@ def classify_expense_item_task(expense_item_id: int):
             ai_settings.classification_model,
         )
 
-        classification_result = CodexService.classify_expense(
-            product_name=expense_item.product_name or "",
-            store_name=expense.merchant_name,
-            amount=float(expense_item.line_total) if expense_item.line_total else 0.0,
-            note=expense.note,
-            categories=category_names,
-            model=ai_settings.classification_model,
-            sandbox_mode=ai_settings.sandbox_mode,
-            skip_git_repo_check=ai_settings.skip_git_repo_check,
-            system_prompt=ai_settings.classification_system_prompt,
-        )
+        with TaskMetrics.timer("codex_call_seconds", {"operation": "classification"}):
+            classification_result = CodexService.classify_expense(
+                product_name=expense_item.product_name or "",
+                store_name=expense.merchant_name,
+                amount=float(expense_item.line_total) if expense_item.line_total else 0.0,
+                note=expense.note,
+                categories=category_names,
+                model=ai_settings.classification_model,
+                sandbox_mode=ai_settings.sandbox_mode,
+                skip_git_repo_check=ai_settings.skip_git_repo_check,
+                system_prompt=ai_settings.classification_system_prompt,
+            )
+        CodexCircuit.record(classification_result)
 
         if not classification_result.get("success"):
             logger.error(f"分類失敗: {classification_result.get('error')}")
+            ExpenseEventService.publish(
+                expense.id, ExpenseEvent.ITEM_FAILED,
+                expense_item_id=expense_item_id, error=classification_result.get("error")
+            )
             return {
                 "success": False,
                 "error": classification_result.get("error")
@@ -137,10 +150,8 @@ def classify_expense_item_task(expense_item_id: int):
 
         category_id = None
         if category_name:
-            category = db.query(Category).filter(Category.name == category_name).first()
-            if category:
-                category_id = category.id
-            else:
+            category_id = reference.category_id_by_name.get(category_name)
+            if category_id is None:
                 logger.warning(f"カテゴリが見つかりません: {category_name}")
 
         expense_item.category_id = category_id
@@ -159,6 +170,9 @@ def classify_expense_item_task(expense_item_id: int):
         else:
             logger.info(f"Expense {expense.id} - 残り{uncategorized_count}個の商品が未分類")
 
+        _publish_item_classified(expense.id, expense.user_id, expense_item_id, category_id, category_name,
+                                 CategorySource.AI, uncategorized_count)
+
         return {
             "success": True,
             "expense_item_id": expense_item_id,
@@ -172,38 +186,419 @@ def classify_expense_item_task(expense_item_id: int):
     except Exception as e:
         logger.exception(f"分類処理中にエラーが発生: {str(e)}")
         db.rollback()  # 明示的にロールバック
+        if parent_expense_id is not None:
+            ExpenseEventService.publish(
+                parent_expense_id, ExpenseEvent.ITEM_FAILED, expense_item_id=expense_item_id, error=str(e)
+            )
         return {"success": False, "error": str(e)}
     finally:
         db.close()
 
 
-# 旧関数の互換性維持（非推奨）
-@celery_app.task(name="classify_expense_task")
-def classify_expense_task(expense_id: int):
+def _publish_item_classified(
+    expense_id: int,
+    user_id: int,
+    expense_item_id: int,
+    category_id,
+    category_name,
+    source: CategorySource,
+    uncategorized_count: int
+) -> None:
+    """分類結果を通知し、全商品の分類が終わっていれば完了も通知（ダッシュボードも事前計算する）"""
+    ExpenseEventService.publish(
+        expense_id,
+        ExpenseEvent.ITEM_CLASSIFIED,
+        expense_item_id=expense_item_id,
+        category_id=category_id,
+        category_name=category_name,
+        source=source.value,
+        uncategorized_remaining=uncategorized_count
+    )
+    if uncategorized_count == 0:
+        ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=ExpenseStatus.COMPLETED.value)
+        enqueue_dashboard_warmup(user_id)
+
+
+def classify_pending_items(
+    reference: ReferenceData,
+    items: List[ExpenseItem],
+    expenses_by_id: Dict[int, Expense]
+) -> Tuple[List[Tuple[ExpenseItem, CategorySource]], Optional[str], bool]:
     """
-    （非推奨）後方互換性のためのラッパー
-    全ExpenseItemsを分類する
+    未分類の商品をルール→AI一括分類の順に分類（コミットは呼び出し側で行う）
+
+    Args:
+        reference: 参照データ
+        items: 分類対象の商品（category_idがNoneのもの）
+        expenses_by_id: 商品が属するExpense
+
+    Returns:
+        Tuple: (分類できた商品と決定ソースのリスト, AI分類のエラー, AI分類が無効だったか)
     """
+    # 1. ルールで分類
+    classified = []
+    remaining_items = []
+    for item in items:
+        expense = expenses_by_id[item.expense_id]
+        matched_rule = reference.find_rule(
+            [
+                item.product_name,
+                expense.merchant_name,
+                expense.note,
+            ],
+        )
+        if matched_rule:
+            item.category_id = matched_rule.category_id
+            item.category_source = CategorySource.RULE
+            item.ai_confidence = matched_rule.confidence
+            classified.append((item, CategorySource.RULE))
+        else:
+            remaining_items.append(item)
+
+    if not remaining_items:
+        return classified, None, False
+
+    # 2. 残りをまとめてAI分類
+    ai_settings = reference.ai_settings
+    if not ai_settings.classification_enabled:
+        logger.info("Classification is disabled in settings")
+        return classified, "Classification is disabled", True
+
+    ai_error = None
+    batch_size = max(1, settings.CLASSIFICATION_BATCH_SIZE)
+    for start in range(0, len(remaining_items), batch_size):
+        chunk = remaining_items[start:start + batch_size]
+        expense_ids = {item.expense_id for item in chunk}
+        # 同じレシートの商品だけなら店舗名・備考は共通情報として渡す
+        shared_expense = expenses_by_id[next(iter(expense_ids))] if len(expense_ids) == 1 else None
+        logger.info(
+            "AI一括分類処理開始: expenses=%s, items=%s, model=%s",
+            len(expense_ids),
+            len(chunk),
+            ai_settings.classification_model,
+        )
+        with TaskMetrics.timer("codex_call_seconds", {"operation": "batch_classification"}):
+            batch_result = CodexService.classify_expense_batch(
+                items=[
+                    {
+                        "product_name": item.product_name or "",
+                        "amount": float(item.line_total) if item.line_total else 0.0,
+                        "store_name": None if shared_expense else expenses_by_id[item.expense_id].merchant_name,
+                        "note": None if shared_expense else expenses_by_id[item.expense_id].note,
+                    }
+                    for item in chunk
+                ],
+                store_name=shared_expense.merchant_name if shared_expense else None,
+                note=shared_expense.note if shared_expense else None,
+                categories=reference.active_category_names,
+                model=ai_settings.classification_model,
+                sandbox_mode=ai_settings.sandbox_mode,
+                skip_git_repo_check=ai_settings.skip_git_repo_check,
+                system_prompt=ai_settings.classification_system_prompt,
+            )
+        CodexCircuit.record(batch_result)
+
+        if not batch_result.get("success"):
+            # 同じバックエンドへの後続バッチも失敗する可能性が高いため打ち切る
+            ai_error = batch_result.get("error")
+            logger.error(f"一括分類失敗: {ai_error}")
+            break
+
+        for item, result in zip(chunk, batch_result.get("results", [])):
+            category_id = reference.category_id_by_name.get(result.get("category"))
+            if category_id is None:
+                continue
+            item.category_id = category_id
+            item.category_source = CategorySource.AI
+            item.ai_confidence = result.get("confidence", 0.0)
+            classified.append((item, CategorySource.AI))
+
+    return classified, ai_error, False
+
+
+def _reclassify_debounce_key(expense_id: int) -> str:
+    return f"reclassify_debounce:{expense_id}"
+
+
+def enqueue_reclassify(expense_id: int) -> bool:
+    """
+    再分類タスクをデバウンス付きで投入
+
+    待ち時間の間に届いた同じExpenseへの再分類リクエストは、待機中の1タスクにまとめる。
+
+    Args:
+        expense_id: Expense ID
+
+    Returns:
+        bool: 新しくタスクを投入した場合True（待機中のタスクにまとめた場合False）
+    """
+    countdown = settings.RECLASSIFY_DEBOUNCE_SECONDS
+    try:
+        # タスクが実行されなかった場合に備えて有効期限を付ける
+        acquired = redis_client.set(_reclassify_debounce_key(expense_id), "1", nx=True, ex=countdown + 60)
+    except Exception as e:
+        logger.warning(f"デバウンスキーの取得に失敗したためそのまま投入します: expense_id={expense_id} - {str(e)}")
+        acquired = True
+
+    if not acquired:
+        logger.info(f"Expense {expense_id} - 待機中の再分類タスクにまとめました")
+        return False
+
+    reclassify_expense_task.apply_async(args=[expense_id], countdown=countdown)
+    return True
+
+
+@celery_app.task(
+    name="reclassify_expense_task",
+    autoretry_for=(OperationalError, DBAPIError),
+    retry_kwargs={'max_retries': 3, 'countdown': 5},
+    retry_backoff=True
+)
+def reclassify_expense_task(expense_id: int, reset_categories: bool = True):
+    """
+    Expense単位の一括分類タスク
+
+    ルールで決まる商品を先に確定し、残りの商品は同じレシート内でまとめて
+    1回のcodex exec（商品数が多い場合はCLASSIFICATION_BATCH_SIZEごと）で分類する。
+
+    Args:
+        expense_id: Expense ID
+        reset_categories: 既存のカテゴリをクリアしてから分類するか（再分類時True）
+    """
+    # 実行開始以降の再分類リクエストは新しいタスクとして受け付ける
+    try:
+        redis_client.delete(_reclassify_debounce_key(expense_id))
+    except Exception as e:
+        logger.warning(f"デバウンスキーの削除に失敗: expense_id={expense_id} - {str(e)}")
+
     db = SessionLocal()
     try:
         expense = db.query(Expense).filter(Expense.id == expense_id).first()
         if not expense:
+            logger.error(f"Expense not found: {expense_id}")
             return {"success": False, "error": "Expense not found"}
 
-        # 全ExpenseItemsを取得
-        items = db.query(ExpenseItem).filter(ExpenseItem.expense_id == expense_id).all()
+        items = db.query(ExpenseItem).filter(
+            ExpenseItem.expense_id == expense_id
+        ).order_by(ExpenseItem.position).all()
+
+        # AI分類に失敗した場合に元に戻せるよう、クリア前のカテゴリを控えておく
+        previous = {item.id: (item.category_id, item.category_source, item.ai_confidence) for item in items}
+        if reset_categories:
+            for item in items:
+                item.category_id = None
+                item.category_source = None
+                item.ai_confidence = None
 
-        results = []
+        pending_items = [item for item in items if item.category_id is None]
+        if not pending_items:
+            expense.status = ExpenseStatus.COMPLETED
+            db.commit()
+            ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=ExpenseStatus.COMPLETED.value)
+            enqueue_dashboard_warmup(expense.user_id)
+            return {"success": True, "expense_id": expense_id, "classified": 0}
+
+        # カテゴリ・AI設定・ルールはプロセス内キャッシュから取得
+        reference = ReferenceDataCache.get(db)
+        category_name_by_id = reference.category_name_by_id
+
+        if not reference.active_category_names:
+            logger.warning("No active categories found")
+            db.rollback()
+            return {"success": False, "error": "No active categories"}
+
+        classified, ai_error, classification_disabled = classify_pending_items(
+            reference, pending_items, {expense.id: expense}
+        )
+
+        ai_failed = ai_error is not None and not classification_disabled
+        if ai_failed and reset_categories:
+            # 分類できなかった商品はクリア前のカテゴリに戻す（失敗でユーザーのカテゴリを失わない）
+            for item in items:
+                if item.category_id is None:
+                    item.category_id, item.category_source, item.ai_confidence = previous[item.id]
+
+        uncategorized_count = sum(1 for item in items if item.category_id is None)
+        if ai_failed:
+            # 再試行スイープが未分類の商品だけを分類し直す
+            expense.status = ExpenseStatus.FAILED
+        elif uncategorized_count == 0:
+            expense.status = ExpenseStatus.COMPLETED
+        elif classification_disabled:
+            expense.status = ExpenseStatus.PENDING
+        db.commit()
+
+        logger.info(
+            "Expense %s - 一括分類完了: classified=%s, uncategorized=%s",
+            expense_id,
+            len(classified),
+            uncategorized_count,
+        )
+
+        for item, source in classified:
+            ExpenseEventService.publish(
+                expense_id,
+                ExpenseEvent.ITEM_CLASSIFIED,
+                expense_item_id=item.id,
+                category_id=item.category_id,
+                category_name=category_name_by_id.get(item.category_id),
+                source=source.value,
+                uncategorized_remaining=uncategorized_count
+            )
         for item in items:
             if item.category_id is None:
-                # AI分類タスクを起動
-                result = classify_expense_item_task.delay(item.id)
-                results.append(result)
+                ExpenseEventService.publish(
+                    expense_id, ExpenseEvent.ITEM_FAILED, expense_item_id=item.id, error=ai_error
+                )
+        if ai_failed:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.FAILED, error=ai_error)
+        elif uncategorized_count == 0:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=ExpenseStatus.COMPLETED.value)
+            enqueue_dashboard_warmup(expense.user_id)
+        elif classification_disabled:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=ExpenseStatus.PENDING.value)
+            enqueue_dashboard_warmup(expense.user_id)
 
         return {
-            "success": True,
+            "success": ai_error is None,
             "expense_id": expense_id,
-            "tasks_started": len(results)
+            "classified": len(classified),
+            "uncategorized_remaining": uncategorized_count,
+            "error": ai_error
+        }
+
+    except (OperationalError, DBAPIError):
+        db.rollback()
+        raise
+    except Exception as e:
+        logger.exception(f"一括分類処理中にエラーが発生: {str(e)}")
+        db.rollback()
+        ExpenseEventService.publish(expense_id, ExpenseEvent.FAILED, error=str(e))
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(
+    name="classify_expenses_task",
+    autoretry_for=(OperationalError, DBAPIError),
+    retry_kwargs={'max_retries': 3, 'countdown': 5},
+    retry_backoff=True
+)
+def classify_expenses_task(expense_ids: List[int]):
+    """
+    複数Expenseの未分類商品をまとめて分類するタスク（一括登録用）
+
+    ルールで決まる商品を先に確定し、残りの商品は出費をまたいで
+    CLASSIFICATION_BATCH_SIZEごとに1回のcodex execで分類する。
+
+    Args:
+        expense_ids: Expense IDのリスト
+    """
+    db = SessionLocal()
+    try:
+        expenses = db.query(Expense).filter(Expense.id.in_(expense_ids)).all()
+        if not expenses:
+            logger.error(f"Expenses not found: {expense_ids}")
+            return {"success": False, "error": "Expenses not found"}
+        expenses_by_id = {expense.id: expense for expense in expenses}
+
+        items = db.query(ExpenseItem).filter(
+            ExpenseItem.expense_id.in_(list(expenses_by_id))
+        ).order_by(ExpenseItem.expense_id, ExpenseItem.position).all()
+
+        # カテゴリ・AI設定・ルールはプロセス内キャッシュから取得
+        reference = ReferenceDataCache.get(db)
+        category_name_by_id = reference.category_name_by_id
+
+        if not reference.active_category_names:
+            logger.warning("No active categories found")
+            db.rollback()
+            return {"success": False, "error": "No active categories"}
+
+        pending_items = [item for item in items if item.category_id is None]
+        classified, ai_error, classification_disabled = (
+            classify_pending_items(reference, pending_items, expenses_by_id)
+            if pending_items else ([], None, False)
+        )
+
+        # AI分類に失敗した出費はFAILEDにする（再試行スイープが未分類の商品だけを分類し直す）
+        uncategorized = Counter(item.expense_id for item in items if item.category_id is None)
+        for expense in expenses:
+            if uncategorized[expense.id] == 0:
+                expense.status = ExpenseStatus.COMPLETED
+            elif classification_disabled:
+                expense.status = ExpenseStatus.PENDING
+            elif ai_error:
+                expense.status = ExpenseStatus.FAILED
+        db.commit()
+
+        logger.info(
+            "一括分類完了: expenses=%s, classified=%s, uncategorized=%s",
+            len(expenses),
+            len(classified),
+            sum(uncategorized.values()),
+        )
+
+        for item, source in classified:
+            ExpenseEventService.publish(
+                item.expense_id,
+                ExpenseEvent.ITEM_CLASSIFIED,
+                expense_item_id=item.id,
+                category_id=item.category_id,
+                category_name=category_name_by_id.get(item.category_id),
+                source=source.value,
+                uncategorized_remaining=uncategorized[item.expense_id]
+            )
+        for item in items:
+            if item.category_id is None:
+                ExpenseEventService.publish(
+                    item.expense_id, ExpenseEvent.ITEM_FAILED, expense_item_id=item.id, error=ai_error
+                )
+        finished_user_ids = set()
+        for expense in expenses:
+            if uncategorized[expense.id] == 0:
+                ExpenseEventService.publish(expense.id, ExpenseEvent.COMPLETED, status=ExpenseStatus.COMPLETED.value)
+                finished_user_ids.add(expense.user_id)
+            elif classification_disabled:
+                ExpenseEventService.publish(expense.id, ExpenseEvent.COMPLETED, status=ExpenseStatus.PENDING.value)
+                finished_user_ids.add(expense.user_id)
+            elif ai_error:
+                ExpenseEventService.publish(expense.id, ExpenseEvent.FAILED, error=ai_error)
+        for user_id in finished_user_ids:
+            enqueue_dashboard_warmup(user_id)
+
+        return {
+            "success": ai_error is None,
+            "expenses": len(expenses),
+            "classified": len(classified),
+            "uncategorized_remaining": sum(uncategorized.values()),
+            "error": ai_error
         }
+
+    except (OperationalError, DBAPIError):
+        db.rollback()
+        raise
+    except Exception as e:
+        logger.exception(f"一括分類処理中にエラーが発生: {str(e)}")
+        db.rollback()
+        for expense_id in expense_ids:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.FAILED, error=str(e))
+        return {"success": False, "error": str(e)}
     finally:
         db.close()
+
+
+# 旧関数の互換性維持（非推奨）
+@celery_app.task(name="classify_expense_task")
+def classify_expense_task(expense_id: int):
+    """
+    （非推奨）後方互換性のためのラッパー
+    未分類のExpenseItemsを一括分類タスクで分類する
+    """
+    reclassify_expense_task.delay(expense_id, reset_categories=False)
+    return {
+        "success": True,
+        "expense_id": expense_id,
+        "tasks_started": 1
+    }
@@ -1,13 +1,58 @@
-from celery import Celery
+import json
+import logging
+from celery import Celery, Task
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# 優先度（0が最優先）。指定の無いタスクは既定値で、ウォームアップなどの補助的な処理は後回しにする
+DEFAULT_PRIORITY = 5
+LOW_PRIORITY = 9
+
+
+class LeanTask(Task):
+    """
+    結果サイズを制限するタスク基底クラス
+
+    結果の保存は既定で無効（task_ignore_result）。
+    結果が必要なタスクは @celery_app.task(ignore_result=False) で明示的に有効化する。
+    有効化したタスクでもCELERY_RESULT_MAX_BYTESを超える結果は保存せず、要約に置き換える。
+    """
+
+    def __call__(self, *args, **kwargs):
+        result = super().__call__(*args, **kwargs)
+
+        if self.ignore_result or getattr(self.request, "ignore_result", False):
+            return result
+
+        try:
+            size = len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+        except (TypeError, ValueError):
+            return result
+
+        if size > settings.CELERY_RESULT_MAX_BYTES:
+            logger.warning(
+                f"タスク結果が大きすぎるため保存しません: task={self.name}, "
+                f"size={size}, limit={settings.CELERY_RESULT_MAX_BYTES}"
+            )
+            return {
+                "success": result.get("success") if isinstance(result, dict) else None,
+                "result_discarded": True,
+                "size": size
+            }
+        return result
+
+
 celery_app = Celery(
     "ai_kakeibo",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
+    task_cls=LeanTask,
     include=[
         "app.tasks.ocr_tasks",
-        "app.tasks.ai_tasks"
+        "app.tasks.ai_tasks",
+        "app.tasks.maintenance_tasks",
+        "app.tasks.dashboard_tasks"
     ]
 )
 
@@ -17,7 +62,40 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="Asia/Tokyo",
     enable_utc=True,
-    task_track_started=True,
+    # 結果を読む呼び出し元が無いため既定では保存しない（必要なタスクのみ ignore_result=False）
+    task_ignore_result=True,
+    task_store_errors_even_if_ignored=False,
+    task_track_started=False,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
+    result_extended=False,
     task_time_limit=300,  # 5分
     task_soft_time_limit=240,  # 4分
+    # Redisブローカーで優先度ごとのキューを使い、優先度の高いキューから取り出す
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    task_default_priority=DEFAULT_PRIORITY,
+    beat_schedule={
+        # 失敗・停止したレシート処理の自動再試行
+        "retry-failed-receipts": {
+            "task": "retry_failed_receipts_task",
+            "schedule": settings.RETRY_SWEEP_INTERVAL_SECONDS,
+        },
+    },
 )
+
+# タスクメトリクスのシグナルハンドラを登録（投入側・ワーカー側の両方で有効にする）
+from app.tasks import metrics  # noqa: E402,F401
+
+# 出費・明細の書き込み時に日次集計を同じトランザクションで更新し、commit後にデータ版数を進める
+# （予算の閾値通知も含め、APIと同じ設定をワーカーにも適用）
+from app.database import SessionLocal  # noqa: E402
+from app.services.spend_rollup_service import SpendRollupService  # noqa: E402
+from app.services.data_version_service import DataVersionService  # noqa: E402
+from app.services.budget_service import BudgetService  # noqa: E402
+
+SpendRollupService.install(SessionLocal)
+DataVersionService.install(SessionLocal)
+BudgetService.install(SessionLocal)
@@ -0,0 +1,66 @@
+from app.tasks.celery_app import celery_app, LOW_PRIORITY
+from app.config import settings
+from app.database import SessionLocal
+from app.redis_client import redis_client
+from app.services.dashboard_service import DashboardService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _warmup_debounce_key(user_id: int) -> str:
+    return f"dashboard_warmup_debounce:{user_id}"
+
+
+def enqueue_dashboard_warmup(user_id: int) -> bool:
+    """
+    ダッシュボードのウォームアップタスクを低優先度・デバウンス付きで投入
+
+    レシートをまとめてアップロードした場合でも、待ち時間の間に完了した出費の分は
+    待機中の1タスクにまとめ、最後の書き込みの後に1回だけ計算する。
+    ウォームアップは補助的な処理のため、投入に失敗してもログのみ。
+
+    Args:
+        user_id: ユーザーID
+
+    Returns:
+        bool: 新しくタスクを投入した場合True
+    """
+    countdown = settings.DASHBOARD_WARMUP_DELAY_SECONDS
+    if countdown < 0 or settings.DASHBOARD_CACHE_TTL_SECONDS <= 0:
+        return False
+    try:
+        # タスクが実行されなかった場合に備えて有効期限を付ける
+        acquired = redis_client.set(_warmup_debounce_key(user_id), "1", nx=True, ex=countdown + 60)
+        if not acquired:
+            return False
+        warm_dashboard_task.apply_async(args=[user_id], countdown=countdown, priority=LOW_PRIORITY)
+    except Exception as e:
+        logger.warning(f"ダッシュボードのウォームアップ投入に失敗: user_id={user_id} - {str(e)}")
+        return False
+    return True
+
+
+@celery_app.task(name="warm_dashboard_task")
+def warm_dashboard_task(user_id: int):
+    """
+    今月のサマリーと最近の出費を事前計算してキャッシュするタスク
+
+    Args:
+        user_id: ユーザーID
+    """
+    # 実行開始以降に完了した出費は新しいタスクで反映する
+    try:
+        redis_client.delete(_warmup_debounce_key(user_id))
+    except Exception as e:
+        logger.warning(f"デバウンスキーの削除に失敗: user_id={user_id} - {str(e)}")
+
+    db = SessionLocal()
+    try:
+        warmed = DashboardService.warm(db, user_id)
+        return {"success": True, "user_id": user_id, "warmed": warmed}
+    except Exception as e:
+        logger.warning(f"ダッシュボードのウォームアップに失敗: user_id={user_id} - {str(e)}")
+        return {"success": False, "user_id": user_id, "error": str(e)}
+    finally:
+        db.close()
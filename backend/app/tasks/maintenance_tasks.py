@@ -0,0 +1,248 @@
+from datetime import datetime, timedelta, timezone
+from app.tasks.celery_app import celery_app
+from app.config import settings
+from app.database import SessionLocal
+from app.models.expense import Expense, ExpenseStatus
+from app.models.expense_item import ExpenseItem
+from app.services.backfill_service import ClassificationBackfillService, BackfillStatus
+from app.services.expense_event_service import ExpenseEventService, ExpenseEvent
+from app.services.reference_cache import ReferenceDataCache
+from app.services.codex_circuit import CodexCircuit
+from app.tasks.ai_tasks import classify_pending_items, reclassify_expense_task
+from app.tasks.ocr_tasks import process_receipt_ocr
+from app.tasks.dashboard_tasks import enqueue_dashboard_warmup
+from sqlalchemy import func, or_, and_, literal_column
+from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import OperationalError, DBAPIError
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# AI分類が連続で失敗した場合の再試行回数（超えたら一時停止）
+BACKFILL_MAX_CONSECUTIVE_FAILURES = 3
+BACKFILL_FAILURE_BACKOFF_SECONDS = 60
+# スイープで再投入するタスクの実行開始をずらす間隔（秒）
+RETRY_STAGGER_SECONDS = 5
+
+
+def _superseded(job_id: str, step: int) -> dict:
+    """ステップの実行中に停止・再開された場合（状態は保存せず、次のステップも投入しない）"""
+    logger.info(f"バックフィル: 実行中に停止・再開されたため状態を保存しません job_id={job_id}, step={step}")
+    return {"success": True, "superseded": True}
+
+
+@celery_app.task(
+    name="backfill_classification_task",
+    acks_late=True,
+    autoretry_for=(OperationalError, DBAPIError),
+    retry_kwargs={'max_retries': 3, 'countdown': 5},
+    retry_backoff=True
+)
+def backfill_classification_task(job_id: str, step: int):
+    """
+    未分類のExpenseItemを一括分類するメンテナンスタスク
+
+    expense_itemsをIDのキーセットで走査し、1回の実行で1バッチだけ分類して
+    チェックポイントを保存した後、レート上限に合わせた遅延付きで次のステップを投入する。
+
+    Args:
+        job_id: バックフィルジョブID
+        step: ステップ番号（状態と一致しない場合は古いメッセージとして無視）
+    """
+    state = ClassificationBackfillService.get_state()
+    if (
+        not state
+        or state["job_id"] != job_id
+        or state["status"] != BackfillStatus.RUNNING
+        or state["step"] != step
+    ):
+        logger.info(f"バックフィル: 無効なステップのためスキップ job_id={job_id}, step={step}")
+        return {"success": False, "skipped": True}
+
+    started = time.monotonic()
+    db = SessionLocal()
+    try:
+        items = db.query(ExpenseItem).filter(
+            ExpenseItem.id > state["last_item_id"],
+            ExpenseItem.id <= state["max_item_id"],
+            ExpenseItem.category_id.is_(None)
+        ).order_by(ExpenseItem.id).limit(state["batch_size"]).all()
+
+        if not items:
+            state["status"] = BackfillStatus.COMPLETED
+            if not ClassificationBackfillService.save_step_state(state, job_id, step):
+                return _superseded(job_id, step)
+            logger.info(f"バックフィル完了: job_id={job_id}, processed={state['processed']}")
+            return {"success": True, "completed": True}
+
+        expense_ids = {item.expense_id for item in items}
+        expenses_by_id = {
+            expense.id: expense
+            for expense in db.query(Expense).filter(Expense.id.in_(expense_ids)).all()
+        }
+
+        reference = ReferenceDataCache.get(db)
+        if not reference.active_category_names:
+            state["status"] = BackfillStatus.PAUSED
+            state["last_error"] = "No active categories"
+            ClassificationBackfillService.save_step_state(state, job_id, step)
+            return {"success": False, "error": "No active categories"}
+
+        classified, ai_error, classification_disabled = classify_pending_items(reference, items, expenses_by_id)
+
+        # 全商品の分類が終わったExpenseを完了にする
+        db.flush()
+        uncategorized_by_expense = dict(
+            db.query(ExpenseItem.expense_id, func.count(ExpenseItem.id)).filter(
+                ExpenseItem.expense_id.in_(expense_ids),
+                ExpenseItem.category_id.is_(None)
+            ).group_by(ExpenseItem.expense_id).all()
+        )
+        completed_expense_ids = []
+        completed_user_ids = set()
+        for expense in expenses_by_id.values():
+            if uncategorized_by_expense.get(expense.id, 0) == 0 and expense.status != ExpenseStatus.COMPLETED:
+                expense.status = ExpenseStatus.COMPLETED
+                completed_expense_ids.append(expense.id)
+                completed_user_ids.add(expense.user_id)
+        db.commit()
+
+        for expense_id in completed_expense_ids:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=ExpenseStatus.COMPLETED.value)
+        for user_id in completed_user_ids:
+            enqueue_dashboard_warmup(user_id)
+
+        state["classified"] += len(classified)
+        state["expenses_completed"] += len(completed_expense_ids)
+
+        if ai_error:
+            # チェックポイントは進めず、同じ範囲を後で再試行する（ルールで分類できた商品は次回対象外）
+            state["consecutive_failures"] += 1
+            state["last_error"] = ai_error
+            if classification_disabled or state["consecutive_failures"] > BACKFILL_MAX_CONSECUTIVE_FAILURES:
+                state["status"] = BackfillStatus.PAUSED
+                ClassificationBackfillService.save_step_state(state, job_id, step)
+                logger.warning(f"バックフィルを一時停止: job_id={job_id} - {ai_error}")
+                return {"success": False, "paused": True, "error": ai_error}
+
+            state["step"] += 1
+            if not ClassificationBackfillService.save_step_state(state, job_id, step):
+                return _superseded(job_id, step)
+            countdown = BACKFILL_FAILURE_BACKOFF_SECONDS * (2 ** (state["consecutive_failures"] - 1))
+            backfill_classification_task.apply_async(args=[job_id, state["step"]], countdown=countdown)
+            return {"success": False, "retry_in": countdown, "error": ai_error}
+
+        state["last_item_id"] = items[-1].id
+        state["processed"] += len(items)
+        state["unresolved"] += len(items) - len(classified)
+        state["consecutive_failures"] = 0
+        state["last_error"] = None
+        state["step"] += 1
+        if not ClassificationBackfillService.save_step_state(state, job_id, step):
+            return _superseded(job_id, step)
+
+        # レート上限: このバッチの件数に見合う時間が経過するまで次のステップを遅らせる
+        rate_per_minute = state["rate_per_minute"]
+        min_interval = len(items) * 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        countdown = max(min_interval - (time.monotonic() - started), 0.0)
+        backfill_classification_task.apply_async(args=[job_id, state["step"]], countdown=countdown)
+
+        logger.info(
+            "バックフィル: job_id=%s, last_item_id=%s, processed=%s/%s, next_in=%.1fs",
+            job_id,
+            state["last_item_id"],
+            state["processed"],
+            state["total"],
+            countdown,
+        )
+        return {"success": True, "processed": len(items), "classified": len(classified)}
+
+    except (OperationalError, DBAPIError):
+        db.rollback()
+        raise
+    except Exception as e:
+        logger.exception(f"バックフィル処理中にエラーが発生: {str(e)}")
+        db.rollback()
+        state["status"] = BackfillStatus.PAUSED
+        state["last_error"] = str(e)
+        ClassificationBackfillService.save_step_state(state, job_id, step)
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="retry_failed_receipts_task")
+def retry_failed_receipts_task():
+    """
+    失敗・停止したレシート処理を再投入する定期タスク（Celery beat）
+
+    FAILEDのExpenseと、RETRY_STALE_PROCESSING_MINUTES以上PROCESSINGのままのExpenseを対象に、
+    Expenseごとの指数バックオフとRETRY_MAX_ATTEMPTSの上限を守って再投入する。
+    codexのサーキットが開いている間は何もしない。
+    """
+    if CodexCircuit.is_open():
+        logger.info("codexのサーキットが開いているため再試行をスキップします")
+        return {"success": True, "skipped": True}
+
+    # next_retry_at はこのタスクがUTCで書き込むため、同じUTCの時計で比較する
+    now = datetime.now(timezone.utc)
+    # updated_at / created_at はDBの now() で書き込まれるため、停止の判定はDBの時計で行う
+    stale_before = func.timestampadd(
+        literal_column("MINUTE"), -settings.RETRY_STALE_PROCESSING_MINUTES, func.now()
+    )
+    last_activity = func.coalesce(Expense.updated_at, Expense.created_at)
+
+    db = SessionLocal()
+    try:
+        candidates = db.query(Expense).options(joinedload(Expense.receipt)).filter(
+            Expense.retry_count < settings.RETRY_MAX_ATTEMPTS,
+            or_(Expense.next_retry_at.is_(None), Expense.next_retry_at <= now),
+            or_(
+                Expense.status == ExpenseStatus.FAILED,
+                and_(Expense.status == ExpenseStatus.PROCESSING, last_activity < stale_before)
+            )
+        ).order_by(last_activity).limit(settings.RETRY_SWEEP_LIMIT).all()
+
+        if not candidates:
+            return {"success": True, "requeued": 0}
+
+        for expense in candidates:
+            expense.retry_count = (expense.retry_count or 0) + 1
+            expense.next_retry_at = now + timedelta(
+                seconds=settings.RETRY_BASE_DELAY_SECONDS * (2 ** (expense.retry_count - 1))
+            )
+        db.commit()
+
+        requeued = []
+        for index, expense in enumerate(candidates):
+            countdown = index * RETRY_STAGGER_SECONDS
+            # QUEUEDは投入前に発行する（先に完了したタスクの終了イベントを上書きしないため）
+            ExpenseEventService.publish(expense.id, ExpenseEvent.QUEUED, status=expense.status.value)
+            if expense.receipt and not expense.receipt.ocr_processed:
+                # OCRが完了していないレシートはOCRからやり直す
+                process_receipt_ocr.apply_async(args=[expense.id], kwargs={"skip_ai": False}, countdown=countdown)
+                kind = "ocr"
+            else:
+                # OCR済み・手入力は未分類の商品だけを分類し直す
+                reclassify_expense_task.apply_async(
+                    args=[expense.id], kwargs={"reset_categories": False}, countdown=countdown
+                )
+                kind = "classification"
+            requeued.append(expense.id)
+            logger.info(
+                "自動再試行: expense_id=%s, kind=%s, attempt=%s/%s",
+                expense.id,
+                kind,
+                expense.retry_count,
+                settings.RETRY_MAX_ATTEMPTS,
+            )
+
+        return {"success": True, "requeued": len(requeued)}
+
+    except Exception as e:
+        logger.exception(f"再試行スイープ中にエラーが発生: {str(e)}")
+        db.rollback()
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
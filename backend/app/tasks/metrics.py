@@ -0,0 +1,69 @@
+"""
+Celeryシグナルによるタスクメトリクスの記録
+
+- before_task_publish: 投入時刻をメッセージヘッダに付与
+- task_prerun: 投入（eta指定時はeta）から実行開始までの待ち時間を記録
+- task_postrun: 実行時間と結果（success / error / failure / retry）を記録
+- task_failure: 例外の種類ごとの件数を記録
+"""
+import logging
+import time
+from datetime import datetime
+from celery.signals import before_task_publish, task_prerun, task_postrun, task_failure
+from app.services.task_metrics import TaskMetrics
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_AT_HEADER = "published_at"
+
+# task_id -> 実行開始時刻（ワーカープロセス内）
+_started_at = {}
+
+
+@before_task_publish.connect
+def _on_before_publish(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def _on_prerun(task_id=None, task=None, **kwargs):
+    _started_at[task_id] = time.monotonic()
+    try:
+        published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+        if published_at is None:
+            return
+
+        # countdown / eta付きのタスクは予定時刻からの遅れを待ち時間とする
+        ready_at = float(published_at)
+        eta = task.request.eta
+        if eta:
+            eta_dt = eta if isinstance(eta, datetime) else datetime.fromisoformat(eta)
+            ready_at = max(ready_at, eta_dt.timestamp())
+
+        TaskMetrics.observe("celery_task_queue_lag_seconds", {"task": task.name}, max(time.time() - ready_at, 0.0))
+    except Exception as e:
+        logger.debug(f"待ち時間の記録に失敗: {str(e)}")
+
+
+@task_postrun.connect
+def _on_postrun(task_id=None, task=None, retval=None, state=None, **kwargs):
+    started = _started_at.pop(task_id, None)
+    if started is not None:
+        TaskMetrics.observe("celery_task_runtime_seconds", {"task": task.name}, time.monotonic() - started)
+
+    # 例外にせず {"success": False} を返すタスクも失敗として数える
+    if state == "SUCCESS":
+        outcome = "error" if isinstance(retval, dict) and retval.get("success") is False else "success"
+    else:
+        outcome = (state or "unknown").lower()
+    TaskMetrics.increment("celery_task_outcomes_total", {"task": task.name, "outcome": outcome})
+
+
+@task_failure.connect
+def _on_failure(sender=None, exception=None, **kwargs):
+    task_name = getattr(sender, "name", "unknown")
+    TaskMetrics.increment(
+        "celery_task_exceptions_total",
+        {"task": task_name, "exception": type(exception).__name__ if exception else "unknown"}
+    )
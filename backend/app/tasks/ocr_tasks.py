@@ -5,13 +5,15 @@ from app.database import SessionLocal
 from app.models.expense import Expense, ExpenseStatus
 from app.models.expense_item import ExpenseItem, CategorySource
 from app.models.receipt import Receipt
-from app.models.category import Category
-from app.models.ai_settings import AISettings
 from app.services.codex_service import CodexService
 from app.services.image_service import ImageService
-from app.tasks.ai_tasks import classify_expense_item_task
+from app.tasks.ai_tasks import reclassify_expense_task
+from app.tasks.dashboard_tasks import enqueue_dashboard_warmup
 from app.constants import OCR_SCHEMA_VERSION
-from app.services.category_rule_service import CategoryRuleService
+from app.services.reference_cache import ReferenceDataCache
+from app.services.codex_circuit import CodexCircuit
+from app.services.task_metrics import TaskMetrics
+from app.services.expense_event_service import ExpenseEventService, ExpenseEvent
 from sqlalchemy.exc import OperationalError, DBAPIError
 import logging
 import json
@@ -47,52 +49,54 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
             logger.error(f"Receipt not found for expense: {expense_id}")
             return {"success": False, "error": "Receipt not found"}
 
-        # AI設定を取得
-        ai_settings = db.query(AISettings).first()
-        if not ai_settings:
-            # デフォルト設定を作成
-            ai_settings = AISettings()
-            db.add(ai_settings)
-            db.commit()
-            db.refresh(ai_settings)
+        # カテゴリ・AI設定・ルールはプロセス内キャッシュから取得
+        reference = ReferenceDataCache.get(db)
+        ai_settings = reference.ai_settings
 
         # OCRが無効の場合はスキップ
         if not ai_settings.ocr_enabled:
             logger.info("OCR is disabled in settings")
             expense.status = ExpenseStatus.PENDING
             db.commit()
+            ExpenseEventService.publish(
+                expense_id, ExpenseEvent.FAILED, status=ExpenseStatus.PENDING.value, error="OCR is disabled"
+            )
             return {"success": False, "error": "OCR is disabled"}
 
         # OCR開始時刻を記録
         receipt.ocr_started_at = datetime.now(timezone.utc)
         expense.status = ExpenseStatus.PROCESSING
         db.commit()
+        ExpenseEventService.publish(expense_id, ExpenseEvent.OCR_STARTED, status=ExpenseStatus.PROCESSING.value)
 
         # 画像パスを取得
         image_path = ImageService.get_full_path(receipt.file_path)
 
-        # カテゴリ一覧を取得
-        categories = db.query(Category).filter(Category.is_active == True).all()
-        category_names = [cat.name for cat in categories]
-        category_map = {cat.name: cat.id for cat in categories}
+        category_names = reference.active_category_names
+        category_map = reference.category_id_by_name
 
         logger.info(f"OCR処理開始: expense_id={expense_id}, model={ai_settings.ocr_model}")
 
         # codex execでOCR実行
-        ocr_result = CodexService.process_receipt_ocr(
-            image_path=image_path,
-            categories=category_names,
-            model=ai_settings.ocr_model,
-            sandbox_mode=ai_settings.sandbox_mode,
-            skip_git_repo_check=ai_settings.skip_git_repo_check,
-            system_prompt=ai_settings.ocr_system_prompt,
-        )
+        with TaskMetrics.timer("codex_call_seconds", {"operation": "ocr"}):
+            ocr_result = CodexService.process_receipt_ocr(
+                image_path=image_path,
+                categories=category_names,
+                model=ai_settings.ocr_model,
+                sandbox_mode=ai_settings.sandbox_mode,
+                skip_git_repo_check=ai_settings.skip_git_repo_check,
+                system_prompt=ai_settings.ocr_system_prompt,
+            )
+        CodexCircuit.record(ocr_result)
 
         if not ocr_result.get("success"):
             logger.error(f"OCR失敗: {ocr_result.get('error')}")
             expense.status = ExpenseStatus.FAILED
             receipt.ocr_processed = False
             db.commit()
+            ExpenseEventService.publish(
+                expense_id, ExpenseEvent.FAILED, status=ExpenseStatus.FAILED.value, error=ocr_result.get("error")
+            )
             return {"success": False, "error": ocr_result.get("error")}
 
         # OCR結果を取得
@@ -185,8 +189,7 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
                     category_id = category_map[category_name]
                     category_source = CategorySource.OCR
                 else:
-                    matched_rule = CategoryRuleService.find_match(
-                        db,
+                    matched_rule = reference.find_rule(
                         [
                             product_name,
                             expense.merchant_name,
@@ -231,8 +234,7 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
             fallback_category_source = None
             fallback_confidence = None
 
-            matched_rule = CategoryRuleService.find_match(
-                db,
+            matched_rule = reference.find_rule(
                 [
                     fallback_product_name,
                     expense.merchant_name,
@@ -269,11 +271,23 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
 
         db.commit()
 
+        ExpenseEventService.publish(
+            expense_id,
+            ExpenseEvent.ITEMS_CREATED,
+            status=expense.status.value,
+            items_created=len(items) if items else 1,
+            uncategorized_items=len(uncategorized_item_ids)
+        )
+        # AI分類に引き継がない場合はここで処理終了
+        if expense.status != ExpenseStatus.PROCESSING:
+            ExpenseEventService.publish(expense_id, ExpenseEvent.COMPLETED, status=expense.status.value)
+            enqueue_dashboard_warmup(expense.user_id)
+
         # AI分類タスクを実行（設定で有効かつカテゴリ未設定の商品がある場合）
         if should_queue_ai and uncategorized_item_ids:
+            # 同じレシートの商品は1タスク・1回のcodex execにまとめて分類する
             logger.info(f"AI分類タスクを開始: {len(uncategorized_item_ids)}個の商品")
-            for item_id in uncategorized_item_ids:
-                classify_expense_item_task.delay(item_id)
+            reclassify_expense_task.delay(expense_id, reset_categories=False)
         elif uncategorized_item_ids:
             logger.info("AI分類が無効のため、未分類のまま保留します")
 
@@ -281,8 +295,7 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
             "success": True,
             "expense_id": expense_id,
             "items_created": len(items) if items else 1,
-            "uncategorized_items": len(uncategorized_item_ids),
-            "ocr_result": data
+            "uncategorized_items": len(uncategorized_item_ids)
         }
 
     except Exception as e:
@@ -292,6 +305,9 @@ def process_receipt_ocr(expense_id: int, skip_ai: bool = False):
             if expense:
                 expense.status = ExpenseStatus.FAILED
                 db.commit()
+                ExpenseEventService.publish(
+                    expense_id, ExpenseEvent.FAILED, status=ExpenseStatus.FAILED.value, error=str(e)
+                )
         except Exception as commit_error:
             logger.error(f"エラー状態の保存に失敗: {str(commit_error)}")
             db.rollback()
@@ -0,0 +1,59 @@
+import base64
+from datetime import datetime
+from typing import List, Tuple
+
+
+def _encode(parts: List[str]) -> str:
+    raw = "|".join(parts)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str, count: int) -> List[str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    parts = raw.split("|")
+    if len(parts) != count:
+        raise ValueError("要素数が一致しません")
+    return parts
+
+
+def encode_cursor(occurred_at: datetime, row_id: int) -> str:
+    """キーセットページングのカーソル（最後に返した行の (発生日時, ID)）を不透明な文字列に変換"""
+    return _encode([occurred_at.isoformat(), str(row_id)])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """カーソル文字列を (発生日時, ID) に戻す（不正な値はValueError）"""
+    try:
+        occurred_at, row_id = _decode(cursor, 2)
+        return datetime.fromisoformat(occurred_at), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"無効なカーソルです: {cursor}") from e
+
+
+def encode_expense_cursor(occurred_at: datetime, created_at: datetime, expense_id: int) -> str:
+    """出費一覧のカーソル（最後に返した出費の (発生日時, 作成日時, ID)）を不透明な文字列に変換"""
+    return _encode([occurred_at.isoformat(), created_at.isoformat(), str(expense_id)])
+
+
+def decode_expense_cursor(cursor: str) -> Tuple[datetime, datetime, int]:
+    """出費一覧のカーソル文字列を (発生日時, 作成日時, ID) に戻す（不正な値はValueError）"""
+    try:
+        occurred_at, created_at, expense_id = _decode(cursor, 3)
+        return datetime.fromisoformat(occurred_at), datetime.fromisoformat(created_at), int(expense_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"無効なカーソルです: {cursor}") from e
+
+
+def encode_search_cursor(score: float, expense_id: int) -> str:
+    """検索結果のカーソル（最後に返した出費の (スコア, ID)）を不透明な文字列に変換"""
+    return _encode([repr(score), str(expense_id)])
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """検索結果のカーソル文字列を (スコア, ID) に戻す（不正な値はValueError）"""
+    try:
+        score, expense_id = _decode(cursor, 2)
+        return float(score), int(expense_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"無効なカーソルです: {cursor}") from e
@@ -0,0 +1,27 @@
+import re
+import unicodedata
+from typing import Optional
+
+# 店舗名の表記ゆれとして取り除く法人格の表記（NFKC正規化・小文字化後に照合）
+CORPORATE_DESIGNATORS = ("株式会社", "有限会社", "合同会社", "(株)", "(有)", "(同)")
+
+# 空白・記号（中黒・ハイフン・句読点など）。長音記号「ー」は店舗名の一部のため含めない
+_SEPARATORS = re.compile(r"[\s\-‐‑–—―・.,、。'\"`!?()\[\]「」『』/]+")
+
+MERCHANT_KEY_MAX_LENGTH = 200
+
+
+def normalize_merchant_key(name: Optional[str]) -> Optional[str]:
+    """
+    店舗名を集計用のキーに正規化
+
+    OCR結果の全角/半角・大文字/小文字・空白・記号・法人格の表記ゆれを吸収する。
+    支店名は残すため、別の店舗は別のキーになる。
+    """
+    if not name:
+        return None
+    normalized = unicodedata.normalize("NFKC", name).lower().strip()
+    for designator in CORPORATE_DESIGNATORS:
+        normalized = normalized.replace(designator, "")
+    normalized = _SEPARATORS.sub("", normalized)
+    return normalized[:MERCHANT_KEY_MAX_LENGTH] or None
@@ -0,0 +1,102 @@
+import json
+import re
+import unicodedata
+from typing import List, Optional
+
+# 語の区切りとして扱う文字（空白・記号）。長音記号「ー」は語の一部のため含めない
+_SEPARATORS = re.compile(r"[\s\-‐‑–—―・.,、。'\"`!?()\[\]「」『』/:;*+~<>@#$%^&=|\\{}]+")
+
+# 検索トークンの接頭辞。MariaDBのFULLTEXT（InnoDB）はngramパーサーを持たず、
+# 既定で3文字未満の語（innodb_ft_min_token_size）と英語のストップワードを索引しないため、
+# アプリ側で作った2文字のgramに接頭辞を付けて3文字の語として索引させる
+TOKEN_PREFIX = "x"
+# 1文字だけの語の埋め文字（"_" はFULLTEXTでは語の一部として扱われる）
+SINGLE_CHAR_PAD = "_"
+
+# 1つの文書から作るトークン数の上限（OCR全文など長い文書の索引サイズを抑える）
+MAX_DOCUMENT_TOKENS = 4000
+
+
+def _katakana_to_hiragana(text: str) -> str:
+    chars = []
+    for ch in text:
+        code = ord(ch)
+        if 0x30A1 <= code <= 0x30F6:
+            chars.append(chr(code - 0x60))
+        else:
+            chars.append(ch)
+    return "".join(chars)
+
+
+def normalize_japanese(text: Optional[str]) -> str:
+    """全角/半角・大文字/小文字・カタカナ/ひらがなの表記ゆれを吸収（NFKC・小文字化・ひらがな化）"""
+    if not text:
+        return ""
+    normalized = unicodedata.normalize("NFKC", text).strip().lower()
+    return _katakana_to_hiragana(normalized)
+
+
+def _segments(text: Optional[str]) -> List[str]:
+    return [segment for segment in _SEPARATORS.split(normalize_japanese(text)) if segment]
+
+
+def _grams(segment: str) -> List[str]:
+    if len(segment) == 1:
+        return [f"{TOKEN_PREFIX}{segment}{SINGLE_CHAR_PAD}"]
+    return [f"{TOKEN_PREFIX}{segment[i:i + 2]}" for i in range(len(segment) - 1)]
+
+
+def build_search_tokens(*texts: Optional[str]) -> Optional[str]:
+    """
+    検索用のトークン列（FULLTEXT索引の対象カラムに保存する値）
+
+    正規化した文字列を語に区切り、語ごとの2文字gramを空白区切りで並べる（重複は除く）。
+    """
+    tokens = {}
+    for text in texts:
+        for segment in _segments(text):
+            for gram in _grams(segment):
+                tokens.setdefault(gram, None)
+                if len(tokens) >= MAX_DOCUMENT_TOKENS:
+                    return " ".join(tokens)
+    return " ".join(tokens) or None
+
+
+def build_boolean_query(query: Optional[str]) -> Optional[str]:
+    """
+    検索語をBOOLEAN MODEの検索式に変換（全てのgramを必須にする）
+
+    1文字の語はその文字で始まるgramの前方一致にする。検索できる語が無い場合はNone。
+    """
+    terms = []
+    for segment in _segments(query):
+        if len(segment) == 1:
+            terms.append(f"+{TOKEN_PREFIX}{segment}*")
+        else:
+            terms.extend(f"+{gram}" for gram in _grams(segment))
+    return " ".join(dict.fromkeys(terms)) or None
+
+
+def ocr_text(raw_output: Optional[str]) -> str:
+    """OCRのJSON出力から文字列の値だけを取り出して連結（JSONでなければそのまま）"""
+    if not raw_output:
+        return ""
+    try:
+        data = json.loads(raw_output)
+    except ValueError:
+        return raw_output
+
+    values: List[str] = []
+
+    def collect(value) -> None:
+        if isinstance(value, str):
+            values.append(value)
+        elif isinstance(value, dict):
+            for child in value.values():
+                collect(child)
+        elif isinstance(value, list):
+            for child in value:
+                collect(child)
+
+    collect(data)
+    return " ".join(values)
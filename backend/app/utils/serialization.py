@@ -0,0 +1,23 @@
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+import orjson
+
+# 辞書のキーが数値の場合も文字列化し、NumPyの値はそのまま出力する
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    """orjsonが直接扱えない型の変換（Decimalは数値、Enumは値）"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"JSONに変換できない型です: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """辞書・リストをJSONのバイト列に変換（datetime/dateはISO 8601）"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+日次支出集計（daily_spend_rollup）と月別のカテゴリ・店舗集計の修復スクリプト
+
+指定期間の集計を明細から作り直します。1か月ずつcommitするため、
+長期間を指定しても1トランザクションが大きくなりません。
+
+使い方:
+    python rebuild_spend_rollup.py                          # 全期間・全ユーザー
+    python rebuild_spend_rollup.py --start 2026-01-01 --end 2026-03-31
+    python rebuild_spend_rollup.py --user-id 2
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD 形式で指定してください: {value}")
+
+
+def month_chunks(start: date, end: date):
+    """期間を月単位の (開始日, 終了日) に分割"""
+    chunk_start = start
+    while chunk_start <= end:
+        next_month = (chunk_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        chunk_end = min(next_month - timedelta(days=1), end)
+        yield chunk_start, chunk_end
+        chunk_start = next_month
+
+
+def rebuild(start: date = None, end: date = None, user_id: int = None) -> int:
+    from app.database import SessionLocal, engine
+    from app.models.daily_spend_rollup import DailySpendRollup
+    from app.models.monthly_merchant_rollup import MonthlyMerchantRollup
+    from app.models.monthly_category_rollup import MonthlyCategoryRollup
+    from app.services.spend_rollup_service import SpendRollupService
+
+    DailySpendRollup.__table__.create(bind=engine, checkfirst=True)
+    MonthlyMerchantRollup.__table__.create(bind=engine, checkfirst=True)
+    MonthlyCategoryRollup.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        bounds = SpendRollupService.date_bounds(db, user_id)
+        if bounds is None and (start is None or end is None):
+            print("出費が存在しないため、集計の対象がありません")
+            return 0
+
+        start = start or bounds[0]
+        end = end or bounds[1]
+        if start > end:
+            print(f"エラー: 開始日 {start} が終了日 {end} より後です")
+            return 1
+
+        target = f"ユーザーID {user_id}" if user_id is not None else "全ユーザー"
+        print(f"日次集計を再作成します: {start} 〜 {end}（{target}）")
+
+        total_rows = 0
+        for chunk_start, chunk_end in month_chunks(start, end):
+            rows = SpendRollupService.rebuild(db, chunk_start, chunk_end, user_id=user_id)
+            # 月単位の集計は、期間の端の月も月全体を作り直す
+            month = chunk_start.replace(day=1)
+            category_rows = SpendRollupService.refresh_category_month(db, month, user_id=user_id)
+            merchant_rows = SpendRollupService.refresh_merchant_month(db, month, user_id=user_id)
+            db.commit()
+            total_rows += rows
+            print(f"  {chunk_start} 〜 {chunk_end}: 日次 {rows}行 / カテゴリ {category_rows}行 / 店舗 {merchant_rows}行")
+
+        # 月別集計のキャッシュを無効化
+        SpendRollupService.bump_epoch()
+        print(f"完了しました（合計 {total_rows}行）")
+        return 0
+    except Exception as e:
+        print(f"エラーが発生しました: {str(e)}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="日次支出集計を明細から作り直す")
+    parser.add_argument("--start", type=parse_date, help="開始日（YYYY-MM-DD、省略時は最初の出費日）")
+    parser.add_argument("--end", type=parse_date, help="終了日（YYYY-MM-DD、省略時は最後の出費日）")
+    parser.add_argument("--user-id", type=int, help="対象ユーザーID（省略時は全ユーザー）")
+    args = parser.parse_args()
+
+    sys.exit(rebuild(args.start, args.end, args.user_id))
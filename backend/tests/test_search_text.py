@@ -0,0 +1,92 @@
+import json
+from app.utils.search_text import (
+    MAX_DOCUMENT_TOKENS,
+    build_boolean_query,
+    build_search_tokens,
+    normalize_japanese,
+    ocr_text,
+)
+
+
+def test_normalize_japanese_folds_width_case_and_katakana():
+    assert normalize_japanese("ＡＢＣ") == "abc"
+    assert normalize_japanese("ﾏﾂﾓﾄｷﾖｼ") == "まつもときよし"
+    assert normalize_japanese("  ドラッグストア ") == "どらっぐすとあ"
+    assert normalize_japanese("コーヒー") == "こーひー"  # 長音記号はそのまま
+    assert normalize_japanese(None) == ""
+
+
+def test_build_search_tokens_bigrams_with_prefix():
+    assert build_search_tokens("マツキヨ") == "xまつ xつき xきよ"
+
+
+def test_build_search_tokens_katakana_and_hiragana_match():
+    assert build_search_tokens("マツキヨ") == build_search_tokens("まつきよ")
+    assert build_search_tokens("ｺｰﾋｰ") == build_search_tokens("コーヒー")
+
+
+def test_build_search_tokens_splits_on_separators():
+    # 区切り文字をまたぐgramは作らない
+    assert build_search_tokens("ab・cd") == "xab xcd"
+    assert build_search_tokens("ab cd/ef") == "xab xcd xef"
+    assert build_search_tokens("（薬）") == "x薬_"
+
+
+def test_build_search_tokens_single_char_segment_is_padded():
+    assert build_search_tokens("薬") == "x薬_"
+    assert build_search_tokens("a 薬") == "xa_ x薬_"
+
+
+def test_build_search_tokens_deduplicates_across_texts():
+    assert build_search_tokens("ローソン", "ろーそん 新宿") == "xろー xーそ xそん x新宿"
+
+
+def test_build_search_tokens_empty_input():
+    assert build_search_tokens(None) is None
+    assert build_search_tokens("", "  ") is None
+    assert build_search_tokens("・、。") is None
+
+
+def test_build_search_tokens_caps_document_size():
+    text = "".join(chr(0x4E00 + i) for i in range(MAX_DOCUMENT_TOKENS + 100))
+    assert len(build_search_tokens(text).split()) == MAX_DOCUMENT_TOKENS
+
+
+def test_build_boolean_query_requires_every_gram():
+    assert build_boolean_query("マツキヨ") == "+xまつ +xつき +xきよ"
+    assert build_boolean_query("ドラッグ 新宿") == "+xどら +xらっ +xっぐ +x新宿"
+
+
+def test_build_boolean_query_single_char_is_prefix_match():
+    # 1文字の語は、その文字で始まる2文字gram（x薬_ も含む）の前方一致
+    assert build_boolean_query("薬") == "+x薬*"
+    assert build_boolean_query("ｶ") == "+xか*"
+
+
+def test_build_boolean_query_deduplicates_terms():
+    assert build_boolean_query("ああああ") == "+xああ"
+
+
+def test_build_boolean_query_strips_boolean_operators():
+    # BOOLEAN MODEの演算子は区切りとして扱い、検索式に混ざらない
+    assert build_boolean_query("+ab -cd \"ef\"") == "+xab +xcd +xef"
+    assert build_boolean_query("*") is None
+    assert build_boolean_query("   ") is None
+    assert build_boolean_query(None) is None
+
+
+def test_query_terms_match_document_tokens():
+    tokens = set(build_search_tokens("マツモトキヨシ 新宿東口店").split())
+    query = build_boolean_query("ﾏﾂﾓﾄ")
+    assert all(term[1:] in tokens for term in query.split())
+
+
+def test_ocr_text_collects_string_leaves():
+    raw = json.dumps({"merchant": "ローソン", "items": [{"name": "おにぎり", "price": 120}], "total": 120})
+    assert ocr_text(raw) == "ローソン おにぎり"
+
+
+def test_ocr_text_non_json_and_empty():
+    assert ocr_text("レシート本文") == "レシート本文"
+    assert ocr_text(None) == ""
+    assert ocr_text("") == ""
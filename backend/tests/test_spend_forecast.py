@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from app.services.spend_forecast_service import (
+    FORECAST_INTERVAL_Z,
+    MODIFIED_Z_FACTOR,
+    _group_median,
+    _project,
+    _robust_z,
+)
+
+
+def test_group_median_odd_and_even_groups():
+    groups = np.array([0, 0, 0, 1, 1])
+    values = np.array([5.0, 1.0, 3.0, 4.0, 2.0])
+    medians, counts = _group_median(groups, values, 2)
+    assert counts.tolist() == [3, 2]
+    assert medians.tolist() == [3.0, 3.0]
+
+
+def test_group_median_empty_group_is_nan():
+    groups = np.array([0, 2, 2])
+    values = np.array([7.0, 1.0, 2.0])
+    medians, counts = _group_median(groups, values, 3)
+    assert counts.tolist() == [1, 0, 2]
+    assert medians[0] == 7.0
+    assert np.isnan(medians[1])
+    assert medians[2] == 1.5
+
+
+def test_group_median_no_values():
+    medians, counts = _group_median(np.array([], dtype=np.int64), np.array([], dtype=np.float64), 2)
+    assert counts.tolist() == [0, 0]
+    assert np.isnan(medians).all()
+
+
+def test_robust_z_scales_by_mad():
+    z = _robust_z(np.array([1.0, 3.0]), 1.0, 2.0)
+    assert z.tolist() == pytest.approx([0.0, MODIFIED_Z_FACTOR])
+
+
+def test_robust_z_zero_mad_and_nan_are_zero():
+    # MADが0（全件同値）、統計量なし（NaN）、log(0)由来の-infはいずれも0
+    z = _robust_z(
+        np.array([2.0, 2.0, -np.inf, 5.0]),
+        np.array([1.0, 2.0, 1.0, np.nan]),
+        np.array([0.0, 0.0, 1.0, np.nan])
+    )
+    assert z.tolist() == [0.0, 0.0, 0.0, 0.0]
+
+
+def test_project_blends_current_pace_with_history():
+    # 30日の月の10日目：当月ペース 30/日 と履歴ペース 60/日 を 1/3 : 2/3 で加重
+    projected, spread = _project(np.array([300.0]), np.array([60.0]), np.array([4.0]), 10, 30)
+    assert projected.tolist() == pytest.approx([300 + 50 * 20])
+    assert spread.tolist() == pytest.approx([FORECAST_INTERVAL_Z * 4.0 * np.sqrt(20)])
+
+
+def test_project_month_end_is_actual_spend():
+    projected, spread = _project(np.array([120.0, 0.0]), np.array([99.0, 5.0]), np.array([3.0, 1.0]), 31, 31)
+    assert projected.tolist() == [120.0, 0.0]
+    assert spread.tolist() == [0.0, 0.0]
+
+
+def test_project_no_history_uses_current_pace_only_weighted():
+    # 履歴の無いカテゴリは履歴ペース0として加重される
+    projected, _ = _project(np.array([100.0]), np.array([0.0]), np.array([0.0]), 1, 10)
+    assert projected.tolist() == pytest.approx([100 + 0.1 * 100 * 9])
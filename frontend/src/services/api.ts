@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { User, Category, Expense, DashboardSummary, LoginResponse, AISettings, AISettingsUpdate, CategoryRule } from '@/types';
+import type { User, Category, Expense, ExpenseListResponse, DashboardSummary, LoginResponse, AISettings, AISettingsUpdate, CategoryRule } from '@/types';
 
 const api = axios.create({
   baseURL: '/api',
@@ -116,8 +116,8 @@ export const categoryAPI = {
 
 // 出費API
 export const expenseAPI = {
-  listExpenses: async (params?: any): Promise<{ total: number; expenses: Expense[] }> => {
-    const response = await api.get<{ total: number; expenses: Expense[] }>('/expenses/', { params });
+  listExpenses: async (params?: any): Promise<ExpenseListResponse> => {
+    const response = await api.get<ExpenseListResponse>('/expenses/', { params });
     return response.data;
   },
   getExpense: async (expenseId: number): Promise<Expense> => {
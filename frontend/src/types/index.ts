@@ -81,6 +81,13 @@ export interface Expense {
   items?: ExpenseItem[];  // 商品明細
 }
 
+export interface ExpenseListResponse {
+  total: number | null;  // キーセットページング（paging=cursor）では null
+  has_more: boolean;
+  next_cursor: string | null;
+  expenses: Expense[];
+}
+
 export interface Receipt {
   id: number;
   original_filename?: string;
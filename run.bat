@@ -70,6 +70,10 @@ REM 新しいコマンドプロンプトウィンドウでCeleryワーカーを
 echo Celeryワーカーを起動しています...
 start "AI家計簿 - Celery" cmd /k "cd backend && venv\Scripts\activate.bat && celery -A app.tasks.celery_app worker --loglevel=info"
 
+REM 新しいコマンドプロンプトウィンドウでCelery beat（定期タスク）を起動
+echo Celery beatを起動しています...
+start "AI家計簿 - Celery beat" cmd /k "cd backend && venv\Scripts\activate.bat && celery -A app.tasks.celery_app beat --loglevel=info"
+
 REM 新しいコマンドプロンプトウィンドウでフロントエンドサーバーを起動
 echo フロントエンドサーバーを起動しています...
 start "AI家計簿 - フロントエンド" cmd /k "cd frontend && npm run dev"
@@ -190,11 +190,11 @@ uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload &
 BACKEND_PID=$!
 cd ..
 
-# Celeryワーカーの起動
+# Celeryワーカーの起動（-B: 定期タスク用のbeatを同時に起動）
 echo -e "${GREEN}Celeryワーカーを起動しています...${NC}"
 cd backend
 source venv/bin/activate
-celery -A app.tasks.celery_app worker --loglevel=info &
+celery -A app.tasks.celery_app worker -B --loglevel=info &
 CELERY_PID=$!
 cd ..
 